@@ -1,9 +1,15 @@
 import streamlit as st
 import os
+import shutil
 import tempfile
 import re
 from src.rag_engine import ClinicalKnowledgeBase
 from src.llm_client import GeminiClient
+from src.response_cache import SemanticResponseCache
+from src.query_router import QueryRouter
+from src.search_filters import SearchFilter
+from src.config import Config
+from src.tracing import tracer
 
 # --- Page Config ---
 st.set_page_config(
@@ -44,16 +50,52 @@ st.title("🏥 Medi-Agent: Clinical Guideline Assistant")
 st.markdown("---")
 
 # --- 1. Session State Initialization ---
+@st.cache_resource
+def get_knowledge_base():
+    """
+    One process-wide, thread-safe knowledge base (and encoder) shared by every session.
+    The encoder and the last saved database load in the background while the page renders.
+    """
+    # Local, or a client of the shared retrieval server when Config.RETRIEVAL_SERVER_URL is set
+    knowledge_base = ClinicalKnowledgeBase.create()
+    knowledge_base.warm_up()
+    return knowledge_base
+
+
+@st.cache_resource
+def get_response_cache():
+    return SemanticResponseCache(get_knowledge_base().embed_query)
+
+
+@st.cache_resource
+def get_router():
+    """Query-complexity router (shares the knowledge base's encoder), or None when disabled."""
+    return QueryRouter(get_knowledge_base().embed_query) if Config.ROUTER_ENABLED else None
+
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Prometheus-style /metrics (per-stage latency histograms), once per process when configured."""
+    if Config.METRICS_PORT:
+        tracer.start_metrics_server(Config.METRICS_PORT)
+
+
+start_metrics_endpoint()
+
 if "rag_engine" not in st.session_state:
-    st.session_state.rag_engine = ClinicalKnowledgeBase()
+    st.session_state.rag_engine = get_knowledge_base()
 if "llm_client" not in st.session_state:
-    st.session_state.llm_client = GeminiClient()
+    st.session_state.llm_client = GeminiClient(response_cache=get_response_cache(), router=get_router())
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # --- 2. Sidebar: Controls ---
 with st.sidebar:
     st.header("🗂️ Knowledge Base")
+    if not st.session_state.rag_engine.is_ready():
+        st.caption("⏳ Warming up: loading the encoder and the saved database...")
+    elif st.session_state.rag_engine.warmup_error:
+        st.caption(f"⚠️ Warm-up failed: {st.session_state.rag_engine.warmup_error}")
 
     # A. Persistence Control
     if st.button("📂 Load Saved Database", use_container_width=True):
@@ -68,33 +110,75 @@ with st.sidebar:
     st.subheader("⚙️ Settings")
     patient_mode = st.toggle("Patient-Friendly Mode", value=False,
                              help="Switch to simple language for explaining to patients.")
+    profile_next = st.toggle("Profile Queries", value=False,
+                             help="Run questions under cProfile and show where the time went.")
+
+    # Search scope: filters are applied inside the index search, not to its results
+    document_tags = st.session_state.rag_engine.document_tags() if st.session_state.rag_engine.is_ready() else {}
+    with st.expander("🔎 Search Scope"):
+        scope_sources = st.multiselect("Documents", sorted(document_tags),
+                                       help="Only search these guidelines (empty: all).")
+        scope_tags = st.multiselect("Tags", sorted({tag for tags in document_tags.values() for tag in tags}),
+                                    help="Only search documents with any of these tags.")
+    search_filter = SearchFilter(sources=scope_sources, tags=scope_tags)
 
     st.divider()
 
     # C. Document Upload
     st.subheader("Ingestion")
     uploaded_files = st.file_uploader("Upload Guidelines (PDF)", type="pdf", accept_multiple_files=True)
+    upload_tags = st.text_input("Tags (comma-separated)", placeholder="e.g. malaria, ne-india",
+                                help="Stored with the uploaded documents, for Search Scope.")
 
     if uploaded_files and st.button("⚡ Build & Save", use_container_width=True):
         with st.spinner("Processing & Indexing..."):
+            # Saved under their own names: the file name is the document's identity in the index
+            upload_dir = tempfile.mkdtemp(prefix="medi_upload_")
             temp_paths = []
             for uploaded_file in uploaded_files:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{uploaded_file.name}") as tmp:
-                    tmp.write(uploaded_file.read())
-                    temp_paths.append(tmp.name)
-
-            # Process & Save
-            st.session_state.rag_engine.load_and_process_pdfs(temp_paths)
+                path = os.path.join(upload_dir, os.path.basename(uploaded_file.name))
+                with open(path, "wb") as f:
+                    f.write(uploaded_file.read())
+                temp_paths.append(path)
+
+            # Process & Save (incremental: start from the saved database so it is extended, not replaced)
+            st.session_state.rag_engine.wait_until_ready()
+            if st.session_state.rag_engine.is_empty():
+                st.session_state.rag_engine.load_index()
+            tags = [tag.strip().lower() for tag in upload_tags.split(",") if tag.strip()]
+            summary = st.session_state.rag_engine.load_and_process_pdfs(temp_paths, tags=tags or None)
             st.session_state.rag_engine.save_index()
-            st.success("Database Updated Successfully!")
-            for path in temp_paths:
-                try:
-                    os.remove(path)
-                except:
-                    pass
+            st.success(f"Database Updated Successfully! Added: {len(summary['added'])}, "
+                       f"Updated: {len(summary['updated'])}, Unchanged: {len(summary['skipped'])}")
+            if summary["stats"]:
+                st.caption(f"⏱️ {summary['stats']['pages_per_sec']} pages/sec · "
+                           f"{summary['stats']['chunks_per_sec']} chunks/sec")
+            shutil.rmtree(upload_dir, ignore_errors=True)
+
+    # D. Retrieval cache stats
+    cache_stats = st.session_state.rag_engine.cache_stats()
+    answer_stats = st.session_state.llm_client.response_cache.stats()
+    st.caption(f"🗃️ Cache hit rate: queries {cache_stats['query_embeddings']['hit_rate']:.0%}, "
+               f"results {cache_stats['results']['hit_rate']:.0%}, "
+               f"answers {answer_stats['hit_rate']:.0%} ({answer_stats['size']} stored)")
+    stage_latency = tracer.summary()
+    if stage_latency:
+        with st.expander("⏱️ Stage latency (mean)"):
+            for name, stage in sorted(stage_latency.items(), key=lambda item: -item[1]["mean_ms"]):
+                st.caption(f"{name}: {stage['mean_ms']:.1f} ms × {stage['count']}")
+    rerank_stats = cache_stats["rerank"]
+    if rerank_stats and rerank_stats["reranked"]:
+        st.caption(f"🎯 Rerank: ~{rerank_stats['mean_tokens_saved']} prompt tokens saved "
+                   f"for {rerank_stats['mean_rerank_ms']} ms/query ({rerank_stats['fallbacks']} fallbacks)")
+    packing_stats = cache_stats["packing"]
+    if packing_stats and packing_stats["contexts"]:
+        st.caption(f"📦 Context: ~{packing_stats['mean_tokens_in']} → {packing_stats['mean_tokens_out']} tokens/query")
 
 
 # --- Helper: UI Components ---
+CITATION_PATTERN = r"\[Source: '(.*?)', Page: (\d+)\]"
+
+
 def display_source_chips(context_text):
     """Renders sources as small, hoverable 'chips' using HTML/CSS."""
     tooltip_css = """
@@ -124,15 +208,15 @@ def display_source_chips(context_text):
     </style>
     """
     st.markdown(tooltip_css, unsafe_allow_html=True)
-    pattern = r"\[Source: '(.*?)', Page: (\d+)\]"
-    parts = re.split(pattern, context_text)
+    parts = re.split(CITATION_PATTERN, context_text)
     unique_sources = {}
 
     if len(parts) > 1:
         for i in range(1, len(parts), 3):
             if i + 1 < len(parts):
                 filename, page = parts[i], parts[i + 1]
-                content_raw = parts[i + 2] if i + 2 < len(parts) else ""
+                # Tags of collapsed duplicates share one line: they cite the text after the last one
+                content_raw = next((parts[j] for j in range(i + 2, len(parts), 3) if parts[j].strip()), "")
                 clean_content = content_raw.strip()[:400].replace('"', '&quot;').replace("'", "&#39;") + "..."
                 identifier = f"{filename} (p.{page})"
                 if identifier not in unique_sources: unique_sources[identifier] = clean_content
@@ -166,40 +250,68 @@ if prompt := st.chat_input("Ask a clinical question..."):
 
         # --- 1. MEDICAL TRACK (RAG) ---
         else:
-            if not st.session_state.rag_engine.index:
-                st.warning("⚠️ Database empty. Load or Build first.")
-                response = "Please load a database."
-            else:
-                with st.status("🤖 Orchestrating Agents...", expanded=True) as status:
-                    st.write("📚 **Retrieval Engine:** Searching knowledge base...")
-                    context = st.session_state.rag_engine.search(prompt)
-
-                    if not context:
-                        status.update(label="❌ No info found", state="error")
-                        response = "No relevant information found in the documents."
-                        raw_response_for_chips = ""
+            # One trace per question: retrieval, Researcher and Writer spans share its trace_id
+            with tracer.profile(profile_next, label="query") as profile_result, \
+                    tracer.span("chat_request", patient_mode=patient_mode, query_chars=len(prompt)):
+                if not st.session_state.rag_engine.is_ready():
+                    # Asked before the background warm-up finished: wait for it only now
+                    with st.spinner("Loading knowledge base..."):
+                        st.session_state.rag_engine.wait_until_ready()
+                if st.session_state.rag_engine.is_empty():
+                    st.warning("⚠️ Database empty. Load or Build first.")
+                    response = "Please load a database."
+                else:
+                    writer_stream = None
+                    with st.status("🤖 Orchestrating Agents...", expanded=True) as status:
+                        st.write("📚 **Retrieval Engine:** Searching knowledge base...")
+                        context = st.session_state.rag_engine.search(prompt, filters=search_filter)
+
+                        if not context:
+                            status.update(label="❌ No info found", state="error")
+                            response = "No relevant information found in the documents."
+                            raw_response_for_chips = ""
+                        else:
+                            st.write("✅ **Retrieval:** Found relevant guidelines.")
+
+                            # Multi-Agent Pipeline (streaming): the Researcher runs and the Writer starts
+                            # inside the status box; the rest of the Writer's tokens stream below it
+                            writer_stream = st.session_state.llm_client.orchestrate_response_stream(
+                                context=context,
+                                query=prompt,
+                                chat_history=st.session_state.messages[-5:],
+                                is_patient_mode=patient_mode,
+                                status_callback=st.write
+                            )
+                            raw_response_for_chips = next(writer_stream, "")
+
+                    if writer_stream is None:
+                        st.markdown(response)
                     else:
-                        st.write("✅ **Retrieval:** Found relevant guidelines.")
-
-                        # Multi-Agent Pipeline
-                        raw_response_for_chips = st.session_state.llm_client.orchestrate_response(
-                            context=context,
-                            query=prompt,
-                            chat_history=st.session_state.messages[-5:],
-                            is_patient_mode=patient_mode,
-                            status_callback=st.write
-                        )
+                        placeholder = st.empty()
+                        for token in writer_stream:
+                            raw_response_for_chips += token
+                            placeholder.markdown(re.sub(CITATION_PATTERN, "", raw_response_for_chips) + "▌")
 
                         # Clean Response (Remove citations from display text)
-                        response = re.sub(r"\[Source: '(.*?)', Page: (\d+)\]", "", raw_response_for_chips).strip()
-
-                        status.update(label="✅ Response Generated", state="complete")
-
-                st.markdown(response)
-
-                # Show Chips
-                if context and 'raw_response_for_chips' in locals() and raw_response_for_chips:
-                    st.divider()
-                    display_source_chips(raw_response_for_chips)
+                        response = re.sub(CITATION_PATTERN, "", raw_response_for_chips).strip()
+                        placeholder.markdown(response)
+                        status.update(label="✅ Response Generated", state="complete", expanded=False)
+
+                        metrics = st.session_state.llm_client.last_metrics
+                        if metrics and metrics["total_s"] is not None:
+                            ttft = f"{metrics['ttft_s']:.1f}s" if metrics["ttft_s"] is not None else "n/a"
+                            st.caption(f"⏱️ First token {ttft} · Total {metrics['total_s']:.1f}s"
+                                       + (" · ⚡ cached" if metrics["cache_hit"] else "")
+                                       + (" · single pass" if metrics["route"] == QueryRouter.SINGLE_PASS else ""))
+
+                    # Show Chips
+                    if context and 'raw_response_for_chips' in locals() and raw_response_for_chips:
+                        st.divider()
+                        display_source_chips(raw_response_for_chips)
+
+            if profile_result.get("top"):
+                with st.expander("🔬 Profile (cumulative time)"):
+                    st.caption(f"Saved to {profile_result['path']}")
+                    st.code(profile_result["top"])
 
     st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Recall / latency benchmark for the index types in src/vector_index.py.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_ann                        # synthetic clustered vectors
+    python -m benchmarks.bench_ann --store storage_v2     # real embeddings from the embedding store
+
+For every index type it reports build time (incl. training), serialized index size,
+recall@k against the exact flat_ip baseline, and p50/p99 single-query latency.
+Query-time knobs (IVF nprobe, HNSW efSearch) come from Config or --nprobe / --ef-search.
+"""
+import time
+import argparse
+import faiss
+import numpy as np
+
+from src.config import Config
+from src import vector_index
+from src.embedding_store import EmbeddingStore
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors: closer to real embedding geometry than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, n // 500), dim)).astype("float32")
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.35 * rng.standard_normal((n, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_store_vectors(folder: str) -> np.ndarray:
+    store = EmbeddingStore(folder)
+    if not store.rows:
+        raise SystemExit(f"No embedding store found in {folder}")
+    return np.asarray(store.vectors(), dtype="float32")
+
+
+def make_queries(vectors: np.ndarray, n_queries: int, seed: int = 1) -> np.ndarray:
+    """Perturbed corpus vectors, re-normalized (like paraphrased questions about a passage)."""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), n_queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype("float32")
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def bench(index_type: str, vectors, queries, k: int, truth, nprobe=None, ef_search=None) -> dict:
+    ids = np.arange(len(vectors), dtype="int64")
+    started = time.perf_counter()
+    index = vector_index.create_index(index_type, vectors.shape[1], len(vectors))
+    if not index.is_trained:
+        sample = vectors[np.random.default_rng(0).choice(len(vectors), min(len(vectors), Config.INDEX_TRAIN_SAMPLE),
+                                                         replace=False)]
+        index.train(sample)
+    index.add_with_ids(vectors, ids)
+    build_s = time.perf_counter() - started
+
+    params = vector_index.search_params(index, nprobe=nprobe, ef_search=ef_search)
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, labels = index.search(q[None, :], k, params=params)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append(labels[0])
+
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]) if truth is not None else 1.0
+    return {
+        "index_type": vector_index.index_type_of(index),
+        "build_s": build_s,
+        "size_mb": len(faiss.serialize_index(index)) / 2 ** 20,
+        "recall": recall,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "labels": found,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", help="Folder with an embedding store (default: synthetic vectors)")
+    parser.add_argument("--vectors", type=int, default=200_000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--types", nargs="+", default=["flat_ip", "ivf_flat", "ivf_pq", "hnsw"])
+    args = parser.parse_args()
+
+    vectors = load_store_vectors(args.store) if args.store else synthetic_vectors(args.vectors, args.dim)
+    queries = make_queries(vectors, min(args.queries, len(vectors)))
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+
+    baseline = bench("flat_ip", vectors, queries, args.k, None)
+    truth = baseline["labels"]
+
+    print(f"{'index':<10} {'build_s':>8} {'size_mb':>8} {'recall@' + str(args.k):>10} {'p50_ms':>8} {'p99_ms':>8}")
+    for index_type in args.types:
+        r = baseline if index_type == "flat_ip" else bench(index_type, vectors, queries, args.k, truth,
+                                                           args.nprobe, args.ef_search)
+        print(f"{r['index_type']:<10} {r['build_s']:>8.2f} {r['size_mb']:>8.1f} {r['recall']:>10.3f} "
+              f"{r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
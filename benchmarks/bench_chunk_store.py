@@ -0,0 +1,117 @@
+"""
+Load-time / memory benchmark: chunks.pkl (pickle) vs the memory-mapped ChunkStore.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_chunk_store --chunks 200000
+
+Each format is loaded in a fresh subprocess so the RSS numbers are not polluted by the
+parent. Reported per format: load time, RSS growth after load, and the time to
+materialize 15 random rows (what one search() touches).
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import argparse
+import tempfile
+import subprocess
+
+from src.chunk_store import ChunkStore
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def make_corpus(n_chunks: int, n_sources: int = 300) -> dict:
+    rng = random.Random(0)
+    words = ["hypertension", "mmhg", "initiate", "therapy", "amlodipine", "140/90", "dose",
+             "contraindication", "artesunate", "hba1c", "threshold", "stage", "patients", "mg"]
+    return {
+        rng.getrandbits(63): {
+            "text": " ".join(rng.choice(words) for _ in range(140))[:1000],
+            "page": rng.randint(1, 400),
+            "source": f"guideline_{rng.randrange(n_sources)}.pdf"
+        }
+        for _ in range(n_chunks)
+    }
+
+
+def measure_load(fmt: str, folder: str) -> dict:
+    with open(os.path.join(folder, "sample_ids.json")) as f:
+        sample_ids = json.load(f)
+    before = rss_mb()
+    started = time.perf_counter()
+    if fmt == "pickle":
+        with open(os.path.join(folder, "chunks.pkl"), "rb") as f:
+            chunks = pickle.load(f)
+    else:
+        chunks = ChunkStore.open(folder)
+    load_s = time.perf_counter() - started
+    after_load = rss_mb()
+
+    started = time.perf_counter()
+    rows = [chunks[cid] for cid in sample_ids]
+    fetch_ms = (time.perf_counter() - started) * 1000
+    assert len(rows) == len(sample_ids)
+
+    return {
+        "format": fmt,
+        "load_ms": round(load_s * 1000, 2),
+        "rss_growth_mb": round(after_load - before, 1),
+        "fetch_15_rows_ms": round(fetch_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--measure", choices=["pickle", "chunk_store"], help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_load(args.measure, args.folder)))
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"Generating {args.chunks} synthetic chunks...")
+        corpus = make_corpus(args.chunks)
+        with open(os.path.join(folder, "sample_ids.json"), "w") as f:
+            json.dump(random.Random(1).sample(list(corpus), 15), f)
+
+        with open(os.path.join(folder, "chunks.pkl"), "wb") as f:
+            pickle.dump(corpus, f)
+        ChunkStore(corpus).save(folder)
+        del corpus
+
+        sizes = {
+            "pickle": os.path.getsize(os.path.join(folder, "chunks.pkl")),
+            "chunk_store": sum(os.path.getsize(os.path.join(folder, n)) for n in ChunkStore.FILES),
+        }
+        results = []
+        for fmt in ("pickle", "chunk_store"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_chunk_store", "--measure", fmt, "--folder", folder],
+                check=True, capture_output=True, text=True
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            result["disk_mb"] = round(sizes[fmt] / 2 ** 20, 1)
+            results.append(result)
+
+    print(f"{'format':<12} {'load_ms':>10} {'rss_mb':>8} {'fetch15_ms':>11} {'disk_mb':>8}")
+    for r in results:
+        print(f"{r['format']:<12} {r['load_ms']:>10} {r['rss_growth_mb']:>8} {r['fetch_15_rows_ms']:>11} {r['disk_mb']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Encoder backend benchmark: PyTorch fp32 vs ONNX fp32 vs ONNX dynamic int8 (src/embeddings_service.py).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_encoder                      # synthetic guideline-style chunks
+    python -m benchmarks.bench_encoder --store storage_v2   # real chunk texts from a saved database
+
+Each backend runs in a fresh process so cold-load time and memory are measured from zero.
+Reported: cold load (import + model load), peak RSS, ingestion throughput (chunks/sec at
+Config.EMBED_BATCH_SIZE), single-query latency p50/p95, and parity with PyTorch (min / mean
+cosine over the benchmark texts). Exits non-zero if a backend fails the parity threshold.
+"""
+import sys
+import time
+import random
+import argparse
+import multiprocessing
+import numpy as np
+
+from src.config import Config
+
+QUERIES = [
+    "amlodipine dose for hypertension", "when to start drug therapy at 140/90",
+    "artesunate severe malaria children", "hba1c target type 2 diabetes",
+    "metformin contraindication ckd", "rifampicin dose tuberculosis adults",
+]
+
+
+def synthetic_chunks(n: int, seed: int = 0) -> list[str]:
+    from benchmarks.synthetic_corpus import FILLER, DRUGS, CONDITIONS
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(n):
+        sentences = [rng.choice(FILLER) for _ in range(8)]
+        sentences.append(f"For {rng.choice(CONDITIONS)}, give {rng.choice(DRUGS)} {rng.choice([5, 10, 500])} mg daily.")
+        rng.shuffle(sentences)
+        chunks.append(" ".join(sentences)[:1000])
+    return chunks
+
+
+def store_chunks(folder: str, n: int) -> list[str]:
+    from src.chunk_store import ChunkStore
+    chunks = ChunkStore.open(folder)
+    ids = chunks.ids()[:n]
+    return [chunks[int(cid)]["text"] for cid in ids]
+
+
+def run_backend(backend: str, texts: list[str], n_queries: int, queue):
+    """Child process: everything measured here starts from a cold interpreter."""
+    import resource
+    started = time.perf_counter()
+    from src.embeddings_service import create_encoder
+    model = create_encoder(backend)
+    model.encode(["warm-up"], normalize_embeddings=True)
+    load_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectors = model.encode(texts, batch_size=Config.EMBED_BATCH_SIZE, convert_to_numpy=True,
+                           normalize_embeddings=True)
+    encode_s = time.perf_counter() - started
+
+    latencies = []
+    for i in range(n_queries):
+        query = QUERIES[i % len(QUERIES)]
+        started = time.perf_counter()
+        model.encode([query], normalize_embeddings=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    queue.put({
+        "backend": backend,
+        "load_s": load_s,
+        "chunks_per_sec": len(texts) / encode_s,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "vectors": vectors.astype("float32"),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", help="Benchmark on chunk texts from this database folder")
+    parser.add_argument("-n", type=int, default=2000, help="Chunks to encode")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx_int8"])
+    parser.add_argument("--min-cosine", type=float, default=Config.ENCODER_PARITY_MIN_COSINE)
+    args = parser.parse_args()
+
+    texts = store_chunks(args.store, args.n) if args.store else synthetic_chunks(args.n)
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]  # torch is the parity reference
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        queue = context.Queue()
+        process = context.Process(target=run_backend, args=(backend, texts, args.queries, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    reference = results[0]["vectors"]
+    print(f"\n{len(texts)} chunks, {args.queries} queries, batch size {Config.EMBED_BATCH_SIZE}\n")
+    print(f"{'backend':<10} {'load_s':>7} {'rss_mb':>7} {'chunks/s':>9} {'q_p50_ms':>9} {'q_p95_ms':>9} "
+          f"{'min_cos':>8} {'mean_cos':>9}")
+    failed = []
+    for r in results:
+        cosines = np.sum(r["vectors"] * reference, axis=1)
+        if cosines.min() < args.min_cosine:
+            failed.append(r["backend"])
+        print(f"{r['backend']:<10} {r['load_s']:>7.2f} {r['peak_rss_mb']:>7.0f} {r['chunks_per_sec']:>9.1f} "
+              f"{r['query_p50_ms']:>9.2f} {r['query_p95_ms']:>9.2f} {cosines.min():>8.4f} {cosines.mean():>9.4f}")
+
+    if failed:
+        raise SystemExit(f"\nParity check failed (min cosine < {args.min_cosine}): {', '.join(failed)}")
+    print(f"\nAll backends within parity threshold ({args.min_cosine}).")
+
+
+if __name__ == "__main__":
+    main()
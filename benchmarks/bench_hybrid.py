@@ -0,0 +1,82 @@
+"""
+Retrieval quality / latency benchmark: dense (FAISS) vs lexical (BM25) vs hybrid (RRF).
+
+Usage (from the repo root, after building a database with the app or the CLI):
+    python -m benchmarks.bench_hybrid --questions labelled.jsonl --storage storage_v2 -k 5 10 15
+
+labelled.jsonl has one question per line; a hit is any retrieved chunk from a listed page:
+    {"question": "BP threshold to start drugs?", "relevant": [{"source": "htn.pdf", "page": 12}]}
+
+Reported per mode and k: hit rate (>= 1 relevant chunk retrieved), recall of relevant
+pages, MRR, and p50/p95 retrieval latency.
+"""
+import json
+import time
+import argparse
+import numpy as np
+
+from src.rag_engine import ClinicalKnowledgeBase
+
+MODES = ("dense", "lexical", "hybrid")
+
+
+def load_questions(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(kb: ClinicalKnowledgeBase, questions: list[dict], mode: str, k: int) -> dict:
+    hits, recalls, reciprocal_ranks, latencies = [], [], [], []
+    for item in questions:
+        relevant = {(r["source"], int(r["page"])) for r in item["relevant"]}
+        kb.embed_query(item["question"])  # warm the embedding cache: time retrieval, not the encoder
+
+        started = time.perf_counter()
+        chunk_ids = kb.retrieve(item["question"], top_k=k, mode=mode)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        pages = [(kb.chunks[cid]["source"], kb.chunks[cid]["page"]) for cid in chunk_ids]
+        found = relevant & set(pages)
+        hits.append(bool(found))
+        recalls.append(len(found) / len(relevant))
+        first = next((rank for rank, page in enumerate(pages, start=1) if page in relevant), None)
+        reciprocal_ranks.append(1 / first if first else 0.0)
+
+    return {
+        "mode": mode,
+        "k": k,
+        "hit_rate": float(np.mean(hits)),
+        "recall": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--storage", default="storage_v2")
+    parser.add_argument("-k", type=int, nargs="+", default=[5, 10, 15])
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    kb = ClinicalKnowledgeBase()
+    if not kb.load_index(args.storage):
+        raise SystemExit(f"No database in {args.storage}")
+    questions = load_questions(args.questions)
+
+    results = [evaluate(kb, questions, mode, k) for k in args.k for mode in MODES]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(questions)} questions, {len(kb.chunks)} chunks\n")
+    print(f"{'mode':<8} {'k':>3} {'hit_rate':>9} {'recall':>7} {'mrr':>6} {'p50_ms':>8} {'p95_ms':>8}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['k']:>3} {r['hit_rate']:>9.3f} {r['recall']:>7.3f} {r['mrr']:>6.3f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Map-reduce Researcher benchmark: one Researcher call over the whole context vs. one concurrent
+call per source shard (Config.MAP_REDUCE_*), with the same Writer afterwards.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_map_reduce --questions questions.jsonl --storage storage_v2 --backend gemini
+    python -m benchmarks.bench_map_reduce --questions bench_data/questions.jsonl --storage bench_data/storage \\
+        --backend stub --stub-latency 0.5 --stub-per-char 0.0002
+
+The stub models latency as a fixed cost plus a cost per prompt character, which is what
+sharding trades on: several shorter prompts in parallel instead of one long one. For every
+question the context is retrieved once and both paths run on it. Reported: how many contexts
+were actually sharded, the Researcher and end-to-end wall clock of both paths (mean / p50 /
+p95), and the mean difference on the sharded queries.
+"""
+import json
+import argparse
+import numpy as np
+
+from src.config import Config
+from src.rag_engine import ClinicalKnowledgeBase
+from src.llm_client import GeminiClient
+from src.stub_backend import StubGenAIClient
+
+
+def run_path(client: GeminiClient, map_reduce: bool, context: str, question: str) -> dict:
+    Config.MAP_REDUCE_ENABLED = map_reduce
+    client.orchestrate_response(context, question, [])
+    metrics = client.last_metrics
+    return {"shards": metrics["researcher_shards"], "researcher_s": metrics["researcher_s"],
+            "total_s": metrics["total_s"]}
+
+
+def describe(values: list[float]) -> str:
+    return (f"mean {np.mean(values):.2f}s  p50 {np.percentile(values, 50):.2f}s  "
+            f"p95 {np.percentile(values, 95):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--storage", default="storage_v2")
+    parser.add_argument("--backend", choices=("stub", "gemini"), default="stub")
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-per-char", type=float, default=0.0002)
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--min-tokens", type=int, default=Config.MAP_REDUCE_MIN_TOKENS)
+    parser.add_argument("--max-shards", type=int, default=Config.MAP_REDUCE_MAX_SHARDS)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--output", help="Write per-question results as JSON")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()][:args.limit]
+
+    kb = ClinicalKnowledgeBase()
+    if not kb.load_index(args.storage):
+        raise SystemExit(f"No database in {args.storage}")
+    client = GeminiClient(client=StubGenAIClient(latency_s=args.stub_latency, per_char_latency_s=args.stub_per_char)
+                          if args.backend == "stub" else None)
+    Config.MAP_REDUCE_MIN_TOKENS = args.min_tokens
+    Config.MAP_REDUCE_MAX_SHARDS = args.max_shards
+
+    rows = []
+    for question in questions:
+        context = kb.search(question, top_k=args.top_k)
+        if not context:
+            continue
+        rows.append({"question": question, "context_chars": len(context),
+                     "single": run_path(client, False, context, question),
+                     "map_reduce": run_path(client, True, context, question)})
+
+    sharded = [r for r in rows if r["map_reduce"]["shards"] > 1]
+    print(f"\n{len(rows)} questions, top_k {args.top_k}: {len(sharded)} contexts sharded "
+          f"(threshold {args.min_tokens} tokens, max {args.max_shards} shards)")
+    for path in ("single", "map_reduce"):
+        print(f"{path:<11} researcher {describe([r[path]['researcher_s'] for r in rows])}")
+        print(f"{'':<11} total      {describe([r[path]['total_s'] for r in rows])}")
+    if sharded:
+        saved = [r["single"]["total_s"] - r["map_reduce"]["total_s"] for r in sharded]
+        shards = [r["map_reduce"]["shards"] for r in sharded]
+        print(f"Sharded queries: mean {np.mean(shards):.1f} shards, wall clock saved {np.mean(saved):.2f}s/query "
+              f"({np.sum(saved) / np.sum([r['single']['total_s'] for r in sharded]):.1%})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
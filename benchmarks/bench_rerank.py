@@ -0,0 +1,79 @@
+"""
+Cross-encoder rerank benchmark: prompt tokens saved vs. reranking time added.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_rerank --questions labelled.jsonl --storage storage_v2
+
+Same labelled question format as benchmarks/bench_hybrid.py. For every question it compares
+the plain retrieval cut (--baseline-k chunks, what search() sends today) with reranking
+--candidates chunks down to --keep, and reports page hit rate / recall, estimated prompt
+tokens and the p50/p95 time spent in the cross-encoder.
+"""
+import argparse
+import numpy as np
+
+from src.config import Config
+from src.rag_engine import ClinicalKnowledgeBase
+from src.reranker import CrossEncoderReranker
+from src.context_packing import estimate_tokens
+from benchmarks.bench_hybrid import load_questions
+
+
+def page_metrics(kb: ClinicalKnowledgeBase, chunk_ids: list[int], relevant: set) -> tuple[bool, float, int]:
+    pages = {(kb.chunks[cid]["source"], kb.chunks[cid]["page"]) for cid in chunk_ids}
+    tokens = sum(estimate_tokens(kb.chunks[cid]["text"]) for cid in chunk_ids)
+    found = relevant & pages
+    return bool(found), len(found) / len(relevant), tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--storage", default="storage_v2")
+    parser.add_argument("--baseline-k", type=int, default=15)
+    parser.add_argument("--candidates", type=int, default=Config.RERANK_CANDIDATES)
+    parser.add_argument("--keep", type=int, default=Config.RERANK_TOP_K)
+    parser.add_argument("--budget-ms", type=float, default=Config.RERANK_BUDGET_MS)
+    args = parser.parse_args()
+
+    kb = ClinicalKnowledgeBase()
+    if not kb.load_index(args.storage):
+        raise SystemExit(f"No database in {args.storage}")
+    reranker = CrossEncoderReranker(budget_ms=args.budget_ms)
+    questions = load_questions(args.questions)
+
+    # Warm-up: model load and the first (uncalibrated) batch are not what we want to measure
+    warm = kb.retrieve(questions[0]["question"], top_k=args.candidates)
+    reranker.rerank(questions[0]["question"], [(cid, kb.chunks[cid]["text"]) for cid in warm], args.keep)
+    reranker.fallbacks = reranker.reranked = reranker.tokens_saved_total = 0
+    reranker.rerank_ms_total = 0.0
+
+    rows = {"baseline": [], "reranked": []}
+    for item in questions:
+        relevant = {(r["source"], int(r["page"])) for r in item["relevant"]}
+        candidates = kb.retrieve(item["question"], top_k=max(args.candidates, args.baseline_k))
+        rows["baseline"].append(page_metrics(kb, candidates[:args.baseline_k], relevant))
+
+        before = reranker.rerank_ms_total
+        kept = reranker.rerank(item["question"], [(cid, kb.chunks[cid]["text"]) for cid in candidates[:args.candidates]],
+                               args.keep, baseline_k=args.baseline_k)
+        rows["reranked"].append(page_metrics(kb, kept, relevant) + (reranker.rerank_ms_total - before,))
+
+    print(f"{len(questions)} questions, {len(kb.chunks)} chunks, "
+          f"baseline top-{args.baseline_k} vs rerank {args.candidates} -> {args.keep}\n")
+    print(f"{'variant':<9} {'hit_rate':>9} {'recall':>7} {'tokens':>7}")
+    for name, results in rows.items():
+        hits, recalls, tokens = zip(*[r[:3] for r in results])
+        print(f"{name:<9} {np.mean(hits):>9.3f} {np.mean(recalls):>7.3f} {np.mean(tokens):>7.0f}")
+
+    rerank_ms = [r[3] for r in rows["reranked"] if r[3] > 0]
+    saved = np.mean([b[2] for b in rows["baseline"]]) - np.mean([r[2] for r in rows["reranked"]])
+    stats = reranker.stats()
+    print(f"\nPrompt tokens saved/query: {saved:.0f}")
+    if rerank_ms:
+        print(f"Rerank time added: p50 {np.percentile(rerank_ms, 50):.1f} ms, p95 {np.percentile(rerank_ms, 95):.1f} ms")
+    print(f"Budget fallbacks: {stats['fallbacks']} / {len(questions)} (ms/pair {stats['ms_per_pair']})")
+
+
+if __name__ == "__main__":
+    main()
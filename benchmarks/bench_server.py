@@ -0,0 +1,107 @@
+"""
+Retrieval server load test: throughput and tail latency of micro-batched search at several batch windows.
+
+Usage (from the repo root, with a saved database):
+    python -m benchmarks.bench_server --storage storage_v2 --questions questions.jsonl
+    python -m benchmarks.bench_server --storage bench_data/storage --questions bench_data/questions.jsonl \\
+        --windows 0 2 5 10 --clients 32 --requests 2000
+
+For every window a fresh server (cli.py serve) is started on --listen, then --clients threads
+send searches back to back through RemoteKnowledgeBase until --requests are done. Each
+query is made unique (a numbered suffix) so the server's result cache does not answer it.
+A first row with --max-batch 1 is the unbatched baseline (one encode + one FAISS search per
+query, as each app replica does today). Reported per row: queries/sec, latency p50/p95/p99,
+and the mean batch size the server actually formed.
+"""
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from src.retrieval_client import RemoteKnowledgeBase
+
+
+def start_server(args, window_ms: float, max_batch: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "cli.py", "serve", "--storage", args.storage, "--listen", args.listen,
+                                "--window-ms", str(window_ms), "--max-batch", str(max_batch)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = RemoteKnowledgeBase(args.listen)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            if client._request("GET", "/health")["ready"]:
+                return process
+        except (ConnectionError, OSError):
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise SystemExit("Server did not become ready in time")
+
+
+def run_load(args, questions: list[str]) -> tuple[list[float], float, dict]:
+    client = RemoteKnowledgeBase(args.listen)
+    client.search(questions[0], top_k=args.top_k)  # Encoder and index warm
+    queries = [f"{questions[i % len(questions)]} (case {i})" for i in range(args.requests)]
+
+    def timed_search(query: str) -> float:
+        started = time.perf_counter()
+        client.search(query, top_k=args.top_k)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        latencies = list(pool.map(timed_search, queries))
+    wall_s = time.perf_counter() - started
+    return latencies, wall_s, client._request("GET", "/stats")["batching"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage", default="storage_v2")
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--listen", default="unix:///tmp/medi_bench_server.sock")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 1, 2, 5, 10])
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=1000, help="Searches per window")
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--output", help="Write the rows as JSON")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()]
+
+    rows = []
+    for window_ms, max_batch in [(0, 1)] + [(w, args.max_batch) for w in args.windows]:
+        process = start_server(args, window_ms, max_batch)
+        try:
+            latencies, wall_s, batching = run_load(args, questions)
+        finally:
+            process.terminate()
+            process.wait()
+        rows.append({
+            "window_ms": window_ms, "max_batch": max_batch,
+            "qps": round(len(latencies) / wall_s, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "mean_batch": batching["mean_batch_size"],
+        })
+        row = rows[-1]
+        print(f"window {window_ms:>5g} ms  max_batch {max_batch:>3}  {row['qps']:>8} q/s  p50 {row['p50_ms']:>8} ms  "
+              f"p95 {row['p95_ms']:>8} ms  p99 {row['p99_ms']:>8} ms  mean batch {row['mean_batch']}")
+
+    print(f"\n{args.clients} clients, {args.requests} searches per row, top_k {args.top_k}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark: import time, time until the UI could render, and time to the first answered search.
+
+Usage (from the repo root, ideally with a saved database):
+    python -m benchmarks.bench_startup --storage storage_v2 --runs 5
+
+Every run is a fresh interpreter (like a container restart or a new Streamlit process):
+  imports  the modules app.py imports (rag_engine, llm_client, response_cache), and which heavy
+           modules (torch, sentence_transformers, faiss, pypdf, google.genai) they pulled in
+  eager    the old synchronous path: build the knowledge base, load the encoder and the index,
+           then search; the page stays blank until all of it is done
+  warm_up  ClinicalKnowledgeBase() + warm_up(): the UI is unblocked right away, and the first
+           search (issued immediately, the worst case) waits only for what is still loading
+Reported as medians over --runs, in seconds from interpreter start.
+"""
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "faiss", "pypdf", "google.genai")
+
+PRELUDE = """
+import time, sys, json
+t0 = time.perf_counter()
+import src.rag_engine, src.llm_client, src.response_cache
+t_import = time.perf_counter() - t0
+from src.rag_engine import ClinicalKnowledgeBase
+"""
+
+SCENARIOS = {
+    "imports": PRELUDE + """
+print(json.dumps({"import_s": t_import, "heavy_loaded": [m for m in HEAVY if m in sys.modules]}))
+""",
+    "eager": PRELUDE + """
+kb = ClinicalKnowledgeBase()
+kb.encoder
+kb.load_index(STORAGE)
+t_ui = time.perf_counter() - t0
+kb.search(QUERY)
+print(json.dumps({"import_s": t_import, "ui_unblocked_s": t_ui, "first_query_s": time.perf_counter() - t0}))
+""",
+    "warm_up": PRELUDE + """
+kb = ClinicalKnowledgeBase()
+kb.warm_up(STORAGE)
+t_ui = time.perf_counter() - t0
+kb.search(QUERY)
+t_query = time.perf_counter() - t0
+kb.wait_until_ready()
+print(json.dumps({"import_s": t_import, "ui_unblocked_s": t_ui, "first_query_s": t_query,
+                  "ready_s": time.perf_counter() - t0}))
+""",
+}
+
+
+def run(scenario: str, storage: str, query: str) -> dict:
+    header = f"HEAVY = {HEAVY_MODULES!r}\nSTORAGE = {storage!r}\nQUERY = {query!r}\n"
+    output = subprocess.run([sys.executable, "-c", header + SCENARIOS[scenario]],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])  # Last line: the model/index loaders print too
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage", default="storage_v2")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--query", default="When should drug therapy be started for hypertension?")
+    args = parser.parse_args()
+
+    for scenario in SCENARIOS:
+        results = [run(scenario, args.storage, args.query) for _ in range(args.runs)]
+        medians = {key: round(statistics.median(r[key] for r in results), 3)
+                   for key in results[0] if key != "heavy_loaded"}
+        line = "  ".join(f"{key} {value:.3f}" for key, value in medians.items())
+        print(f"{scenario:<8} {line}")
+        if scenario == "imports":
+            print(f"{'':<8} heavy modules loaded at import: {results[0]['heavy_loaded'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
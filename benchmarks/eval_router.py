@@ -0,0 +1,115 @@
+"""
+Query-router evaluation: latency saved by single-pass answers vs. agreement with the two-agent pipeline.
+
+Usage (from the repo root):
+    python -m benchmarks.eval_router --questions questions.jsonl --storage storage_v2 --backend gemini
+    python -m benchmarks.eval_router --questions bench_data/questions.jsonl --storage bench_data/storage \\
+        --backend stub --stub-latency 0.8 --stub-per-char 0.0002
+
+questions.jsonl: {"question": "..."} per line; an optional "complex": true/false label adds
+routing accuracy (the synthetic corpus questions are all simple dose lookups).
+
+For every question the router's decision is recorded, then BOTH pipelines are run on the
+same retrieved context: Researcher -> Writer, and the single combined call. Reported:
+  - routing split (and accuracy against labels, when present)
+  - latency of both paths, and the saving on the queries the router sends single-pass
+  - answer agreement on those queries: embedding cosine between the two answers and the
+    Jaccard overlap of their [Source, Page] citations
+"""
+import re
+import json
+import time
+import argparse
+import numpy as np
+
+from src.rag_engine import ClinicalKnowledgeBase
+from src.llm_client import GeminiClient
+from src.query_router import QueryRouter
+from src.stub_backend import StubGenAIClient
+
+CITATION = re.compile(r"\[Source: ['\"]?(.*?)['\"]?, Page: (\d+)\]")
+
+
+class _FixedRoute:
+    def __init__(self, decision: str):
+        self.decision = decision
+
+    def route(self, query: str) -> str:
+        return self.decision
+
+
+def timed_answer(client: GeminiClient, decision: str, context: str, question: str) -> tuple[str, float]:
+    client.router = _FixedRoute(decision)
+    started = time.perf_counter()
+    answer = client.orchestrate_response(context, question, [])
+    return answer, time.perf_counter() - started
+
+
+def citation_jaccard(a: str, b: str) -> float:
+    cites_a, cites_b = set(CITATION.findall(a)), set(CITATION.findall(b))
+    if not cites_a and not cites_b:
+        return 1.0
+    return len(cites_a & cites_b) / len(cites_a | cites_b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--storage", default="storage_v2")
+    parser.add_argument("--backend", choices=("stub", "gemini"), default="stub")
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-per-char", type=float, default=0.0001)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--output", help="Write per-question results as JSON")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()][:args.limit]
+
+    kb = ClinicalKnowledgeBase()
+    if not kb.load_index(args.storage):
+        raise SystemExit(f"No database in {args.storage}")
+    router = QueryRouter(kb.embed_query)
+    client = GeminiClient(client=StubGenAIClient(latency_s=args.stub_latency, per_char_latency_s=args.stub_per_char)
+                          if args.backend == "stub" else None)
+
+    rows = []
+    for item in items:
+        question = item["question"]
+        context = kb.search(question)
+        if not context:
+            continue
+        decision = router.route(question)
+        two_agent, two_agent_s = timed_answer(client, QueryRouter.TWO_AGENT, context, question)
+        single, single_s = timed_answer(client, QueryRouter.SINGLE_PASS, context, question)
+        vectors = kb.encoder.encode([two_agent, single], normalize_embeddings=True)
+        rows.append({
+            "question": question, "decision": decision, "label_complex": item.get("complex"),
+            "two_agent_s": two_agent_s, "single_pass_s": single_s,
+            "answer_cosine": float(vectors[0] @ vectors[1]),
+            "citation_jaccard": citation_jaccard(two_agent, single),
+        })
+
+    routed = [r for r in rows if r["decision"] == QueryRouter.SINGLE_PASS]
+    print(f"\n{len(rows)} questions: {len(routed)} single-pass, {len(rows) - len(routed)} two-agent")
+    labelled = [r for r in rows if r["label_complex"] is not None]
+    if labelled:
+        correct = sum((r["decision"] == QueryRouter.TWO_AGENT) == bool(r["label_complex"]) for r in labelled)
+        print(f"Routing accuracy vs labels: {correct / len(labelled):.1%} ({len(labelled)} labelled)")
+    print(f"Mean latency, all questions: two-agent {np.mean([r['two_agent_s'] for r in rows]):.2f}s, "
+          f"single-pass {np.mean([r['single_pass_s'] for r in rows]):.2f}s")
+    if routed:
+        saved = [r["two_agent_s"] - r["single_pass_s"] for r in routed]
+        print(f"Routed single-pass: mean saving {np.mean(saved):.2f}s/query "
+              f"({np.sum(saved) / np.sum([r['two_agent_s'] for r in rows]):.1%} of total pipeline time)")
+        print(f"Agreement on routed queries: answer cosine mean {np.mean([r['answer_cosine'] for r in routed]):.3f} "
+              f"(min {np.min([r['answer_cosine'] for r in routed]):.3f}), citation overlap "
+              f"{np.mean([r['citation_jaccard'] for r in routed]):.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
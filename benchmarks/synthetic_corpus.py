@@ -0,0 +1,121 @@
+"""
+Synthetic guideline corpus for offline benchmarks (no real PDFs or network needed).
+
+Usage (from the repo root):
+    python -m benchmarks.synthetic_corpus bench_data --pdfs 20 --pages 10
+
+Writes bench_data/pdfs/*.pdf and bench_data/questions.jsonl. Every page carries filler
+guideline prose plus one unique dosing fact; each question asks about one fact and is
+labelled with the page it lives on, in the format read by cli.py, bench_hybrid and
+bench_rerank: {"question": "...", "relevant": [{"source": "...", "page": n}]}.
+"""
+import os
+import json
+import random
+import argparse
+import textwrap
+
+CONDITIONS = [
+    "hypertension", "type 2 diabetes", "malaria", "tuberculosis", "community-acquired pneumonia",
+    "asthma", "heart failure", "chronic kidney disease", "hypothyroidism", "urinary tract infection",
+]
+DRUGS = [
+    "amlodipine", "metformin", "artesunate", "rifampicin", "amoxicillin", "salbutamol", "furosemide",
+    "lisinopril", "levothyroxine", "nitrofurantoin", "gliclazide", "doxycycline", "prednisolone",
+    "bisoprolol", "ceftriaxone", "primaquine", "isoniazid", "spironolactone", "insulin glargine",
+]
+POPULATIONS = ["adults", "children over 5 years", "elderly patients", "pregnant women", "patients with eGFR < 30"]
+FILLER = [
+    "Assess adherence and review the treatment plan at every follow-up visit.",
+    "Refer to a specialist if the target is not achieved within three months of therapy.",
+    "Baseline investigations include renal function, electrolytes and a full blood count.",
+    "Counsel the patient on lifestyle modification, including diet and physical activity.",
+    "Document contraindications and known allergies before initiating pharmacological therapy.",
+    "Threshold values should be confirmed with repeated measurements on separate occasions.",
+    "Stage the disease according to the national classification before selecting a regimen.",
+    "Monitor for adverse drug reactions and report serious events to the pharmacovigilance centre.",
+    "In resource-limited settings, use the first-line regimen listed in the essential medicines list.",
+    "Blood pressure of 140/90 mmHg or above on two occasions confirms the diagnosis.",
+]
+
+
+def write_pdf(path: str, pages: list[str], line_chars: int = 90):
+    """Minimal single-font PDF writer: one text page per string, word-wrapped (extractable by pypdf)."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", b""]  # 1: font, 2: page tree
+    kids = []
+    for text in pages:
+        lines = textwrap.wrap(text, line_chars) or [""]
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines]
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({line}) '" for line in escaped) + " ET")
+        stream = stream.encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(out_dir: str, n_pdfs: int = 20, pages_per_pdf: int = 10, n_questions: int = 50,
+                    seed: int = 0) -> tuple[list[str], str]:
+    """Writes the PDFs and the labelled question file. Returns (pdf_paths, questions_path)."""
+    rng = random.Random(seed)
+    pdf_dir = os.path.join(out_dir, "pdfs")
+    os.makedirs(pdf_dir, exist_ok=True)
+
+    facts, paths = [], []
+    for doc in range(n_pdfs):
+        condition = CONDITIONS[doc % len(CONDITIONS)]
+        source = f"guideline-{doc:03d}-{condition.replace(' ', '-')}.pdf"
+        pages = []
+        for page in range(1, pages_per_pdf + 1):
+            drug, population = rng.choice(DRUGS), rng.choice(POPULATIONS)
+            dose = rng.choice([2.5, 5, 10, 20, 25, 50, 100, 250, 500, 1000])
+            frequency = rng.choice(["once daily", "twice daily", "every 8 hours", "weekly"])
+            fact = (f"For {condition} in {population}, the recommended dose of {drug} is "
+                    f"{dose} mg {frequency} (guideline {doc}.{page}).")
+            body = [rng.choice(FILLER) for _ in range(rng.randint(12, 20))]
+            body.insert(rng.randrange(len(body)), fact)
+            pages.append(f"{condition.title()} Guideline {doc}, Section {page}. " + " ".join(body))
+            facts.append({
+                "question": f"What is the dose of {drug} for {condition} in {population} per guideline {doc}.{page}?",
+                "relevant": [{"source": source, "page": page}],
+            })
+        path = os.path.join(pdf_dir, source)
+        write_pdf(path, pages)
+        paths.append(path)
+
+    questions_path = os.path.join(out_dir, "questions.jsonl")
+    with open(questions_path, "w", encoding="utf-8") as f:
+        for item in rng.sample(facts, min(n_questions, len(facts))):
+            f.write(json.dumps(item) + "\n")
+    return paths, questions_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths, questions_path = generate_corpus(args.out_dir, args.pdfs, args.pages, args.questions, args.seed)
+    print(f"Wrote {len(paths)} PDFs ({args.pages} pages each) and {questions_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Headless entry point for the RAG pipeline (no Streamlit), for bulk runs and performance regressions.
+
+Usage (from the repo root):
+    python cli.py ingest guidelines/ --storage storage_v2
+    python cli.py query questions.jsonl --storage storage_v2 --backend stub --stub-latency 0.3
+    python cli.py ingest malaria_pdfs/ --collection malaria --tags malaria ne-india
+    python cli.py query questions.jsonl --collection malaria --source malaria_guidelines.pdf --page-range 10-40
+    python cli.py bench --pdfs 20 --pages 10 --output run.json --compare baseline.json
+    python cli.py serve --storage storage_v2 --listen unix:///tmp/medi.sock --window-ms 5
+
+  ingest  Incrementally indexes every PDF in a folder and saves the database.
+  query   Runs a JSONL question file ({"question": ...} per line, extra keys ignored) through
+          search() and orchestrate_response(), like the chat UI does.
+          --collection restricts the search to named collections (see src/knowledge_library.py);
+          --source / --page-range / --tag filter inside the index.
+  bench   Generates a synthetic corpus (benchmarks/synthetic_corpus.py), then runs ingest and
+          query on it with the stub backend. Fully offline.
+  serve   Runs the shared retrieval server (src/retrieval_server.py) until interrupted; point
+          app replicas at it with MEDI_RETRIEVAL_SERVER=<same address>.
+
+Every command prints a JSON report (per-stage latency percentiles, queries/sec, errors, pages/sec,
+peak memory, mean time per traced span); --output writes it to a file and --compare prints
+the change against an earlier report. --metrics-file writes the span histograms in the
+Prometheus text format, --trace-file appends every span as JSONL and --profile runs the
+command under cProfile.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from src.config import Config
+from src.rag_engine import ClinicalKnowledgeBase
+from src.knowledge_library import KnowledgeLibrary
+from src.search_filters import SearchFilter
+from src.llm_client import GeminiClient
+from src.stub_backend import StubGenAIClient
+from src.tracing import tracer
+
+STAGES = ("search_s", "researcher_s", "writer_s", "total_s")
+
+
+def peak_memory_mb() -> dict:
+    """Peak RSS of this process and of its (ingestion) worker processes. Unix only."""
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+    scale = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024  # bytes on macOS, KiB on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+def percentiles(values: list[float]) -> dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"n": 0}
+    ms = np.array(values) * 1000
+    return {
+        "n": len(values),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def make_llm_client(args, seed: int = 0) -> GeminiClient:
+    if args.backend == "stub":
+        stub = StubGenAIClient(latency_s=args.stub_latency, per_char_latency_s=args.stub_per_char,
+                               failure_rate=args.stub_failure_rate, seed=seed)
+        return GeminiClient(client=stub)
+    return GeminiClient()
+
+
+def run_ingest(args) -> dict:
+    paths = sorted(os.path.join(args.folder, name) for name in os.listdir(args.folder)
+                   if name.lower().endswith(".pdf"))
+    storage = KnowledgeLibrary.collection_path(args.storage, args.collection) if args.collection else args.storage
+    kb = ClinicalKnowledgeBase()
+    kb.load_index(storage)
+    kb.storage_dir = storage
+    summary = kb.load_and_process_pdfs(paths, prune_missing=args.prune, workers=args.workers, tags=args.tags)
+
+    started = time.perf_counter()
+    kb.save_index(storage)
+    save_s = time.perf_counter() - started
+    return {
+        "command": "ingest",
+        "collection": args.collection,
+        "documents": {key: len(summary[key]) for key in ("added", "updated", "skipped", "removed")},
+        "ingest": summary["stats"],
+        "save_s": round(save_s, 3),
+        "index": {"chunks": len(kb.chunks), "vectors": kb.index.ntotal if kb.index else 0},
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def run_query(args) -> dict:
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [json.loads(line)["question"] for line in f if line.strip()]
+    if args.limit:
+        questions = questions[:args.limit]
+
+    filters = SearchFilter(sources=args.source, tags=args.tag,
+                           pages=SearchFilter.parse_pages(args.page_range) if args.page_range else None)
+    if args.collection:
+        library = KnowledgeLibrary(args.storage)
+        missing = sorted(set(args.collection) - set(library.names()))
+        if missing:
+            raise SystemExit(f"No collection {', '.join(missing)} in {args.storage}")
+        search = lambda question: library.search(question, top_k=args.top_k, collections=args.collection,
+                                                  filters=filters)
+        cache_stats = lambda: {name: library.collection(name).cache_stats() for name in args.collection}
+    else:
+        kb = ClinicalKnowledgeBase()
+        if not kb.load_index(args.storage):
+            raise SystemExit(f"No database in {args.storage}")
+        search = lambda question: kb.search(question, top_k=args.top_k, filters=filters)
+        cache_stats = kb.cache_stats
+
+    # GeminiClient keeps per-request metrics on the instance: one client per worker thread.
+    # Each gets its own stub seed, otherwise every thread would inject the same failure sequence.
+    local = threading.local()
+    seeds = itertools.count()
+
+    def answer(question: str) -> dict:
+        if not hasattr(local, "client"):
+            local.client = make_llm_client(args, seed=next(seeds))
+        client = local.client
+        if client.check_is_casual(question):
+            started = time.perf_counter()
+            client.generate_lightweight_response(question)
+            return {"casual": True, "total_s": time.perf_counter() - started}
+
+        started = time.perf_counter()
+        context = search(question)
+        search_s = time.perf_counter() - started
+        if not context:
+            return {"casual": False, "empty": True, "error": None, "search_s": search_s, "total_s": search_s}
+        client.orchestrate_response(context, question, [], is_patient_mode=args.patient)
+        metrics = client.last_metrics
+        if metrics["error"]:
+            # "Researcher Error: ..." / "Writer Error: ..." came back as the answer: not a latency sample
+            return {"casual": False, "empty": False, "error": metrics["error"]}
+        researcher_s = metrics["researcher_s"]
+        return {
+            "casual": False,
+            "empty": False,
+            "error": None,
+            "context_chars": len(context),
+            "search_s": search_s,
+            "researcher_s": researcher_s,
+            "writer_s": metrics["total_s"] - researcher_s if researcher_s is not None else None,
+            "total_s": search_s + metrics["total_s"],
+        }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(answer, questions))
+    wall_s = time.perf_counter() - started
+
+    failed = [r for r in results if r.get("error")]
+    answered = len(results) - len(failed)
+    rag = [r for r in results if not r["casual"] and not r.get("error")]
+    return {
+        "command": "query",
+        "backend": args.backend,
+        "questions": len(questions),
+        "casual": sum(1 for r in results if r["casual"]),
+        "empty_context": sum(1 for r in rag if r["empty"]),
+        "errors": len(failed),
+        "error_rate": round(len(failed) / len(results), 4) if results else 0.0,
+        "errors_by_stage": {stage: sum(1 for r in failed if r["error"] == stage) for stage in ("researcher", "writer")},
+        "concurrency": args.concurrency,
+        "wall_s": round(wall_s, 3),
+        # Successful questions only: failed calls return fast and would inflate throughput
+        "queries_per_sec": round(answered / wall_s, 2) if wall_s else None,
+        "mean_context_chars": round(float(np.mean([r["context_chars"] for r in rag if not r["empty"]])), 1)
+        if any(not r["empty"] for r in rag) else 0,
+        "latency": {stage: percentiles([r.get(stage) for r in rag]) for stage in STAGES},
+        "filters": repr(filters) if filters else None,
+        "cache": cache_stats(),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def run_bench(args) -> dict:
+    from benchmarks.synthetic_corpus import generate_corpus
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="medi_bench_")
+    pdf_paths, questions_path = generate_corpus(workdir, args.pdfs, args.pages, args.n_questions)
+    args.folder, args.questions = os.path.dirname(pdf_paths[0]), questions_path
+    args.storage = os.path.join(workdir, "storage")
+    args.prune = False
+    args.collection = args.tags = None
+    report = {
+        "command": "bench",
+        "corpus": {"workdir": workdir, "pdfs": args.pdfs, "pages_per_pdf": args.pages},
+        "config": {"index_type": Config.INDEX_TYPE, "retrieval_mode": Config.RETRIEVAL_MODE,
+                   "rerank": Config.RERANK_ENABLED, "context_packing": Config.CONTEXT_PACKING},
+        "ingest": run_ingest(args),
+        "query": run_query(args),
+    }
+    report["peak_memory_mb"] = peak_memory_mb()
+    return report
+
+
+def run_serve(args):
+    from src.retrieval_server import RetrievalServer
+
+    kb = ClinicalKnowledgeBase()
+    kb.storage_dir = args.storage
+    kb.warm_up(args.storage)
+    server = RetrievalServer(kb, args.listen, storage_dir=args.storage, window_ms=args.window_ms,
+                             max_batch=args.max_batch).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(report: dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = flatten(json.load(f))
+    current = flatten(report)
+    print(f"\n{'metric':<48} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name], current[name]
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        print(f"{name:<48} {before:>12} {after:>12} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub):
+        sub.add_argument("--output", help="Write the JSON report to this file")
+        sub.add_argument("--compare", help="Earlier JSON report to diff against")
+        sub.add_argument("--metrics-file", help="Write Prometheus-format span metrics to this file")
+        sub.add_argument("--trace-file", help="Append every finished span to this JSONL file")
+        sub.add_argument("--profile", action="store_true", help="Run under cProfile (.prof in Config.PROFILE_DIR)")
+
+    def add_query_options(sub):
+        sub.add_argument("--backend", choices=("stub", "gemini"), default="stub")
+        sub.add_argument("--stub-latency", type=float, default=0.0, help="Stub: fixed seconds per call")
+        sub.add_argument("--stub-per-char", type=float, default=0.0, help="Stub: extra seconds per prompt char")
+        sub.add_argument("--stub-failure-rate", type=float, default=0.0)
+        sub.add_argument("--top-k", type=int, default=15)
+        sub.add_argument("--patient", action="store_true", help="Patient-friendly Writer prompt")
+        sub.add_argument("--concurrency", type=int, default=1, help="Questions in flight at once")
+        sub.add_argument("--limit", type=int, help="Only run the first N questions")
+        sub.add_argument("--source", nargs="+", help="Only search these documents (filenames)")
+        sub.add_argument("--page-range", help="Only search this page range, e.g. 10-40")
+        sub.add_argument("--tag", nargs="+", help="Only search documents with any of these tags")
+
+    ingest = commands.add_parser("ingest", help="Index a folder of PDFs")
+    ingest.add_argument("folder")
+    ingest.add_argument("--storage", default=Config.STORAGE_DIR)
+    ingest.add_argument("--workers", type=int, default=None)
+    ingest.add_argument("--prune", action="store_true", help="Drop indexed documents missing from the folder")
+    ingest.add_argument("--collection", help="Index into this named collection under --storage")
+    ingest.add_argument("--tags", nargs="+", help="Tags stored with every ingested document")
+    add_common(ingest)
+
+    query = commands.add_parser("query", help="Run a JSONL question file through the pipeline")
+    query.add_argument("questions")
+    query.add_argument("--storage", default=Config.STORAGE_DIR)
+    query.add_argument("--collection", nargs="+", help="Search only these named collections")
+    add_query_options(query)
+    add_common(query)
+
+    bench = commands.add_parser("bench", help="Synthetic corpus -> ingest -> query, offline")
+    bench.add_argument("--workdir", help="Corpus/storage folder (default: a new temp dir)")
+    bench.add_argument("--pdfs", type=int, default=20)
+    bench.add_argument("--pages", type=int, default=10)
+    bench.add_argument("--n-questions", type=int, default=50)
+    bench.add_argument("--workers", type=int, default=None)
+    add_query_options(bench)
+    add_common(bench)
+
+    serve = commands.add_parser("serve", help="Shared retrieval server with micro-batched queries")
+    serve.add_argument("--storage", default=Config.STORAGE_DIR)
+    serve.add_argument("--listen", default=Config.RETRIEVAL_SERVER_URL or "http://127.0.0.1:8765",
+                       help="http://host:port or unix:///path/to.sock")
+    serve.add_argument("--window-ms", type=float, default=Config.BATCH_WINDOW_MS)
+    serve.add_argument("--max-batch", type=int, default=Config.BATCH_MAX_SIZE)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        run_serve(args)
+        return
+    if args.trace_file:
+        tracer.export_path = args.trace_file
+    with tracer.profile(args.profile, label=args.command) as profile_result:
+        report = {"ingest": run_ingest, "query": run_query, "bench": run_bench}[args.command](args)
+    report["spans"] = tracer.summary()
+    if profile_result:
+        report["profile"] = profile_result["path"]
+        print(profile_result["top"], file=sys.stderr)
+    if args.metrics_file:
+        tracer.write_metrics(args.metrics_file)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import sys
+import time
+import random
+import asyncio
+from src.config import Config
+from src.llm_client import GeminiClient
+from src.query_router import QueryRouter
+from src.tracing import tracer
+
+# HTTP statuses worth retrying: rate limited, and transient server-side failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter: `rate` requests/sec sustained, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncGeminiClient(GeminiClient):
+    """
+    asyncio variant of GeminiClient for bulk workloads (e.g. nightly regression runs).
+
+    Same prompts, agents, metrics and tracing spans as GeminiClient. The coroutines are
+    named a* (aorchestrate_response, agenerate_lightweight_response) so the inherited
+    synchronous methods keep working unchanged. Every model call goes through a
+    concurrency semaphore, a token-bucket rate limiter and exponential-backoff retries
+    on transient errors. Unlike the synchronous client, failures are raised (after
+    retries) instead of being returned as "... Error:" strings; metrics["error"] still
+    names the failing stage, and batch_orchestrate records the error per query.
+    Pass client=StubGenAIClient(...) to run against a local fake backend.
+    """
+
+    def __init__(self, response_cache=None, client=None, router=None,
+                 max_concurrency: int = Config.ASYNC_MAX_CONCURRENCY,
+                 rate_limit_rps: float = Config.LLM_RATE_LIMIT_RPS,
+                 rate_limit_burst: int = Config.LLM_RATE_LIMIT_BURST,
+                 max_retries: int = Config.LLM_MAX_RETRIES):
+        super().__init__(response_cache=response_cache, client=client, router=router)
+        self.max_concurrency = max_concurrency
+        self.rate_limit_rps = rate_limit_rps
+        self.rate_limit_burst = rate_limit_burst
+        self.max_retries = max_retries
+        self.retry_count = 0
+        # asyncio primitives bind to the running loop: created lazily per event loop
+        self._loop = None
+        self._semaphore = None
+        self._bucket = None
+
+    async def agenerate_lightweight_response(self, query: str) -> str:
+        """Fast-track greeting reply (gemma); falls back to a canned greeting on failure."""
+        try:
+            with tracer.span("lightweight_call", model=self.FAST_TRACK_MODEL):
+                return (await self._generate(self.FAST_TRACK_MODEL, self._build_lightweight_prompt(query))).strip()
+        except Exception:
+            return self.LIGHTWEIGHT_FALLBACK
+
+    async def aorchestrate_response(self, context: str, query: str, chat_history: list,
+                                    is_patient_mode: bool = False, status_callback=None) -> str:
+        """Researcher -> Writer pipeline (see GeminiClient.orchestrate_response). Raises on failure."""
+        started = time.perf_counter()
+        metrics = {"query": query, "stream": False, "cache_hit": False, "route": None,
+                   "researcher_shards": None, "researcher_s": None, "ttft_s": None, "total_s": None, "error": None}
+        self.last_metrics = metrics
+        self.request_metrics.append(metrics)
+
+        if self.response_cache:
+            with tracer.span("answer_cache_lookup") as span:
+                cached = await asyncio.to_thread(self.response_cache.lookup, query, context, is_patient_mode)
+                span.set(hit=cached is not None)
+            if cached is not None:
+                metrics["cache_hit"] = True
+                metrics["ttft_s"] = metrics["total_s"] = time.perf_counter() - started
+                return cached
+
+        # The router embeds the query with the local encoder: keep it off the event loop
+        route = await asyncio.to_thread(self.router.route, query) if self.router else QueryRouter.TWO_AGENT
+        metrics["route"] = route
+        if route == QueryRouter.SINGLE_PASS:
+            if status_callback:
+                status_callback("⚡ Router: Simple lookup, answering in a single pass...")
+            writer_prompt = self._build_single_pass_prompt(context, query, chat_history, is_patient_mode)
+        else:
+            if status_callback:
+                status_callback("🕵️ Researcher Agent: Extracting strict clinical facts...")
+            shards = self._shard_context(context)
+            metrics["researcher_shards"] = len(shards)
+            try:
+                if len(shards) < 2:
+                    research_notes = await self._aresearch(context, query)
+                else:
+                    # Map-reduce Researcher: shard calls share the semaphore and rate limiter
+                    with tracer.span("researcher_map", shards=len(shards)) as parent:
+                        notes = await asyncio.gather(*(self._aresearch(shard, query, parent=parent)
+                                                       for _, shard in shards))
+                    research_notes = self._merge_notes(shards, notes)
+            except Exception:
+                metrics["total_s"] = time.perf_counter() - started
+                metrics["error"] = "researcher"
+                raise
+            metrics["researcher_s"] = time.perf_counter() - started
+            writer_prompt = self._build_writer_prompt(research_notes, query, chat_history, is_patient_mode)
+
+        if status_callback:
+            status_callback("✍️ Writer Agent: Synthesizing the answer...")
+        try:
+            with tracer.span("writer_call", model=self.AGENT_MODEL, prompt_chars=len(writer_prompt),
+                             stream=False, route=route) as writer_span:
+                answer = (await self._generate(self.AGENT_MODEL, writer_prompt)).strip()
+                writer_span.set(response_chars=len(answer))
+        except Exception:
+            metrics["total_s"] = time.perf_counter() - started
+            metrics["error"] = "writer"
+            raise
+        metrics["ttft_s"] = metrics["total_s"] = time.perf_counter() - started
+
+        if self.response_cache and answer:
+            await asyncio.to_thread(self.response_cache.store, query, context, is_patient_mode, answer)
+        return answer
+
+    async def batch_orchestrate(self, queries: list[str], knowledge_base, is_patient_mode: bool = False,
+                                top_k: int = 15) -> list[dict]:
+        """
+        Runs retrieval + Researcher + Writer for many queries at once. Each query is an
+        independent task, so retrieval for one overlaps with model calls for others; the
+        semaphore and rate limiter bound the load on the API.
+        Returns one dict per query, in input order:
+        {'query', 'context', 'answer', 'error', 'retrieval_s', 'total_s'}.
+        """
+        async def run_one(query: str) -> dict:
+            started = time.perf_counter()
+            result = {"query": query, "context": "", "answer": None, "error": None,
+                      "retrieval_s": None, "total_s": None}
+            try:
+                result["context"] = await asyncio.to_thread(knowledge_base.search, query, top_k)
+                result["retrieval_s"] = time.perf_counter() - started
+                if result["context"]:
+                    result["answer"] = await self.aorchestrate_response(result["context"], query, [],
+                                                                        is_patient_mode)
+                else:
+                    result["answer"] = "No relevant information found in the documents."
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["total_s"] = time.perf_counter() - started
+            return result
+
+        return await asyncio.gather(*(run_one(query) for query in queries))
+
+    async def _aresearch(self, context: str, query: str, parent=None) -> str:
+        prompt = self._build_researcher_prompt(context, query)
+        with tracer.span("researcher_call", parent=parent, model=self.AGENT_MODEL, prompt_chars=len(prompt)) as span:
+            notes = await self._generate(self.AGENT_MODEL, prompt)
+            span.set(response_chars=len(notes or ""))
+        return notes
+
+    # --- Transport: concurrency, rate limiting, retries ---
+    async def _generate(self, model: str, prompt: str) -> str:
+        self._bind_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    await self._bucket.acquire()
+                    response = await asyncio.wait_for(
+                        self.client.aio.models.generate_content(model=model, contents=prompt),
+                        timeout=Config.LLM_TIMEOUT_S
+                    )
+                return response.text
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_transient(e):
+                    raise
+                self.retry_count += 1
+                delay = Config.LLM_BACKOFF_BASE_S * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate_limit_rps, self.rate_limit_burst)
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+            return True
+        # google-genai surfaces network failures as httpx errors, which do not subclass the
+        # builtin ones. Not imported here: if the SDK never loaded httpx, it raised nothing from it
+        httpx = sys.modules.get("httpx")
+        if httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.NetworkError,
+                                                    httpx.RemoteProtocolError)):
+            return True
+        return getattr(error, "code", None) in RETRYABLE_STATUS
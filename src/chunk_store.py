@@ -0,0 +1,181 @@
+import os
+import json
+import mmap
+import numpy as np
+from collections.abc import MutableMapping
+
+
+class ChunkStore(MutableMapping):
+    """
+    Chunk metadata keyed by chunk ID: {id: {'text': "...", 'page': 1, 'source': "guidelines.pdf"}}.
+
+    On disk it is a compact columnar layout instead of a pickle:
+      chunk_text.bin     contiguous UTF-8 text blob
+      chunk_offsets.npy  int64 byte offsets into the blob (rows + 1)
+      chunk_ids.npy      int64 chunk IDs, sorted (row lookup is a binary search)
+      chunk_source.npy   int32 index into chunk_sources.json (interned source names)
+      chunk_page.npy     int32 page numbers
+    Opening maps the files instead of reading them, so loading is near-instant and only the
+    rows that are actually accessed (e.g. the hits returned by search) are materialized.
+    Writes go to an in-memory overlay until save().
+    """
+
+    TEXT_FILE = "chunk_text.bin"
+    OFFSETS_FILE = "chunk_offsets.npy"
+    IDS_FILE = "chunk_ids.npy"
+    SOURCE_FILE = "chunk_source.npy"
+    PAGE_FILE = "chunk_page.npy"
+    SOURCES_FILE = "chunk_sources.json"
+    FILES = (TEXT_FILE, OFFSETS_FILE, IDS_FILE, SOURCE_FILE, PAGE_FILE, SOURCES_FILE)
+
+    def __init__(self, items=None):
+        self._ids = np.empty(0, dtype="int64")
+        self._offsets = np.zeros(1, dtype="int64")
+        self._source_idx = np.empty(0, dtype="int32")
+        self._pages = np.empty(0, dtype="int32")
+        self._sources = []
+        self._text = b""
+        self._added = {}  # overlay: id -> chunk dict
+        self._deleted = set()  # IDs of on-disk rows removed since opening
+        if items:
+            self.update(items)
+
+    @classmethod
+    def exists(cls, folder_path: str) -> bool:
+        return all(os.path.exists(os.path.join(folder_path, name)) for name in cls.FILES)
+
+    @classmethod
+    def open(cls, folder_path: str) -> "ChunkStore":
+        """Memory-maps a store written by save()."""
+        store = cls()
+        path = lambda name: os.path.join(folder_path, name)
+        store._ids = np.load(path(cls.IDS_FILE), mmap_mode="r")
+        store._offsets = np.load(path(cls.OFFSETS_FILE), mmap_mode="r")
+        store._source_idx = np.load(path(cls.SOURCE_FILE), mmap_mode="r")
+        store._pages = np.load(path(cls.PAGE_FILE), mmap_mode="r")
+        with open(path(cls.SOURCES_FILE), encoding="utf-8") as f:
+            store._sources = json.load(f)
+        if os.path.getsize(path(cls.TEXT_FILE)):
+            with open(path(cls.TEXT_FILE), "rb") as f:
+                store._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return store
+
+    # --- Mapping interface ---
+    def __getitem__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        if chunk_id in self._added:
+            return self._added[chunk_id]
+        row = self._row(chunk_id)
+        if row < 0:
+            raise KeyError(chunk_id)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return {
+            "text": self._text[start:end].decode("utf-8"),
+            "page": int(self._pages[row]),
+            "source": self._sources[self._source_idx[row]]
+        }
+
+    def __setitem__(self, chunk_id, chunk: dict):
+        chunk_id = int(chunk_id)
+        if self._row(chunk_id) >= 0:
+            self._deleted.add(chunk_id)
+        self._added[chunk_id] = chunk
+
+    def __delitem__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        if chunk_id in self._added:
+            del self._added[chunk_id]
+        elif self._row(chunk_id) >= 0:
+            self._deleted.add(chunk_id)
+        else:
+            raise KeyError(chunk_id)
+
+    def __contains__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        return chunk_id in self._added or self._row(chunk_id) >= 0
+
+    def __iter__(self):
+        for chunk_id in self._ids.tolist():
+            if chunk_id not in self._deleted:
+                yield chunk_id
+        yield from list(self._added)
+
+    def __len__(self):
+        return len(self._ids) - len(self._deleted) + len(self._added)
+
+    def ids(self) -> np.ndarray:
+        """All live chunk IDs as an int64 array (without materializing any rows)."""
+        base = np.asarray(self._ids)
+        if self._deleted:
+            base = base[~np.isin(base, np.fromiter(self._deleted, dtype="int64"))]
+        return np.concatenate([base, np.fromiter(self._added, dtype="int64", count=len(self._added))])
+
+    def pages_of(self, chunk_ids) -> np.ndarray:
+        """Page number of each chunk ID (-1 if absent), vectorized over the on-disk rows."""
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        pages = np.full(len(chunk_ids), -1, dtype="int64")
+        if len(self._ids):
+            rows = np.minimum(np.searchsorted(self._ids, chunk_ids), len(self._ids) - 1)
+            found = np.asarray(self._ids)[rows] == chunk_ids
+            if self._deleted:
+                found &= ~np.isin(chunk_ids, np.fromiter(self._deleted, dtype="int64"))
+            pages[found] = np.asarray(self._pages)[rows[found]]
+        for i, chunk_id in enumerate(chunk_ids.tolist()):
+            if chunk_id in self._added:
+                pages[i] = self._added[chunk_id]["page"]
+        return pages
+
+    # --- Persistence ---
+    def save(self, folder_path: str):
+        """Writes the merged store (on-disk rows + overlay). Use ChunkStore.open() to map the result."""
+        ids = self.ids()
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+
+        sources = list(self._sources)
+        source_lookup = {name: i for i, name in enumerate(sources)}
+        offsets = np.zeros(len(ids) + 1, dtype="int64")
+        source_idx = np.empty(len(ids), dtype="int32")
+        pages = np.empty(len(ids), dtype="int32")
+
+        tmp = lambda name: os.path.join(folder_path, name + ".tmp")
+        with open(tmp(self.TEXT_FILE), "wb") as blob:
+            position = 0
+            for out_row, chunk_id in enumerate(ids.tolist()):
+                chunk = self._added.get(chunk_id)
+                if chunk is None:
+                    # Unchanged on-disk row: copy the raw bytes and codes, no decode/encode
+                    row = self._row(chunk_id)
+                    data = self._text[int(self._offsets[row]):int(self._offsets[row + 1])]
+                    source_idx[out_row] = self._source_idx[row]
+                    pages[out_row] = self._pages[row]
+                else:
+                    data = chunk["text"].encode("utf-8")
+                    if chunk["source"] not in source_lookup:
+                        source_lookup[chunk["source"]] = len(sources)
+                        sources.append(chunk["source"])
+                    source_idx[out_row] = source_lookup[chunk["source"]]
+                    pages[out_row] = chunk["page"]
+                blob.write(data)
+                position += len(data)
+                offsets[out_row + 1] = position
+
+        for name, array in ((self.OFFSETS_FILE, offsets), (self.IDS_FILE, ids),
+                            (self.SOURCE_FILE, source_idx), (self.PAGE_FILE, pages)):
+            with open(tmp(name), "wb") as f:
+                np.save(f, array)
+        with open(tmp(self.SOURCES_FILE), "w", encoding="utf-8") as f:
+            json.dump(sources, f)
+
+        for name in self.FILES:
+            os.replace(tmp(name), os.path.join(folder_path, name))
+
+    # --- Internals ---
+    def _row(self, chunk_id: int) -> int:
+        """Row of an on-disk chunk, or -1 if absent/deleted."""
+        if chunk_id in self._deleted or not len(self._ids):
+            return -1
+        row = int(np.searchsorted(self._ids, chunk_id))
+        if row < len(self._ids) and self._ids[row] == chunk_id:
+            return row
+        return -1
@@ -11,16 +11,69 @@ class Config:
     LLM_MODEL = "gemma-3-27b-it"
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+    # Encoder Backend (src/embeddings_service.py); ONNX variants need sentence-transformers[onnx]
+    ENCODER_BACKEND = "torch"  # torch | onnx | onnx_int8
+    ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"  # Dynamic int8 graph (published or exported locally)
+    ONNX_QUANTIZATION = "avx2"  # Quantization config used when exporting: avx2 | avx512 | avx512_vnni | arm64
+    ENCODER_EXPORT_DIR = "models"  # Local ONNX exports for models without published graphs
+    # Non-torch backends are checked against PyTorch at startup (loads both once) and refused below this
+    ENCODER_PARITY_MIN_COSINE = 0.98  # Lowest acceptable per-sentence cosine vs. the PyTorch output
+
     # RAG Settings
-    CHUNK_SIZE = 700
-    RETRIEVAL_K = 5  # Number of chunks to retrieve
-
-    # Clinical Keywords (Keep content only if it contains these)
-    KEYWORDS = [
-        "mmhg", "140/90", "130/80", "≥", "<=", ">=", ">",
-        "initiat", "start", "pharmacological", "drug", "therapy",
-        "threshold", "stage", "grade", "contraindication", "dose"
-    ]
+    QUERY_CACHE_SIZE = 1024  # Normalized query -> embedding (LRU)
+    RESULT_CACHE_SIZE = 256  # (query, top_k, filters, index version) -> formatted context (LRU)
+    FILTER_CACHE_SIZE = 64  # Resolved search filters (chunk ID sets / FAISS selectors)
+
+    # Hybrid Retrieval (BM25 + vector, merged with reciprocal-rank fusion)
+    RETRIEVAL_MODE = "hybrid"  # hybrid | dense | lexical
+    HYBRID_CANDIDATES = 50  # Candidates fetched from each retriever before fusion
+    RRF_K = 60  # RRF damping constant
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+
+    # Cross-Encoder Reranking (optional stage after retrieval)
+    RERANK_ENABLED = False
+    RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES = 30  # Over-fetched from the retriever and scored in one batch
+    RERANK_TOP_K = 6  # Chunks kept for the Researcher prompt
+    RERANK_BUDGET_MS = 150  # Per-query scoring budget; over it, vector order is kept
+    RERANK_BATCH_SIZE = 32
+
+    # Context Packing (retrieved chunks -> Researcher context)
+    CONTEXT_PACKING = True  # Merge overlapping windows, drop near-duplicates, enforce the budget
+    CONTEXT_TOKEN_BUDGET = 3000  # Max context tokens (~4 chars/token) passed to the Researcher
+    CONTEXT_DEDUP_THRESHOLD = 0.8  # Drop a span if this share of its 5-word shingles is already packed
+    CONTEXT_MIN_OVERLAP = 50  # Min shared chars to stitch two windows of the same page
+    CONTEXT_MIN_SPAN_TOKENS = 64  # Don't pack a truncated span shorter than this
+
+    # Ingestion Settings
+    INGEST_WORKERS = max(1, (os.cpu_count() or 1) - 1)  # > 1 enables parallel page extraction
+    PAGES_PER_TASK = 8  # Pages handed to a worker process per task
+    EMBED_BATCH_SIZE = 64  # Chunks per encoder call (also the resume granularity)
+    # Near-duplicate chunks (MinHash LSH) are collapsed into one indexed chunk with all citations.
+    # Chunks whose numbers differ (doses, thresholds) are never collapsed, however similar.
+    DEDUP_ENABLED = True
+    DEDUP_THRESHOLD = 0.9  # Min estimated Jaccard similarity of 5-word shingles
+    DEDUP_NUM_PERM = 64  # MinHash signature length
+    DEDUP_BANDS = 8  # LSH bands (8 x 8 rows: chunks at 0.9 similarity are compared ~99% of the time)
+    STORAGE_DIR = "storage_v2"  # Index, metadata and float16 embedding store
+
+    # Semantic Answer Cache (in front of the Researcher/Writer agents)
+    RESPONSE_CACHE_PATH = os.path.join(STORAGE_DIR, "response_cache.sqlite")
+    RESPONSE_CACHE_TTL_SECONDS = 24 * 3600
+    RESPONSE_CACHE_MAX_ENTRIES = 5000
+    RESPONSE_CACHE_SIMILARITY = 0.95  # Min cosine similarity between queries to reuse an answer
+
+    # Vector Index Settings (embeddings are normalized: inner product == cosine)
+    INDEX_TYPE = "flat_ip"  # flat_ip | flat_l2 | ivf_flat | ivf_pq | hnsw
+    INDEX_TRAIN_SAMPLE = 100_000  # Max vectors used to train IVF / PQ at build time
+    IVF_NLIST = 1024  # Max IVF cells (capped at ~4*sqrt(N) for small corpora)
+    IVF_NPROBE = 16  # Query time: cells visited per search
+    PQ_M = 48  # PQ sub-quantizers; must divide the embedding dimension (384 for MiniLM)
+    PQ_NBITS = 8
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 200
+    HNSW_EF_SEARCH = 64  # Query time: candidate list size
 
     # Safety Guardrails
     UNSAFE_PATTERNS = [
@@ -28,5 +81,42 @@ class Config:
         r"\bpreferred drug\b", r"\bwhich drug\b"
     ]
 
-    if not API_KEY:
-        raise ValueError("GEMINI_API_KEY is missing from .env file")
\ No newline at end of file
+    # Tracing & Metrics (src/tracing.py)
+    TRACE_ENABLED = True
+    TRACE_BUFFER_SIZE = 2000  # Recent spans kept in memory
+    TRACE_EXPORT_PATH = os.getenv("MEDI_TRACE_FILE")  # Append finished spans as JSONL when set
+    METRICS_PORT = int(os.getenv("MEDI_METRICS_PORT", "0"))  # Prometheus /metrics endpoint; 0 = off
+    PROFILE_DIR = os.path.join(STORAGE_DIR, "profiles")  # cProfile dumps of profiled requests
+
+    # Query Router (src/query_router.py): single-pass answers for simple lookups
+    ROUTER_ENABLED = False  # Enable after checking benchmarks/eval_router.py on your question set
+    ROUTER_MARGIN = 0.02  # Min cosine advantage of the simple-lookup centroid over the complex one
+    ROUTER_MAX_WORDS = 25  # Longer questions always take the two-agent path
+
+    # Retrieval Server (cli.py serve): one process owns the encoder + index for all app replicas
+    RETRIEVAL_SERVER_URL = os.getenv("MEDI_RETRIEVAL_SERVER")  # e.g. http://127.0.0.1:8765 or unix:///tmp/medi.sock
+    BATCH_WINDOW_MS = 5.0  # How long the server waits to gather concurrent queries into one batch
+    BATCH_MAX_SIZE = 64  # Queries per encoder call / FAISS search
+    RETRIEVAL_TIMEOUT_S = 60  # Client-side timeout per request (ingestion requests can be slow)
+    RETRIEVAL_STARTUP_TIMEOUT_S = 300  # How long clients wait for the server to finish its warm-up
+
+    # Map-Reduce Researcher: one concurrent Researcher call per source document
+    MAP_REDUCE_ENABLED = False
+    MAP_REDUCE_MIN_TOKENS = 2000  # Smaller contexts keep the single Researcher call
+    MAP_REDUCE_MAX_SHARDS = 4  # More sources than this are bin-packed into this many shards
+    MAP_REDUCE_WORKERS = 4  # Threads running shard calls concurrently
+
+    # Async / Batch LLM Client
+    ASYNC_MAX_CONCURRENCY = 8  # Max in-flight model calls
+    LLM_RATE_LIMIT_RPS = 5.0  # Token-bucket refill rate (requests/sec)
+    LLM_RATE_LIMIT_BURST = 10  # Token-bucket capacity
+    LLM_MAX_RETRIES = 4  # Retries on transient errors (429/5xx/timeouts)
+    LLM_BACKOFF_BASE_S = 0.5  # Exponential backoff: base * 2^attempt (+ jitter)
+    LLM_TIMEOUT_S = 120  # Per-call timeout
+
+    @classmethod
+    def require_api_key(cls) -> str:
+        """Checked when a real Gemini client is created (stub backends don't need a key)."""
+        if not cls.API_KEY:
+            raise ValueError("GEMINI_API_KEY is missing from .env file")
+        return cls.API_KEY
@@ -0,0 +1,133 @@
+import re
+import threading
+from src.config import Config
+
+SHINGLE_WORDS = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for English guideline text (no tokenizer round-trip)."""
+    return max(1, len(text) // 4)
+
+
+def format_chunk(source: str, page: int, text: str, also=None) -> str:
+    """
+    Citation tag parsed by the Writer prompt and display_source_chips (app.py). also: extra
+    (source, page) citations of near-duplicate chunks collapsed into this one at ingestion.
+    """
+    tags = [f"[Source: '{source}', Page: {page}]"] + [f"[Source: '{s}', Page: {p}]" for s, p in also or ()]
+    return " ".join(tags) + f"\n{text}"
+
+
+class ContextPacker:
+    """
+    Assembles retrieved chunks into the Researcher context:
+      1. Overlapping windows from the same source and page (_sliding_window_chunking
+         overlaps them by 300 chars) are stitched back into one contiguous span.
+      2. Spans whose word shingles are mostly covered by a more relevant span are dropped
+         (repeated tables, boilerplate, re-extracted pages).
+      3. Spans are packed in relevance order (best chunk rank) into token_budget; a span that
+         does not fit is cut at a sentence boundary if enough budget is left, otherwise skipped.
+    Every span keeps its [Source: ..., Page: ...] tag.
+    """
+
+    def __init__(self, token_budget: int = Config.CONTEXT_TOKEN_BUDGET,
+                 dedup_threshold: float = Config.CONTEXT_DEDUP_THRESHOLD,
+                 min_overlap: int = Config.CONTEXT_MIN_OVERLAP,
+                 min_span_tokens: int = Config.CONTEXT_MIN_SPAN_TOKENS):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.min_overlap = min_overlap
+        self.min_span_tokens = min_span_tokens
+        self._stats_lock = threading.Lock()
+        self.contexts = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def pack(self, hits: list[dict]) -> str:
+        """hits: chunk dicts ({'text', 'page', 'source'}, optional 'also' citations) in relevance order, best first."""
+        spans = self._merge_spans(hits)
+
+        parts, covered, used = [], set(), 0
+        for span in spans:
+            shingles = self._shingles(span["text"])
+            if shingles and len(shingles & covered) / len(shingles) >= self.dedup_threshold:
+                continue
+
+            text = span["text"]
+            remaining = self.token_budget - used
+            if estimate_tokens(text) > remaining:
+                if remaining < self.min_span_tokens:
+                    continue
+                text = self._truncate(text, remaining * 4)
+            parts.append(format_chunk(span["source"], span["page"], text, span["also"]))
+            covered |= shingles
+            used += estimate_tokens(text)
+
+        with self._stats_lock:
+            self.contexts += 1
+            self.tokens_in += sum(estimate_tokens(item["text"]) for item in hits)
+            self.tokens_out += used
+        return "\n\n".join(parts)
+
+    def _merge_spans(self, hits: list[dict]) -> list[dict]:
+        """Stitches overlapping chunks per (source, page); spans are ordered by their best member's rank."""
+        groups = {}
+        for rank, item in enumerate(hits):
+            groups.setdefault((item["source"], item["page"]), []).append(
+                {"text": item["text"], "page": item["page"], "source": item["source"], "rank": rank,
+                 "also": list(item.get("also") or ())})
+
+        spans = []
+        for members in groups.values():
+            merged = True
+            while merged and len(members) > 1:
+                merged = False
+                for i in range(len(members)):
+                    for j in range(i + 1, len(members)):
+                        text = self._merge_text(members[i]["text"], members[j]["text"])
+                        if text is not None:
+                            members[i]["text"] = text
+                            members[i]["rank"] = min(members[i]["rank"], members[j]["rank"])
+                            members[i]["also"] += [c for c in members[j]["also"] if c not in members[i]["also"]]
+                            del members[j]
+                            merged = True
+                            break
+                    if merged:
+                        break
+            spans.extend(members)
+        return sorted(spans, key=lambda span: span["rank"])
+
+    def _merge_text(self, a: str, b: str) -> str | None:
+        """a and b joined on their shared overlap (either order), or None if they don't overlap."""
+        if b in a:
+            return a
+        if a in b:
+            return b
+        for first, second in ((a, b), (b, a)):
+            probe = second[:self.min_overlap]
+            pos = first.find(probe)
+            while pos != -1:
+                if second.startswith(first[pos:]):
+                    return first[:pos] + second
+                pos = first.find(probe, pos + 1)
+        return None
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        words = re.findall(r"\w+", text.lower())
+        return {hash(tuple(words[i:i + SHINGLE_WORDS])) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+
+    @staticmethod
+    def _truncate(text: str, max_chars: int) -> str:
+        cut = text[:max_chars]
+        boundary = cut.rfind(". ")
+        return cut[:boundary + 1] if boundary > max_chars // 2 else cut
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "contexts": self.contexts,
+                "mean_tokens_in": round(self.tokens_in / self.contexts) if self.contexts else 0,
+                "mean_tokens_out": round(self.tokens_out / self.contexts) if self.contexts else 0,
+            }
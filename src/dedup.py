@@ -0,0 +1,120 @@
+import os
+import re
+import zlib
+import hashlib
+import numpy as np
+from src.config import Config
+
+SHINGLE_WORDS = 5
+# Universal hashing (a * h + b) mod P over 32-bit shingle hashes; a < 2^31 keeps a * h + b inside uint64
+_PRIME = np.uint64(4294967311)
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,/]\d+)*")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class MinHashIndex:
+    """
+    MinHash + LSH over 5-word shingles, for near-duplicate chunk detection at ingestion.
+
+    A chunk's signature is the minimum of num_perm hash permutations over its shingles; the
+    share of equal positions between two signatures estimates their Jaccard similarity. The
+    signature is split into `bands` buckets so only chunks sharing a whole band are compared.
+    A candidate counts as a duplicate only if the estimate reaches `threshold` AND both chunks
+    contain exactly the same numbers: revised editions and regional variants often differ in
+    a single dose or threshold, and those must stay separate chunks.
+    Keyed by canonical (indexed) chunk ID; persisted as minhash.npz next to index.faiss.
+    """
+
+    FILE = "minhash.npz"
+
+    def __init__(self, num_perm: int = Config.DEDUP_NUM_PERM, bands: int = Config.DEDUP_BANDS,
+                 threshold: float = Config.DEDUP_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        rng = np.random.default_rng(1)  # Fixed: signatures must be comparable across runs
+        self._a = rng.integers(1, 2 ** 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+        self.signatures = {}  # chunk_id -> (uint32 signature, numbers fingerprint)
+        self._buckets = [{} for _ in range(bands)]  # band -> {band bytes: set(chunk_id)}
+
+    def signature(self, text: str) -> tuple[np.ndarray, int]:
+        words = WORD_PATTERN.findall(text.lower())
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        signature = ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+        numbers = "\0".join(sorted(NUMBER_PATTERN.findall(text)))
+        fingerprint = int.from_bytes(hashlib.blake2b(numbers.encode("utf-8"), digest_size=8).digest(), "big") >> 1
+        return signature, fingerprint
+
+    def find_duplicate(self, signature: tuple[np.ndarray, int]) -> int | None:
+        """Most similar indexed chunk at or above the threshold (with identical numbers), else None."""
+        sig, fingerprint = signature
+        candidates = set()
+        for band, key in enumerate(self._band_keys(sig)):
+            candidates |= self._buckets[band].get(key, set())
+        best_id, best_score = None, self.threshold
+        for chunk_id in candidates:
+            other_sig, other_fingerprint = self.signatures[chunk_id]
+            if other_fingerprint != fingerprint:
+                continue
+            score = float(np.mean(sig == other_sig))
+            if score >= best_score:
+                best_id, best_score = chunk_id, score
+        return best_id
+
+    def add(self, chunk_id: int, signature: tuple[np.ndarray, int]):
+        self.signatures[chunk_id] = signature
+        for band, key in enumerate(self._band_keys(signature[0])):
+            self._buckets[band].setdefault(key, set()).add(chunk_id)
+
+    def remove(self, chunk_id: int):
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+        for band, key in enumerate(self._band_keys(signature[0])):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, sig: np.ndarray) -> list[bytes]:
+        rows = self.num_perm // self.bands
+        return [sig[band * rows:(band + 1) * rows].tobytes() for band in range(self.bands)]
+
+    # --- Persistence ---
+    def save(self, folder_path: str):
+        ids = np.fromiter(self.signatures, dtype="int64", count=len(self.signatures))
+        sigs = np.array([self.signatures[cid][0] for cid in ids.tolist()], dtype=np.uint32).reshape(len(ids), self.num_perm)
+        fingerprints = np.array([self.signatures[cid][1] for cid in ids.tolist()], dtype="int64")
+        tmp_path = os.path.join(folder_path, self.FILE + ".tmp.npz")
+        np.savez(tmp_path, ids=ids, signatures=sigs, fingerprints=fingerprints,
+                 params=np.array([self.num_perm, self.bands]))
+        os.replace(tmp_path, os.path.join(folder_path, self.FILE))
+
+    @classmethod
+    def exists(cls, folder_path: str) -> bool:
+        return os.path.exists(os.path.join(folder_path, cls.FILE))
+
+    @classmethod
+    def load(cls, folder_path: str) -> "MinHashIndex":
+        with np.load(os.path.join(folder_path, cls.FILE)) as data:
+            num_perm, bands = (int(v) for v in data["params"])
+            index = cls(num_perm, bands)
+            for chunk_id, sig, fingerprint in zip(data["ids"].tolist(), data["signatures"], data["fingerprints"].tolist()):
+                index.add(chunk_id, (sig, fingerprint))
+        return index
+
+    @classmethod
+    def from_chunks(cls, chunks) -> "MinHashIndex":
+        """Builds the index from an existing chunk store (stores saved before deduplication existed)."""
+        index = cls()
+        for chunk_id, item in chunks.items():
+            index.add(chunk_id, index.signature(item["text"]))
+        return index
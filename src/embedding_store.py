@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped store of raw chunk embeddings (float16) keyed by chunk ID.
+
+    Lives next to index.faiss so the FAISS index can be rebuilt (or switched to another
+    index type) without re-running the encoder. Each appended batch is fsynced and then
+    committed to the header, so an interrupted ingestion resumes from the last completed
+    batch: vectors for IDs already in the store are reused instead of re-encoded.
+
+    Files: embeddings.f16 (rows x dim), embedding_ids.i64 (one ID per row), embeddings.json (header).
+    """
+
+    VECTORS_FILE = "embeddings.f16"
+    IDS_FILE = "embedding_ids.i64"
+    HEADER_FILE = "embeddings.json"
+    FILES = (VECTORS_FILE, IDS_FILE, HEADER_FILE)
+
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self.dim = None
+        self.rows = 0
+        self._sorted_ids = np.empty(0, dtype="int64")
+        self._sorted_rows = np.empty(0, dtype="int64")
+        self._recent = {}  # id -> row, for rows appended since the sorted lookup was built
+
+        header_path = self._path(self.HEADER_FILE)
+        if os.path.exists(header_path):
+            with open(header_path, encoding="utf-8") as f:
+                header = json.load(f)
+            self.dim, self.rows = header["dim"], header["rows"]
+            self._truncate_uncommitted()
+            self._build_lookup()
+
+    # --- Writing ---
+    def append(self, chunk_ids: list[int], embeddings: np.ndarray):
+        """Appends one batch and commits it; the rows are durable once this returns."""
+        embeddings = np.asarray(embeddings)
+        if self.dim is None:
+            os.makedirs(self.folder_path, exist_ok=True)
+            self.dim = embeddings.shape[1]
+
+        for name, payload in ((self.VECTORS_FILE, embeddings.astype("float16")),
+                              (self.IDS_FILE, np.asarray(chunk_ids, dtype="int64"))):
+            with open(self._path(name), "ab") as f:
+                f.write(payload.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        for offset, chunk_id in enumerate(chunk_ids):
+            self._recent[int(chunk_id)] = self.rows + offset
+        self.rows += len(chunk_ids)
+        self._write_header()
+
+        if len(self._recent) > 65536:
+            self._build_lookup()
+
+    def retain(self, live_ids, batch_size: int = 65536):
+        """Rewrites the store keeping only live_ids (drops removed and orphaned rows)."""
+        rows = self.lookup(live_ids)
+        rows = np.unique(rows[rows >= 0])
+        if len(rows) == self.rows:
+            return
+
+        vectors, ids = self.vectors(), self.ids()
+        tmp_vectors, tmp_ids = self._path(self.VECTORS_FILE + ".tmp"), self._path(self.IDS_FILE + ".tmp")
+        with open(tmp_vectors, "wb") as fv, open(tmp_ids, "wb") as fi:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                fv.write(np.ascontiguousarray(vectors[batch]).tobytes())
+                fi.write(np.ascontiguousarray(ids[batch]).tobytes())
+        del vectors, ids
+
+        os.replace(tmp_vectors, self._path(self.VECTORS_FILE))
+        os.replace(tmp_ids, self._path(self.IDS_FILE))
+        self.rows = len(rows)
+        self._write_header()
+        self._build_lookup()
+
+    # --- Reading ---
+    def vectors(self) -> np.ndarray:
+        """Read-only float16 view of all rows (rows x dim)."""
+        if not self.rows:
+            return np.empty((0, self.dim or 0), dtype="float16")
+        return np.memmap(self._path(self.VECTORS_FILE), dtype="float16", mode="r", shape=(self.rows, self.dim))
+
+    def ids(self) -> np.ndarray:
+        if not self.rows:
+            return np.empty(0, dtype="int64")
+        return np.memmap(self._path(self.IDS_FILE), dtype="int64", mode="r", shape=(self.rows,))
+
+    def lookup(self, chunk_ids) -> np.ndarray:
+        """Row number for each chunk ID, -1 where the ID is not stored."""
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        rows = np.full(len(chunk_ids), -1, dtype="int64")
+
+        if len(self._sorted_ids) and len(chunk_ids):
+            pos = np.minimum(np.searchsorted(self._sorted_ids, chunk_ids), len(self._sorted_ids) - 1)
+            hit = self._sorted_ids[pos] == chunk_ids
+            rows[hit] = self._sorted_rows[pos[hit]]
+
+        if self._recent:
+            for i, chunk_id in enumerate(chunk_ids.tolist()):
+                row = self._recent.get(chunk_id)
+                if row is not None:
+                    rows[i] = row
+        return rows
+
+    def read(self, rows: np.ndarray) -> np.ndarray:
+        """Materializes the given rows as a float32 matrix (the dtype FAISS expects)."""
+        return np.asarray(self.vectors()[rows], dtype="float32")
+
+    def iter_batches(self, chunk_ids, batch_size: int = 4096):
+        """Yields (ids, float32 vectors) for the stored subset of chunk_ids, batch by batch."""
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        for start in range(0, len(chunk_ids), batch_size):
+            batch_ids = chunk_ids[start:start + batch_size]
+            rows = self.lookup(batch_ids)
+            found = rows >= 0
+            if found.any():
+                yield batch_ids[found], self.read(rows[found])
+
+    # --- Internals ---
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder_path, name)
+
+    def _write_header(self):
+        tmp_path = self._path(self.HEADER_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "rows": self.rows, "dtype": "float16"}, f)
+        os.replace(tmp_path, self._path(self.HEADER_FILE))
+
+    def _truncate_uncommitted(self):
+        """Drops the tail of a batch that was being written when the process died."""
+        for name, row_bytes in ((self.VECTORS_FILE, self.dim * 2), (self.IDS_FILE, 8)):
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > self.rows * row_bytes:
+                with open(path, "r+b") as f:
+                    f.truncate(self.rows * row_bytes)
+
+    def _build_lookup(self):
+        ids = np.array(self.ids())
+        order = np.argsort(ids, kind="stable")
+        self._sorted_ids, self._sorted_rows = ids[order], order.astype("int64")
+        self._recent = {}
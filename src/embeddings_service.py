@@ -1,16 +1,100 @@
-from sentence_transformers import SentenceTransformer
+import os
+import threading
+from typing import TYPE_CHECKING
+import numpy as np
+from src.config import Config
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 # Small, fast, very common baseline model
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_NAME = Config.EMBEDDING_MODEL
+
+# Encoder backends (Config.ENCODER_BACKEND):
+#   torch      PyTorch fp32 (reference)
+#   onnx       the same model as an ONNX graph run by onnxruntime (fp32)
+#   onnx_int8  ONNX graph with dynamic int8 quantization (fastest on CPU, small accuracy loss)
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+# Fixed sentences for the parity check: short queries and guideline-style passages
+PARITY_SAMPLES = [
+    "What is the starting dose of amlodipine for hypertension?",
+    "When should pharmacological therapy be initiated at 140/90 mmHg?",
+    "Artesunate dosing for severe malaria in children",
+    "HbA1c threshold for intensifying diabetes treatment",
+    "Contraindications to metformin in chronic kidney disease",
+    "Blood pressure of 140/90 mmHg or above on two occasions confirms the diagnosis. "
+    "Start a calcium channel blocker such as amlodipine 5 mg once daily in adults.",
+    "In P. falciparum malaria outside the north-east, give artemether-lumefantrine for three days; "
+    "add a single dose of primaquine 0.75 mg/kg on day 2.",
+    "Refer to a specialist if the target is not achieved within three months of therapy.",
+]
 
+# Process-wide singleton: every ClinicalKnowledgeBase / session shares one copy of the model
 _model = None
+_model_lock = threading.Lock()
 
 def load_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer(MODEL_NAME)
+        with _model_lock:
+            if _model is None:
+                model = create_encoder(Config.ENCODER_BACKEND)
+                if Config.ENCODER_BACKEND != "torch":
+                    # Raises on failure (surfaced as the warm-up error); the encoder is not cached
+                    check_parity(model)
+                _model = model
     return _model
 
+def create_encoder(backend: str = "torch") -> "SentenceTransformer":
+    """
+    Builds a new encoder for the given backend (see BACKENDS). Both ONNX variants use the
+    graphs published with the model when available; otherwise the model is exported (and
+    quantized) once into Config.ENCODER_EXPORT_DIR and loaded from there on later starts.
+    sentence_transformers (and torch) are imported here, not at module import.
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    print(f"Loading Embedding Model: {MODEL_NAME} ({backend})...")
+    if backend == "torch":
+        return SentenceTransformer(MODEL_NAME)
+
+    file_name = Config.ONNX_INT8_FILE if backend == "onnx_int8" else "onnx/model.onnx"
+    export_dir = os.path.join(Config.ENCODER_EXPORT_DIR, MODEL_NAME.replace("/", "__"))
+    if os.path.exists(os.path.join(export_dir, file_name)):
+        return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+    try:
+        return SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs={"file_name": file_name})
+    except Exception as e:
+        print(f"No published {file_name} for {MODEL_NAME} ({e}); exporting locally...")
+
+    # backend="onnx" exports the fp32 graph on the fly when the repo has none
+    model = SentenceTransformer(MODEL_NAME, backend="onnx")
+    model.save_pretrained(export_dir)
+    if backend == "onnx_int8":
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        export_dynamic_quantized_onnx_model(model, Config.ONNX_QUANTIZATION, export_dir)
+    return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+def check_parity(model: "SentenceTransformer", reference: "SentenceTransformer | None" = None,
+                 threshold: float = Config.ENCODER_PARITY_MIN_COSINE, texts: list[str] | None = None) -> float:
+    """
+    Compares the model against the PyTorch reference on the same inputs. Returns the lowest
+    per-sentence cosine similarity and raises if it is below threshold (vectors from the two
+    backends must stay interchangeable, since the index is built with whichever was active).
+    """
+    texts = texts or PARITY_SAMPLES
+    reference = reference or create_encoder("torch")
+    ours = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    theirs = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    min_cosine = float(np.min(np.sum(ours * theirs, axis=1)))
+    if min_cosine < threshold:
+        raise ValueError(f"Encoder parity check failed: min cosine {min_cosine:.4f} < {threshold} "
+                         f"against the PyTorch model")
+    print(f"Encoder parity OK: min cosine {min_cosine:.4f} vs PyTorch")
+    return min_cosine
+
 def get_embeddings(texts: list[str]) -> list[list[float]]:
     """
     Generate embeddings locally using HuggingFace.
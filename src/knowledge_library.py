@@ -0,0 +1,97 @@
+import os
+import re
+import threading
+from src.config import Config
+from src.rag_engine import ClinicalKnowledgeBase
+from src.reranker import CrossEncoderReranker
+from src.context_packing import ContextPacker
+from src.lexical_index import reciprocal_rank_fusion
+from src.search_filters import SearchFilter
+from src.tracing import tracer
+
+COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+class KnowledgeLibrary:
+    """
+    Named collections (e.g. "malaria", "hypertension", "paediatrics"), each a separate
+    ClinicalKnowledgeBase with its own index, chunk store and manifest under
+    <root>/collections/<name>/. A search is routed only to the collections it names, so a
+    malaria question never scans the hypertension index; candidates from several
+    collections are merged with reciprocal-rank fusion before reranking and packing.
+    Collections share the process-wide encoder and one reranker / context packer.
+    """
+
+    def __init__(self, root: str = Config.STORAGE_DIR):
+        self.root = root
+        self._collections = {}
+        self._lock = threading.Lock()
+        self.reranker = CrossEncoderReranker() if Config.RERANK_ENABLED else None
+        self.context_packer = ContextPacker() if Config.CONTEXT_PACKING else None
+
+    @staticmethod
+    def collection_path(root: str, name: str) -> str:
+        if not COLLECTION_NAME.fullmatch(name):
+            raise ValueError(f"Invalid collection name '{name}': use letters, digits, '-', '_' and '.'")
+        return os.path.join(root, "collections", name)
+
+    def names(self) -> list[str]:
+        """Collections saved under the root folder, plus any created in this process."""
+        folder = os.path.join(self.root, "collections")
+        saved = [name for name in os.listdir(folder)
+                 if os.path.exists(os.path.join(folder, name, "index.faiss"))] if os.path.isdir(folder) else []
+        return sorted(set(saved) | set(self._collections))
+
+    def collection(self, name: str, create: bool = False) -> ClinicalKnowledgeBase:
+        """The knowledge base of one collection, loaded from disk on first use."""
+        with self._lock:
+            kb = self._collections.get(name)
+            if kb is None:
+                path = self.collection_path(self.root, name)
+                if not create and not os.path.exists(os.path.join(path, "index.faiss")):
+                    raise KeyError(f"No collection named '{name}' in {self.root}")
+                kb = ClinicalKnowledgeBase()
+                kb.reranker, kb.context_packer = self.reranker, self.context_packer
+                kb.storage_dir = path
+                kb.load_index(path)
+                self._collections[name] = kb
+        return kb
+
+    def ingest(self, name: str, pdf_paths: list[str], tags: list[str] | None = None, **kwargs) -> dict:
+        """Incrementally ingests PDFs into a collection (created if needed) and saves it."""
+        kb = self.collection(name, create=True)
+        summary = kb.load_and_process_pdfs(pdf_paths, tags=tags, **kwargs)
+        kb.save_index(kb.storage_dir)
+        return summary
+
+    def search(self, query: str, top_k: int = 15, collections: list[str] | None = None,
+               filters: SearchFilter | None = None) -> str:
+        """
+        Like ClinicalKnowledgeBase.search, over the named collections (default: all of them).
+        filters apply inside every collection searched.
+        """
+        names = collections or self.names()
+        if not names:
+            return ""
+        if len(names) == 1:
+            return self.collection(names[0]).search(query, top_k, filters)
+
+        kbs = [self.collection(name) for name in names]
+        if kbs[0]._is_unsafe_query(query):
+            return ClinicalKnowledgeBase.GUARDRAIL_MESSAGE
+        with tracer.span("library_search", collections=len(kbs), top_k=top_k, filtered=bool(filters)) as span:
+            query_vec = kbs[0].embed_query(query)  # Same encoder everywhere: embed once
+            n_retrieve = max(top_k, Config.RERANK_CANDIDATES) if self.reranker else top_k
+            rankings, items = [], {}
+            for name, kb in zip(names, kbs):
+                kb.wait_until_ready()
+                hits = kb.retrieve_hits(query, query_vec, n_retrieve, filters)
+                # Chunk IDs are only unique within a collection
+                rankings.append([(name, chunk_id) for chunk_id, _ in hits])
+                items.update(((name, chunk_id), item) for chunk_id, item in hits)
+            fused = reciprocal_rank_fusion(rankings, n_retrieve)
+            if not fused:
+                return ""
+            context = kbs[0].build_context(query, [(key, items[key]) for key in fused], top_k)
+            span.set(candidates=len(fused), context_chars=len(context))
+        return context
@@ -0,0 +1,121 @@
+import os
+import re
+import gzip
+import json
+import math
+import heapq
+from collections import Counter
+from src.config import Config
+
+# Keeps clinical tokens intact: "140/90", "hba1c", "2.5mg", "p.o", comparison symbols
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[./-][a-z0-9]+)*|[≥≤]|[<>]=?")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring, keyed by chunk ID.
+    Complements dense retrieval on exact tokens (thresholds, lab names, drug names)
+    that MiniLM embeddings tend to blur. Persisted as gzipped JSON next to index.faiss.
+    """
+
+    FILE = "bm25.json.gz"
+
+    def __init__(self, k1: float = Config.BM25_K1, b: float = Config.BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {chunk_id: term frequency}
+        self.doc_len = {}  # chunk_id -> number of tokens
+        self.total_len = 0
+
+    def add(self, chunk_id: int, text: str):
+        if chunk_id in self.doc_len:
+            return
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+        self.doc_len[chunk_id] = len(tokens)
+        self.total_len += len(tokens)
+
+    def remove(self, chunk_id: int, text: str):
+        """Removes a chunk; `text` is needed to find its postings without a forward index."""
+        if chunk_id not in self.doc_len:
+            return
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(chunk_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(chunk_id)
+
+    def search(self, query: str, top_k: int, allowed=None) -> list[tuple[int, float]]:
+        """Top-k (chunk_id, score) pairs, best first. allowed: optional set of chunk IDs to score (filtered search)."""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs
+        scores = Counter()
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for chunk_id, tf in docs.items():
+                if allowed is not None and chunk_id not in allowed:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[chunk_id] / avg_len)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    # --- Persistence ---
+    def save(self, folder_path: str):
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_len": [[chunk_id, length] for chunk_id, length in self.doc_len.items()],
+            "postings": {term: [[chunk_id, tf] for chunk_id, tf in docs.items()]
+                         for term, docs in self.postings.items()}
+        }
+        tmp_path = os.path.join(folder_path, self.FILE + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, os.path.join(folder_path, self.FILE))
+
+    @classmethod
+    def exists(cls, folder_path: str) -> bool:
+        return os.path.exists(os.path.join(folder_path, cls.FILE))
+
+    @classmethod
+    def load(cls, folder_path: str) -> "BM25Index":
+        with gzip.open(os.path.join(folder_path, cls.FILE), "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(payload["k1"], payload["b"])
+        index.doc_len = {chunk_id: length for chunk_id, length in payload["doc_len"]}
+        index.total_len = sum(index.doc_len.values())
+        index.postings = {term: {chunk_id: tf for chunk_id, tf in docs}
+                          for term, docs in payload["postings"].items()}
+        return index
+
+    @classmethod
+    def from_chunks(cls, chunks) -> "BM25Index":
+        """Builds the index from an existing chunk store (stores saved before BM25 existed)."""
+        index = cls()
+        for chunk_id, item in chunks.items():
+            index.add(chunk_id, item["text"])
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], top_k: int, k: int = Config.RRF_K) -> list[int]:
+    """Merges ranked ID lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] += 1.0 / (k + rank)
+    return [chunk_id for chunk_id, _ in scores.most_common(top_k)]
@@ -1,11 +1,34 @@
-from google import genai
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from src.config import Config
+from src.context_packing import estimate_tokens
+from src.tracing import tracer
+from src.query_router import QueryRouter
+
+# Start of each retrieved chunk in the context (src.context_packing.format_chunk); extra tags
+# on the line are citations of collapsed near-duplicates, the chunk is sharded by the first
+CHUNK_HEADER = re.compile(r"^\[Source: '(.*?)', Page: \d+\](?: \[Source: '.*?', Page: \d+\])*$", re.MULTILINE)
 
 
 class GeminiClient:
-    def __init__(self):
-        # Initialize the new SDK Client
-        self.client = genai.Client(api_key=Config.API_KEY)
+    AGENT_MODEL = 'gemini-3-flash-preview'
+    FAST_TRACK_MODEL = 'gemma-3-27b-it'
+
+    def __init__(self, response_cache=None, client=None, router=None):
+        # Initialize the new SDK Client (or use an injected one, e.g. src.stub_backend.StubGenAIClient)
+        if client is None:
+            from google import genai  # Imported here: the SDK is slow to import and stubs don't need it
+            client = genai.Client(api_key=Config.require_api_key())
+        self.client = client
+        # Optional SemanticResponseCache consulted before running the agents
+        self.response_cache = response_cache
+        # Optional QueryRouter: simple lookups skip the Researcher (single combined call)
+        self.router = router
+        # Per-request latency records (time-to-first-token, total, cache hits), newest last
+        self.request_metrics = deque(maxlen=500)
+        self.last_metrics = None
 
     def check_is_casual(self, query: str) -> bool:
         """
@@ -35,7 +58,139 @@ class GeminiClient:
         Fast, direct API call for greetings.
         Uses 'gemma-3-27b-it' as requested for lightweight tasks.
         """
-        prompt = f"""
+        try:
+            # FAST TRACK MODEL: GEMMA 3 (Instruction Tuned)
+            with tracer.span("lightweight_call", model=self.FAST_TRACK_MODEL):
+                response = self.client.models.generate_content(
+                    model=self.FAST_TRACK_MODEL,
+                    contents=self._build_lightweight_prompt(query)
+                )
+            return response.text.strip()
+        except Exception:
+            return self.LIGHTWEIGHT_FALLBACK
+
+    def orchestrate_response(self, context: str, query: str, chat_history: list, is_patient_mode: bool = False,
+                             status_callback=None) -> str:
+        """
+        Orchestrates the multi-agent workflow:
+        1. Researcher Agent: Extracts raw facts (Model: gemini-3-flash-preview).
+        2. Writer Agent: Formats based on 'is_patient_mode' (Model: gemini-3-flash-preview).
+        Answers are served from / saved to the semantic response cache when one is configured.
+        """
+        return "".join(self._orchestrate(context, query, chat_history, is_patient_mode, status_callback,
+                                         stream=False))
+
+    def orchestrate_response_stream(self, context: str, query: str, chat_history: list,
+                                    is_patient_mode: bool = False, status_callback=None):
+        """
+        Streaming variant of orchestrate_response: runs the Researcher, then yields the
+        Writer's text pieces as they arrive. The concatenated pieces form the same answer
+        orchestrate_response would return (citations included). Time-to-first-token and total latency are
+        recorded in self.last_metrics / self.request_metrics; a failed agent call yields an
+        "... Error:" message and sets metrics["error"] to the failing stage.
+        """
+        yield from self._orchestrate(context, query, chat_history, is_patient_mode, status_callback, stream=True)
+
+    def _orchestrate(self, context: str, query: str, chat_history: list, is_patient_mode: bool,
+                     status_callback, stream: bool):
+        started = time.perf_counter()
+        metrics = {"query": query, "stream": stream, "cache_hit": False, "route": None,
+                   "researcher_shards": None, "researcher_s": None, "ttft_s": None, "total_s": None, "error": None}
+        self.last_metrics = metrics
+        self.request_metrics.append(metrics)
+
+        if self.response_cache:
+            with tracer.span("answer_cache_lookup") as span:
+                cached = self.response_cache.lookup(query, context, is_patient_mode)
+                span.set(hit=cached is not None)
+            if cached is not None:
+                if status_callback:
+                    status_callback("⚡ Answer Cache: Reusing a recent answer to an equivalent question.")
+                metrics["cache_hit"] = True
+                metrics["ttft_s"] = metrics["total_s"] = time.perf_counter() - started
+                yield cached
+                return
+
+        route = self.router.route(query) if self.router else QueryRouter.TWO_AGENT
+        metrics["route"] = route
+
+        if route == QueryRouter.SINGLE_PASS:
+            # --- SINGLE PASS: simple lookups get one combined extract-and-write call ---
+            if status_callback:
+                status_callback("⚡ Router: Simple lookup, answering in a single pass...")
+            full_writer_prompt = self._build_single_pass_prompt(context, query, chat_history, is_patient_mode)
+        else:
+            # --- AGENT 1: THE RESEARCHER (Fact Finder) ---
+            if status_callback:
+                status_callback("🕵️ Researcher Agent: Extracting strict clinical facts...")
+
+            shards = self._shard_context(context)
+            metrics["researcher_shards"] = len(shards)
+            try:
+                research_notes = self._run_researcher(context, query, shards)
+            except Exception as e:
+                metrics["total_s"] = time.perf_counter() - started
+                metrics["error"] = "researcher"
+                yield f"Researcher Error: {str(e)}"
+                return
+            metrics["researcher_s"] = time.perf_counter() - started
+
+            # --- AGENT 2: THE WRITER (Communicator) ---
+            if status_callback:
+                if is_patient_mode:
+                    status_callback("❤️ Writer Agent: Translating to patient-friendly language...")
+                else:
+                    status_callback("✍️ Writer Agent: Synthesizing concise clinical summary...")
+
+            full_writer_prompt = self._build_writer_prompt(research_notes, query, chat_history, is_patient_mode)
+
+        pieces = []
+        # Streaming: the span lasts until the last token has been consumed
+        with tracer.span("writer_call", model=self.AGENT_MODEL, prompt_chars=len(full_writer_prompt),
+                         stream=stream, route=route) as writer_span:
+            try:
+                # HEAVY LIFTING MODEL: GEMINI 3 FLASH PREVIEW
+                if stream:
+                    for chunk in self.client.models.generate_content_stream(
+                        model=self.AGENT_MODEL,
+                        contents=full_writer_prompt
+                    ):
+                        text = chunk.text or ""
+                        # Leading whitespace is dropped, matching .strip() on the blocking path
+                        if not pieces:
+                            text = text.lstrip()
+                        if not text:
+                            continue
+                        if metrics["ttft_s"] is None:
+                            metrics["ttft_s"] = time.perf_counter() - started
+                        pieces.append(text)
+                        yield text
+                else:
+                    final_response = self.client.models.generate_content(
+                        model=self.AGENT_MODEL,
+                        contents=full_writer_prompt
+                    )
+                    pieces.append(final_response.text.strip())
+                    metrics["ttft_s"] = time.perf_counter() - started
+                    yield pieces[0]
+            except Exception as e:
+                metrics["total_s"] = time.perf_counter() - started
+                metrics["error"] = "writer"
+                writer_span.set(error=type(e).__name__)
+                yield f"Writer Error: {str(e)}"
+                return
+            writer_span.set(response_chars=sum(len(piece) for piece in pieces))
+
+        metrics["total_s"] = time.perf_counter() - started
+        answer = "".join(pieces).strip()
+        if self.response_cache and answer:
+            self.response_cache.store(query, context, is_patient_mode, answer)
+
+    # --- Prompt Builders ---
+    LIGHTWEIGHT_FALLBACK = "Hello! I am ready to assist you with your clinical questions."
+
+    def _build_lightweight_prompt(self, query: str) -> str:
+        return f"""
         You are Medi-Agent, a helpful and professional clinical assistant.
         The user said: "{query}"
 
@@ -46,29 +201,74 @@ class GeminiClient:
         4. Simply acknowledge and offer help.
         """
 
-        try:
-            # FAST TRACK MODEL: GEMMA 3 (Instruction Tuned)
-            response = self.client.models.generate_content(
-                model='gemma-3-27b-it',
-                contents=prompt
-            )
-            return response.text.strip()
-        except Exception:
-            return "Hello! I am ready to assist you with your clinical questions."
+    def _shard_context(self, context: str) -> list[tuple[list[str], str]]:
+        """
+        Splits the context into per-source shards for the map-reduce Researcher: a list of
+        (sources, shard_context). Returns the whole context as one shard when map-reduce is
+        off, the context is under Config.MAP_REDUCE_MIN_TOKENS or it cites a single source.
+        With more sources than Config.MAP_REDUCE_MAX_SHARDS, whole sources are bin-packed
+        (largest first, into the lightest shard) so shard calls take similar time.
+        """
+        single = [([], context)]
+        if not Config.MAP_REDUCE_ENABLED or estimate_tokens(context) < Config.MAP_REDUCE_MIN_TOKENS:
+            return single
+        headers = list(CHUNK_HEADER.finditer(context))
+        if not headers:
+            return single
 
-    def orchestrate_response(self, context: str, query: str, chat_history: list, is_patient_mode: bool = False,
-                             status_callback=None) -> str:
+        # Chunks grouped by source, sources and chunks kept in retrieval order
+        by_source = {}
+        for i, header in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(context)
+            by_source.setdefault(header.group(1), []).append(context[header.start():end].strip())
+        if len(by_source) < 2:
+            return single
+
+        n_shards = min(len(by_source), max(1, Config.MAP_REDUCE_MAX_SHARDS))
+        shards = [([], []) for _ in range(n_shards)]
+        sizes = [0] * n_shards
+        for source in sorted(by_source, key=lambda s: -sum(len(c) for c in by_source[s])):
+            target = sizes.index(min(sizes))
+            shards[target][0].append(source)
+            shards[target][1].extend(by_source[source])
+            sizes[target] += sum(len(c) for c in by_source[source])
+        return [(sources, "\n\n".join(chunks)) for sources, chunks in shards]
+
+    def _run_researcher(self, context: str, query: str, shards: list | None = None) -> str:
         """
-        Orchestrates the multi-agent workflow:
-        1. Researcher Agent: Extracts raw facts (Model: gemini-3-flash-preview).
-        2. Writer Agent: Formats based on 'is_patient_mode' (Model: gemini-3-flash-preview).
+        Map-reduce Researcher: with several shards (see _shard_context), one Researcher call
+        per shard runs concurrently and the per-shard notes, citations kept, are concatenated
+        under source headers into the Writer's INPUT FACTS. Otherwise a single call.
         """
+        shards = shards if shards is not None else self._shard_context(context)
+        if len(shards) < 2:
+            return self._research(context, query)
+
+        with tracer.span("researcher_map", shards=len(shards)) as parent:
+            workers = max(1, min(len(shards), Config.MAP_REDUCE_WORKERS))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="researcher") as pool:
+                notes = list(pool.map(lambda shard: self._research(shard[1], query, parent=parent), shards))
+        return self._merge_notes(shards, notes)
+
+    @staticmethod
+    def _merge_notes(shards: list, notes: list[str]) -> str:
+        """Reduce step: per-shard notes under their source names, in shard order."""
+        return "\n\n".join(f"NOTES FROM {', '.join(sources)}:\n{note.strip()}"
+                            for (sources, _), note in zip(shards, notes))
 
-        # --- AGENT 1: THE RESEARCHER (Fact Finder) ---
-        if status_callback:
-            status_callback("🕵️ Researcher Agent: Extracting strict clinical facts...")
+    def _research(self, context: str, query: str, parent=None) -> str:
+        prompt = self._build_researcher_prompt(context, query)
+        with tracer.span("researcher_call", parent=parent, model=self.AGENT_MODEL, prompt_chars=len(prompt)) as span:
+            # HEAVY LIFTING MODEL: GEMINI 3 FLASH PREVIEW
+            research_response = self.client.models.generate_content(
+                model=self.AGENT_MODEL,
+                contents=prompt
+            )
+            span.set(response_chars=len(research_response.text or ""))
+        return research_response.text
 
-        researcher_prompt = f"""
+    def _build_researcher_prompt(self, context: str, query: str) -> str:
+        return f"""
         ROLE: Clinical Researcher
         TASK: Extract relevant medical facts, numbers, and protocols from the provided text to answer the User Query.
         CONSTRAINTS: 
@@ -81,23 +281,8 @@ class GeminiClient:
         MEDICAL CONTEXT: {context}
         """
 
-        try:
-            # HEAVY LIFTING MODEL: GEMINI 3 FLASH PREVIEW
-            research_response = self.client.models.generate_content(
-                model='gemini-3-flash-preview',
-                contents=researcher_prompt
-            )
-            research_notes = research_response.text
-        except Exception as e:
-            return f"Researcher Error: {str(e)}"
-
-        # --- AGENT 2: THE WRITER (Communicator) ---
-        if status_callback:
-            if is_patient_mode:
-                status_callback("❤️ Writer Agent: Translating to patient-friendly language...")
-            else:
-                status_callback("✍️ Writer Agent: Synthesizing concise clinical summary...")
-
+    def _build_writer_prompt(self, research_notes: str, query: str, chat_history: list,
+                             is_patient_mode: bool) -> str:
         # Select Prompt based on Mode
         if is_patient_mode:
             # --- PATIENT MODE (CONCISE) ---
@@ -132,19 +317,20 @@ class GeminiClient:
 
         formatted_history = "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in chat_history])
 
-        full_writer_prompt = f"""
+        return f"""
         {writer_prompt}
 
         CHAT HISTORY:
         {formatted_history}
         """
 
-        try:
-            # HEAVY LIFTING MODEL: GEMINI 3 FLASH PREVIEW
-            final_response = self.client.models.generate_content(
-                model='gemini-3-flash-preview',
-                contents=full_writer_prompt
-            )
-            return final_response.text.strip()
-        except Exception as e:
-            return f"Writer Error: {str(e)}"
\ No newline at end of file
+    def _build_single_pass_prompt(self, context: str, query: str, chat_history: list,
+                                  is_patient_mode: bool) -> str:
+        """Router fast path: the Writer prompt fed the raw context, plus the Researcher's extraction rules."""
+        return self._build_writer_prompt(context, query, chat_history, is_patient_mode) + """
+        EXTRACTION RULES (the INPUT FACTS above are raw guideline excerpts):
+        - Use ONLY facts stated in the excerpts. No outside knowledge.
+        - Give exact dosages, thresholds and contraindications as written.
+        - Keep the [Source: "filename", Page: X] tag of every fact you use.
+        - If region-specific rules exist (e.g., NE India vs Rest), separate them clearly.
+        """
@@ -0,0 +1,25 @@
+"""
+PDF text extraction helpers used by the ingestion pipeline.
+Only depends on pypdf so that process-pool workers start quickly
+(no torch / faiss import in the children). pypdf itself is imported on first use,
+so the app does not pay for it at startup.
+"""
+
+
+def count_pages(path: str) -> tuple[int, str | None]:
+    """Returns (page_count, error). Errors are returned as strings so they pickle across processes."""
+    from pypdf import PdfReader
+    try:
+        return len(PdfReader(path).pages), None
+    except Exception as e:
+        return 0, str(e)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> tuple[list[str], str | None]:
+    """Worker task: extracts the text of pages [start, stop) of one PDF."""
+    from pypdf import PdfReader
+    try:
+        reader = PdfReader(path)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)], None
+    except Exception as e:
+        return [], str(e)
@@ -0,0 +1,112 @@
+import re
+import threading
+from collections import deque
+import numpy as np
+from src.config import Config
+from src.tracing import tracer
+
+# Intent prototypes. Simple: one fact from one rule (a dose, a threshold, a definition).
+SIMPLE_EXAMPLES = [
+    "What is the dose of amlodipine?",
+    "Starting dose of metformin",
+    "What is the BP threshold for hypertension?",
+    "Artesunate dose for severe malaria",
+    "How long is the course of artemether-lumefantrine?",
+    "What is the HbA1c target?",
+    "Maximum daily dose of paracetamol",
+    "Which stage is 160/100 mmHg?",
+    "Dose of primaquine for vivax malaria",
+    "What is the first-line drug for uncomplicated malaria?",
+]
+# Complex: several rules, comparisons, conditions or patient-specific reasoning.
+COMPLEX_EXAMPLES = [
+    "Compare the treatment of falciparum malaria in NE India versus the rest of the country",
+    "How should I manage a pregnant woman with hypertension and diabetes who is intolerant to ACE inhibitors?",
+    "When should therapy be stepped up, and which drug should be added if BP stays above target on two drugs?",
+    "What are the differences between the adult and paediatric regimens and their contraindications?",
+    "Patient on rifampicin with diabetes: which drug interactions matter and how to adjust the doses?",
+    "Explain why the guideline recommends a different threshold for elderly patients with CKD",
+    "Outline the full algorithm for managing severe malaria including referral criteria",
+    "If a patient has G6PD deficiency and vivax malaria, what are the options and monitoring steps?",
+    "Summarize the contraindications, dose adjustments and monitoring for metformin in renal impairment",
+    "How do the treatment targets change with age, comorbidities and pregnancy?",
+]
+
+# Cheap features that veto the single-pass route regardless of the embedding score
+COMPLEX_MARKERS = re.compile(
+    r"\b(compare|comparison|versus|vs|differen\w*|both|algorithm|manage\w*|approach|step[- ]?up|switch\w*|"
+    r"interact\w*|explain|why|summar\w*|outline|options|pregnan\w*|region\w*|if|unless|while)\b"
+)
+
+
+class QueryRouter:
+    """
+    Decides per query whether the full Researcher -> Writer pipeline is needed.
+
+    'single_pass': simple factual lookups (one dose, one threshold) get one combined
+    extract-and-write call. 'two_agent': everything else keeps the two-call pipeline.
+    A query is routed single-pass only if it is short, has no complexity markers
+    (comparisons, conditions, multi-rule words, several questions) and its embedding is
+    closer to the simple-lookup centroid than to the complex-question centroid by margin.
+    Centroids are built once from SIMPLE_EXAMPLES / COMPLEX_EXAMPLES with the same local
+    encoder used for retrieval (embed_fn: query -> normalized (1, dim) vector).
+    """
+
+    SINGLE_PASS = "single_pass"
+    TWO_AGENT = "two_agent"
+
+    def __init__(self, embed_fn, margin: float = Config.ROUTER_MARGIN, max_words: int = Config.ROUTER_MAX_WORDS):
+        self.embed_fn = embed_fn
+        self.margin = margin
+        self.max_words = max_words
+        self._centroids = None
+        self._lock = threading.Lock()
+        # Recent decisions (newest last) for the UI and evaluation
+        self.decisions = deque(maxlen=500)
+
+    def _get_centroids(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    centroids = []
+                    for examples in (SIMPLE_EXAMPLES, COMPLEX_EXAMPLES):
+                        mean = np.vstack([self.embed_fn(text) for text in examples]).mean(axis=0)
+                        centroids.append(mean / np.linalg.norm(mean))
+                    self._centroids = tuple(centroids)
+        return self._centroids
+
+    @staticmethod
+    def features(query: str) -> dict:
+        q = query.lower()
+        return {
+            "words": len(q.split()),
+            "markers": len(COMPLEX_MARKERS.findall(q)),
+            "questions": max(1, q.count("?")),
+            "clauses": q.count(",") + q.count(";") + len(re.findall(r"\b(and|or)\b", q)),
+        }
+
+    def route(self, query: str) -> str:
+        with tracer.span("route") as span:
+            features = self.features(query)
+            simple, complex_ = self._get_centroids()
+            query_vec = self.embed_fn(query)[0]
+            score = float(query_vec @ simple - query_vec @ complex_)
+
+            vetoed = (features["words"] > self.max_words or features["markers"] > 0
+                      or features["questions"] > 1 or features["clauses"] > 2)
+            decision = self.SINGLE_PASS if not vetoed and score >= self.margin else self.TWO_AGENT
+            span.set(decision=decision, score=round(score, 4), **features)
+
+        self.decisions.append({"query": query, "decision": decision, "score": score, **features})
+        print(f"Router: {decision} (score {score:+.3f}, {features['words']} words, "
+              f"{features['markers']} markers, {features['clauses']} clauses)")
+        return decision
+
+    def stats(self) -> dict:
+        decisions = list(self.decisions)
+        single = sum(1 for d in decisions if d["decision"] == self.SINGLE_PASS)
+        return {
+            "routed": len(decisions),
+            "single_pass": single,
+            "single_pass_rate": round(single / len(decisions), 3) if decisions else 0.0,
+        }
@@ -1,134 +1,713 @@
 import os
 import re
-import faiss
+import json
+import time
 import pickle
+import hashlib
+import shutil
+import functools
+import threading
+import multiprocessing
 import numpy as np
-from pypdf import PdfReader
-from sentence_transformers import SentenceTransformer
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from src.config import Config
+from src.cache import LRUCache
+from src.concurrency import ReadWriteLock
+from src.embeddings_service import load_model
+from src.chunk_store import ChunkStore
+from src.embedding_store import EmbeddingStore
+from src.lexical_index import BM25Index, reciprocal_rank_fusion
+from src.reranker import CrossEncoderReranker
+from src.context_packing import ContextPacker, format_chunk
+from src.search_filters import SearchFilter, ResolvedFilter
+from src.dedup import MinHashIndex
+from src.tracing import tracer
+from src.pdf_extraction import count_pages, extract_page_range
+from src import vector_index
+
+
+def _exclusive(method):
+    """Serializes mutating operations (ingest, remove, rebuild, save, load) on one knowledge base."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._mutation_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _after_warm_up(method):
+    """Waits for a background warm_up() first, so its index load cannot overwrite (or be saved over) new work."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.wait_until_ready()
+        return method(self, *args, **kwargs)
+    return wrapper
 
 
 class ClinicalKnowledgeBase:
     """
     Core RAG Engine handling document ingestion, embedding, vector storage,
     and retrieval logic for the Clinical Assistant.
+
+    Thread-safe, so one instance can be shared by every Streamlit session: searches hold
+    a shared read lock, while ingestion does its parsing/encoding unlocked and only takes
+    the write lock for the short index/metadata mutations (and whole-index swaps on
+    rebuild/load), so in-flight searches are never blocked for the duration of an upload.
+
+    Construction is cheap: the encoder loads on first use, or together with the last saved
+    index in a background thread via warm_up(), so a UI can render while models load.
     """
 
+    GUARDRAIL_MESSAGE = "GUARDRAIL: This query asks for subjective comparison. Please ask for specific guidelines."
+
     def __init__(self):
-        print(f"Loading Embedding Model: {Config.EMBEDDING_MODEL}...")
-        self.encoder = SentenceTransformer(Config.EMBEDDING_MODEL)
+        # Shared process-wide encoder (src/embeddings_service.py), loaded lazily (see encoder)
+        self._encoder = None
+        self._ready = threading.Event()
+        self._ready.set()  # Cleared while a warm_up() is in progress
+        self.warmup_error = None
+        self._rw_lock = ReadWriteLock()
+        self._mutation_lock = threading.RLock()
         self.index = None
-        # Stores metadata: [{'text': "...", 'page': 1, 'source': "guidelines.pdf"}, ...]
-        self.chunks = []
+        # Stores metadata keyed by stable chunk ID: {8231...: {'text': "...", 'page': 1, 'source': "guidelines.pdf"}}
+        self.chunks = ChunkStore()
+        # BM25 inverted index over the same chunk IDs (hybrid retrieval)
+        self.lexical_index = BM25Index()
+        # Document fingerprints: {"guidelines.pdf": {"sha256": "...", "chunk_ids": [8231..., ...],
+        # "tags": [...], "duplicate_ids": [IDs of this document's chunks collapsed into others]}}
+        self.manifest = {}
+        # Near-duplicate detection (loaded or built on the first deduplicating ingest) and the
+        # citations collapsed into each indexed chunk: {chunk ID: [{"id", "source", "page"}, ...]}
+        self.dedup_index = None
+        self.duplicates = {}
+        # Raw float16 vectors on disk (see EmbeddingStore); opened lazily under storage_dir
+        self.storage_dir = Config.STORAGE_DIR
+        self.embedding_store = None
+        # Retrieval caches; index_version is bumped on every index mutation so cached
+        # contexts from an older index are never served
+        self.index_version = 0
+        self.query_cache = LRUCache(Config.QUERY_CACHE_SIZE)
+        self.result_cache = LRUCache(Config.RESULT_CACHE_SIZE)
+        # Resolved search filters (chunk ID sets + FAISS selectors), per filter and index version
+        self.filter_cache = LRUCache(Config.FILTER_CACHE_SIZE)
+        # Optional cross-encoder stage between retrieval and the prompt (model loads on first use)
+        self.reranker = CrossEncoderReranker() if Config.RERANK_ENABLED else None
+        # Stitches overlapping windows, drops near-duplicates and caps the context size
+        self.context_packer = ContextPacker() if Config.CONTEXT_PACKING else None
+
+    @staticmethod
+    def create(server_url: str | None = Config.RETRIEVAL_SERVER_URL):
+        """
+        A client of a running retrieval server (src/retrieval_client.RemoteKnowledgeBase) when
+        server_url is set, otherwise a local knowledge base. Both expose the methods app.py uses.
+        """
+        if server_url:
+            from src.retrieval_client import RemoteKnowledgeBase
+            return RemoteKnowledgeBase(server_url)
+        return ClinicalKnowledgeBase()
+
+    # --- Startup ---
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = load_model()
+        return self._encoder
+
+    def warm_up(self, folder_path=Config.STORAGE_DIR) -> threading.Thread:
+        """
+        Loads the encoder and the last saved index (if any) in a background thread and
+        returns immediately. Searches and ingestion issued before it finishes wait for it.
+        """
+        self._ready.clear()
+
+        encoder_errors = []
+
+        def load_encoder():
+            try:
+                # First encode also initializes the runtime's thread pools
+                self.encoder.encode(["warm-up"], normalize_embeddings=True)
+            except Exception as e:
+                encoder_errors.append(e)
+
+        def run():
+            started = time.perf_counter()
+            try:
+                with tracer.span("warm_up"):
+                    encoder_thread = threading.Thread(target=load_encoder, name="kb-encoder-load", daemon=True)
+                    encoder_thread.start()
+                    self.load_index(folder_path)
+                    encoder_thread.join()
+                    if encoder_errors:
+                        raise encoder_errors[0]
+                print(f"✅ Warm-up finished in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                self.warmup_error = e
+                print(f"Warm-up failed: {e}")
+            finally:
+                self._ready.set()
+
+        thread = threading.Thread(target=run, name="kb-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def is_empty(self) -> bool:
+        return not self.index or self.index.ntotal == 0
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
 
     # --- Core Logic: Ingestion ---
-    def load_and_process_pdfs(self, pdf_paths: list[str]):
-        """Ingests PDFs, tracks page numbers & filenames, chunks them, and builds index."""
-        new_chunks_data = []
+    @_after_warm_up
+    @_exclusive
+    def load_and_process_pdfs(self, pdf_paths: list[str], prune_missing: bool = False,
+                              workers: int | None = None, tags: list[str] | None = None) -> dict:
+        """
+        Incrementally ingests PDFs into the existing index.
+        Unchanged files (same content hash) are skipped, new files are appended and
+        updated files have their old chunks replaced. With prune_missing=True, documents
+        in the manifest that are not in pdf_paths are removed from the index.
+
+        tags (e.g. ["malaria", "ne-india"]) are stored per document in the manifest and can
+        be used in search filters; updated documents keep their old tags unless tags are given.
+
+        With Config.DEDUP_ENABLED, a chunk that is a near-duplicate of an indexed one (MinHash,
+        see src/dedup.py) is not embedded or indexed: its source/page is added as an extra
+        citation of the indexed chunk, which search results carry as 'also'.
+
+        With workers > 1 (default: Config.INGEST_WORKERS) pages are extracted across a
+        process pool while finished chunks are embedded in batches, so parsing and
+        embedding overlap. Chunks and their order are identical to the serial path (workers=1).
+
+        Each batch is encoded, appended to the on-disk float16 embedding store and added to
+        the index as soon as it finishes, so peak memory does not grow with the upload. If a
+        previous run was interrupted, batches already in the store are reused, not re-encoded.
+
+        Returns a summary: {'added': [...], 'updated': [...], 'skipped': [...], 'removed': [...],
+        'stats': {'pages': n, 'chunks': n, 'duplicates': n, 'dedup_reduction_pct': x, 'seconds': s,
+        'pages_per_sec': x, 'chunks_per_sec': y}} (chunks embedded and duplicates collapsed by this
+        call; dedup_reduction_pct: how much smaller the whole index is thanks to deduplication).
+        """
+        workers = Config.INGEST_WORKERS if workers is None else workers
+        summary = {"added": [], "updated": [], "skipped": [], "removed": [], "stats": {}}
+        pending = {}  # filename -> (path, digest); a repeated filename keeps the last upload
+        stale_ids, stale_duplicate_ids = [], []
 
         for path in pdf_paths:
-            # Clean filename logic (Removes Streamlit's temp prefix)
-            raw_filename = os.path.basename(path)
-            if "_" in raw_filename:
-                filename = raw_filename.split("_", 1)[1]
+            filename = os.path.basename(path)
+            digest = self._file_digest(path)
+
+            entry = self.manifest.get(filename)
+            if entry and entry["sha256"] == digest:
+                print(f"Unchanged, skipping: {filename}")
+                summary["skipped"].append(filename)
+                if tags is not None:
+                    self.set_document_tags(filename, tags)
+                continue
+            pending[filename] = (path, digest)
+
+        if prune_missing:
+            seen = {os.path.basename(path) for path in pdf_paths}
+            for filename in set(self.manifest) - seen:
+                stale_ids.extend(self.manifest[filename]["chunk_ids"])
+                stale_duplicate_ids.extend(self.manifest[filename].get("duplicate_ids", []))
+                summary["removed"].append(filename)
+
+        if not pending and not stale_ids and not stale_duplicate_ids:
+            print("No new or changed clinical documents to index.")
+            return summary
+
+        docs = [(filename, path, digest) for filename, (path, digest) in pending.items()]
+        doc_chunk_ids = [[] for _ in docs]
+        doc_duplicates = [[] for _ in docs]  # {"id", "canonical", "page"} per collapsed chunk
+        dedup = self._get_dedup_index() if Config.DEDUP_ENABLED else None
+        failed = set()
+        batch_ids, batch_chunks = [], []
+        n_pages = n_chunks = n_duplicates = 0
+        started = time.perf_counter()
+
+        print(f"Processing {len(docs)} documents ({'parallel, %d workers' % workers if workers > 1 else 'serial'})...")
+        with tracer.span("ingest", documents=len(docs), workers=workers) as ingest_span:
+            for doc_idx, page_num, page_text, error in self._iter_pages(docs, workers):
+                filename, _, digest = docs[doc_idx]
+                if error is not None:
+                    print(f"Error reading {filename}: {error}")
+                    failed.add(doc_idx)
+                    continue
+
+                n_pages += 1
+                # UPDATED: Optimized window for medical tables
+                # 1000 chars size, 300 overlap ensures tables aren't cut in half
+                with tracer.span("chunking", source=filename, page=page_num, chars=len(page_text)) as span:
+                    segments = self._sliding_window_chunking(page_text, window_size=1000, overlap=300)
+                    span.set(chunks=len(segments))
+                for segment in segments:
+                    ordinal = len(doc_chunk_ids[doc_idx]) + len(doc_duplicates[doc_idx])
+                    chunk_id = self._chunk_id(filename, digest, ordinal)
+                    if dedup is not None:
+                        signature = dedup.signature(segment)
+                        canonical = dedup.find_duplicate(signature)
+                        if canonical is not None:
+                            doc_duplicates[doc_idx].append({"id": chunk_id, "canonical": canonical, "page": page_num})
+                            n_duplicates += 1
+                            continue
+                        dedup.add(chunk_id, signature)
+                    doc_chunk_ids[doc_idx].append(chunk_id)
+                    batch_ids.append(chunk_id)
+                    batch_chunks.append({
+                        "text": segment,
+                        "page": page_num,
+                        "source": filename
+                    })
+
+                if len(batch_ids) >= Config.EMBED_BATCH_SIZE:
+                    self._embed_and_add(batch_ids, batch_chunks)
+                    n_chunks += len(batch_ids)
+                    batch_ids, batch_chunks = [], []
+
+            if batch_ids:
+                self._embed_and_add(batch_ids, batch_chunks)
+                n_chunks += len(batch_ids)
+            ingest_span.set(pages=n_pages, chunks=n_chunks, duplicates=n_duplicates, failed=len(failed))
+
+        # Replacements are indexed: now retire old versions and roll back failed documents
+        # Searches iterate the manifest under the read lock: build the new entries, then swap them in
+        new_entries, new_aliases = {}, []
+        for doc_idx, (filename, _, digest) in enumerate(docs):
+            if doc_idx in failed:
+                stale_ids.extend(doc_chunk_ids[doc_idx])
+                continue
+            entry = self.manifest.get(filename)
+            if entry:
+                stale_ids.extend(entry["chunk_ids"])
+                stale_duplicate_ids.extend(entry.get("duplicate_ids", []))
+                summary["updated"].append(filename)
             else:
-                filename = raw_filename
+                summary["added"].append(filename)
+            doc_tags = sorted(set(tags)) if tags is not None else (entry or {}).get("tags", [])
+            new_entries[filename] = {"sha256": digest, "chunk_ids": doc_chunk_ids[doc_idx], "tags": doc_tags,
+                                     "duplicate_ids": [dup["id"] for dup in doc_duplicates[doc_idx]]}
+            new_aliases.extend({**dup, "source": filename} for dup in doc_duplicates[doc_idx])
 
-            print(f"Processing: {filename}")
+        with self._rw_lock.write():
+            self.manifest.update(new_entries)
+            for alias in new_aliases:
+                self.duplicates.setdefault(alias["canonical"], []).append(
+                    {"id": alias["id"], "source": alias["source"], "page": alias["page"]})
+        self._remove_chunks(stale_ids, stale_duplicate_ids)
+        with self._rw_lock.write():
+            for filename in summary["removed"]:
+                del self.manifest[filename]
+            self._invalidate_caches()  # Filters resolve documents through the manifest
 
-            try:
-                reader = PdfReader(path)
-                for i, page in enumerate(reader.pages):
-                    page_text = page.extract_text() or ""
-                    page_num = i + 1
-
-                    # UPDATED: Optimized window for medical tables
-                    # 1000 chars size, 300 overlap ensures tables aren't cut in half
-                    text_segments = self._sliding_window_chunking(page_text, window_size=1000, overlap=300)
-
-                    for segment in text_segments:
-                        new_chunks_data.append({
-                            "text": segment,
-                            "page": page_num,
-                            "source": filename
-                        })
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
+        if self.index is None and self.chunks:
+            # Trained index types (IVF) are built once all vectors are in the embedding store
+            self.rebuild_index()
 
-        if not new_chunks_data:
-            print("No relevant clinical text found in documents.")
-            return
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        n_collapsed = sum(len(aliases) for aliases in self.duplicates.values())
+        summary["stats"] = {
+            "pages": n_pages,
+            "chunks": n_chunks,
+            "duplicates": n_duplicates,
+            "dedup_reduction_pct": round(100 * n_collapsed / max(len(self.chunks) + n_collapsed, 1), 1),
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(n_pages / elapsed, 2),
+            "chunks_per_sec": round(n_chunks / elapsed, 2),
+        }
+        if dedup is not None:
+            print(f"Near-duplicates: {n_duplicates} of {n_chunks + n_duplicates} new chunks not embedded; "
+                  f"index {summary['stats']['dedup_reduction_pct']}% smaller ({n_collapsed} chunks collapsed)")
+        print(f"Ingestion throughput: {summary['stats']['pages_per_sec']} pages/sec, "
+              f"{summary['stats']['chunks_per_sec']} chunks/sec")
+        print(f"✅ Knowledge Base Updated: {len(self.chunks)} chunks from {len(self.manifest)} documents.")
+        return summary
 
-        # Embed and Build Index
-        print(f"Embedding {len(new_chunks_data)} chunks with metadata...")
-        text_only = [item['text'] for item in new_chunks_data]
+    @_after_warm_up
+    @_exclusive
+    def remove_documents(self, filenames: list[str]) -> list[str]:
+        """Drops documents (and all their chunks) from the index. Returns the names actually removed."""
+        removed = [f for f in filenames if f in self.manifest]
+        self._remove_chunks([cid for f in removed for cid in self.manifest[f]["chunk_ids"]],
+                            [did for f in removed for did in self.manifest[f].get("duplicate_ids", [])])
+        with self._rw_lock.write():
+            for filename in removed:
+                del self.manifest[filename]
+            self._invalidate_caches()
+        return removed
 
-        embeddings = self.encoder.encode(
-            text_only,
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        )
+    @_exclusive
+    def set_document_tags(self, filename: str, tags: list[str]):
+        """Replaces a document's tags (no re-indexing). Saved with the manifest on save_index()."""
+        with self._rw_lock.write():
+            self.manifest[filename]["tags"] = sorted(set(tags))
+            self._invalidate_caches()
 
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings.astype("float32"))
-        self.chunks = new_chunks_data
-        print("✅ Knowledge Base Built Successfully.")
+    def document_tags(self) -> dict:
+        """{filename: [tags]} for every indexed document (e.g. to build filter choices in a UI)."""
+        with self._rw_lock.read():
+            return {filename: list(entry.get("tags", [])) for filename, entry in self.manifest.items()}
 
     # --- Core Logic: Retrieval ---
-    def search(self, query: str, top_k: int = 15) -> str:
+    def search(self, query: str, top_k: int = 15, filters: SearchFilter | None = None) -> str:
         """
         Retrieves chunks and formats them with source citation metadata.
         Args:
             query: The user's question.
             top_k: Number of chunks to retrieve. INCREASED to 15 to catch details deep in text.
+            filters: Optional SearchFilter (sources, page range, tags), applied inside the index search.
         """
-        if not self.index:
+        if self._is_unsafe_query(query):
+            return self.GUARDRAIL_MESSAGE
+
+        self.wait_until_ready()
+        normalized_query = self._normalize_query(query)
+        with tracer.span("search", top_k=top_k, mode=Config.RETRIEVAL_MODE, filtered=bool(filters)) as span:
+            context = self._search(query, normalized_query, top_k, filters)
+            span.set(context_chars=len(context))
+        return context
+
+    def _search(self, query: str, normalized_query: str, top_k: int, filters: SearchFilter | None) -> str:
+        result_key = (normalized_query, top_k, filters.key() if filters else None, self.index_version)
+        cached_context = self.result_cache.get(result_key)
+        if cached_context is not None:
+            tracer.current_span().set(result_cache_hit=True)
+            return cached_context
+
+        # Vector (+ lexical) Search
+        # With reranking, over-fetch candidates and let the cross-encoder pick the best few
+        n_retrieve = max(top_k, Config.RERANK_CANDIDATES) if self.reranker else top_k
+        hits = self.retrieve_hits(query, self.embed_query(query), n_retrieve, filters)
+        if not hits:
             return ""
+        context = self.build_context(query, hits, top_k)
+        self.result_cache.put(result_key, context)
+        return context
 
-        if self._is_unsafe_query(query):
-            return "GUARDRAIL: This query asks for subjective comparison. Please ask for specific guidelines."
+    def retrieve_hits(self, query: str, query_vec: np.ndarray, n: int,
+                      filters: SearchFilter | None = None) -> list[tuple[int, dict]]:
+        """Up to n ranked (chunk_id, chunk) pairs for an already embedded query, before reranking."""
+        with self._rw_lock.read():
+            if not self.index or self.index.ntotal == 0:
+                return []
+            hits = [(chunk_id, self._hit(chunk_id, filters))
+                    for chunk_id in self._retrieve_ids(query, query_vec, n, Config.RETRIEVAL_MODE,
+                                                       self._resolve_filter(filters))]
+        return [(chunk_id, item) for chunk_id, item in hits if item]
+
+    def _hit(self, chunk_id: int, filters: SearchFilter | None = None) -> dict | None:
+        """
+        Caller must hold the read lock. The chunk, with 'also' citations of its collapsed
+        duplicates. Under a filter only in-scope citations are kept: a chunk selected through
+        a duplicate in b.pdf is cited as b.pdf, even if it was first indexed from a.pdf.
+        """
+        item = self.chunks.get(chunk_id)
+        if not item:
+            return None
+        citations = [(item["source"], item["page"])]
+        citations += [(alias["source"], alias["page"]) for alias in self.duplicates.get(chunk_id, ())]
+        if filters:
+            citations = [c for c in citations if self._cites_in_scope(*c, filters)] or citations[:1]
+        (source, page), also = citations[0], citations[1:]
+        if (source, page) != (item["source"], item["page"]) or also:
+            item = {**item, "source": source, "page": page}
+            if also:
+                item["also"] = also
+        return item
 
-        # Vector Search
-        query_vec = self.encoder.encode([query]).astype("float32")
+    def _cites_in_scope(self, source: str, page: int, filters: SearchFilter) -> bool:
+        """Caller must hold the read lock. Whether a (source, page) citation matches the filter."""
+        entry = self.manifest.get(source)
+        if entry is None or not filters.matches_document(source, entry.get("tags")):
+            return False
+        if filters.pages:
+            first, last = filters.pages
+            return (first is None or page >= first) and (last is None or page <= last)
+        return True
+
+    def search_batch(self, requests: list[tuple]) -> list[str]:
+        """
+        Batched search() for the retrieval server's micro-batches: requests are
+        (query, top_k, filters) tuples and the contexts are the ones search() would return.
+        All cache-missing queries are encoded in one encoder call, and all unfiltered
+        queries share one FAISS search (filtered ones keep their own ID selector).
+        """
+        self.wait_until_ready()
+        contexts = [None] * len(requests)
+        pending = []  # (position, query, top_k, filters, result_key)
+        for i, (query, top_k, filters) in enumerate(requests):
+            if self._is_unsafe_query(query):
+                contexts[i] = self.GUARDRAIL_MESSAGE
+                continue
+            result_key = (self._normalize_query(query), top_k, filters.key() if filters else None, self.index_version)
+            contexts[i] = self.result_cache.get(result_key)
+            if contexts[i] is None:
+                pending.append((i, query, top_k, filters, result_key))
+        if not pending:
+            return contexts
 
-        # FIX: Ensure we don't request more neighbors than we have chunks
-        k_to_search = min(top_k, len(self.chunks))
-        distances, indices = self.index.search(query_vec, k=k_to_search)
+        with tracer.span("search_batch", requests=len(requests), searched=len(pending)):
+            query_vecs = self.embed_queries([query for _, query, _, _, _ in pending])
+            mode = Config.RETRIEVAL_MODE
+            n_retrieve = [max(top_k, Config.RERANK_CANDIDATES) if self.reranker else top_k
+                          for _, _, top_k, _, _ in pending]
+            all_hits = []
+            with self._rw_lock.read():
+                if not self.index or self.index.ntotal == 0:
+                    return [context if context is not None else "" for context in contexts]
+                dense = {}  # pending row -> precomputed FAISS IDs
+                shared = [row for row, (_, _, _, filters, _) in enumerate(pending) if not filters]
+                if mode in ("dense", "hybrid") and shared:
+                    n_candidates = [n if mode == "dense" else max(n, Config.HYBRID_CANDIDATES) for n in n_retrieve]
+                    k_to_search = min(max(n_candidates[row] for row in shared), self.index.ntotal)
+                    with tracer.span("faiss_search", k=k_to_search, queries=len(shared),
+                                     index_type=vector_index.index_type_of(self.index), ntotal=self.index.ntotal):
+                        _, indices = self.index.search(query_vecs[shared], k=k_to_search,
+                                                       params=vector_index.search_params(self.index))
+                    for row, ids in zip(shared, indices):
+                        dense[row] = [int(idx) for idx in ids[:n_candidates[row]] if idx >= 0]
+                for row, (_, query, _, filters, _) in enumerate(pending):
+                    chunk_ids = self._retrieve_ids(query, query_vecs[row:row + 1], n_retrieve[row], mode,
+                                                   self._resolve_filter(filters), dense_ids=dense.get(row))
+                    hits = [(chunk_id, self._hit(chunk_id, filters)) for chunk_id in chunk_ids]
+                    all_hits.append([(chunk_id, item) for chunk_id, item in hits if item])
 
-        # Format Context
-        context_parts = []
-        for idx in indices[0]:
-            if idx < len(self.chunks) and idx >= 0:
-                item = self.chunks[idx]
-                # Injection of Metadata for LLM Citation
-                formatted_chunk = f"[Source: '{item['source']}', Page: {item['page']}]\n{item['text']}"
-                context_parts.append(formatted_chunk)
+            for (i, query, top_k, _, result_key), hits in zip(pending, all_hits):
+                contexts[i] = self.build_context(query, hits, top_k) if hits else ""
+                if hits:
+                    self.result_cache.put(result_key, contexts[i])
+        return contexts
 
-        return "\n\n".join(context_parts)
+    def build_context(self, query: str, hits: list[tuple], top_k: int) -> str:
+        """Reranks (if enabled) and formats retrieved hits into the prompt context."""
+        if self.reranker:
+            # Scored outside the lock: ingestion/saves are not held up by the cross-encoder
+            by_id = dict(hits)
+            with tracer.span("rerank", candidates=len(hits), model=self.reranker.model_name) as span:
+                kept = self.reranker.rerank(query, [(chunk_id, item["text"]) for chunk_id, item in hits],
+                                            top_k=min(top_k, Config.RERANK_TOP_K), baseline_k=top_k)
+                span.set(kept=len(kept))
+            hits = [(chunk_id, by_id[chunk_id]) for chunk_id in kept]
+
+        # Format Context (Injection of Metadata for LLM Citation)
+        if self.context_packer:
+            with tracer.span("context_pack", chunks=len(hits)) as span:
+                context = self.context_packer.pack([item for _, item in hits])
+                span.set(chars=len(context))
+        else:
+            context = "\n\n".join(format_chunk(item["source"], item["page"], item["text"], item.get("also"))
+                                  for _, item in hits)
+        return context
+
+    def retrieve(self, query: str, top_k: int = 15, mode: str | None = None,
+                 filters: SearchFilter | None = None) -> list[int]:
+        """
+        Ranked chunk IDs without formatting (for benchmarks and evaluation).
+        mode: 'dense' (FAISS), 'lexical' (BM25) or 'hybrid' (both, fused with RRF).
+        """
+        self.wait_until_ready()
+        query_vec = self.embed_query(query)
+        with self._rw_lock.read():
+            if not self.index or self.index.ntotal == 0:
+                return []
+            return self._retrieve_ids(query, query_vec, top_k, mode or Config.RETRIEVAL_MODE,
+                                      self._resolve_filter(filters))
+
+    def _retrieve_ids(self, query: str, query_vec: np.ndarray, top_k: int, mode: str,
+                      allowed: ResolvedFilter | None = None, dense_ids: list[int] | None = None) -> list[int]:
+        """
+        Caller must hold the read lock. allowed: restricts both retrievers to the filtered chunk IDs.
+        dense_ids: FAISS results already computed for this query (batched search).
+        """
+        if allowed is not None and not len(allowed):
+            return []
+        n_candidates = top_k if mode == "dense" else max(top_k, Config.HYBRID_CANDIDATES)
+
+        if mode in ("dense", "hybrid") and dense_ids is None:
+            # FIX: Ensure we don't request more neighbors than we have chunks
+            k_to_search = min(n_candidates, self.index.ntotal if allowed is None else len(allowed))
+            selector = allowed.selector if allowed is not None else None
+            with tracer.span("faiss_search", k=k_to_search, index_type=vector_index.index_type_of(self.index),
+                             ntotal=self.index.ntotal, filtered=allowed is not None):
+                distances, indices = self.index.search(query_vec, k=k_to_search,
+                                                       params=vector_index.search_params(self.index, selector=selector))
+            dense_ids = [int(idx) for idx in indices[0] if idx >= 0]
+        if mode == "dense":
+            return dense_ids
+
+        with tracer.span("bm25_search", k=n_candidates):
+            lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(
+                query, n_candidates, allowed.id_set if allowed is not None else None)]
+        if mode == "lexical":
+            return lexical_ids[:top_k]
+        return reciprocal_rank_fusion([dense_ids, lexical_ids], top_k)
+
+    def allowed_ids(self, filters: SearchFilter) -> np.ndarray:
+        """
+        Chunk IDs a filter selects (documents by source/tags from the manifest, then pages).
+        A collapsed duplicate selects the chunk it was merged into, by its own source/page.
+        """
+        with self._rw_lock.read():
+            resolved = self._resolve_filter(filters)
+        return resolved.ids if resolved is not None else self.chunks.ids()
+
+    def _resolve_filter(self, filters: SearchFilter | None) -> ResolvedFilter | None:
+        """Caller must hold the read lock. Cached per filter until the next index/manifest change."""
+        if not filters:
+            return None
+        key = (filters.key(), self.index_version)
+        resolved = self.filter_cache.get(key)
+        if resolved is None:
+            documents = [entry for filename, entry in self.manifest.items()
+                         if filters.matches_document(filename, entry.get("tags"))]
+            ids = np.array([cid for entry in documents for cid in entry["chunk_ids"]], dtype="int64")
+            if filters.pages and len(ids):
+                ids = ids[self._in_page_range(self.chunks.pages_of(ids), filters.pages)]
+            if self.duplicates:
+                canonical_of = {alias["id"]: (canonical, alias["page"])
+                                for canonical, aliases in self.duplicates.items() for alias in aliases}
+                merged = [canonical_of[did] for entry in documents for did in entry.get("duplicate_ids", [])
+                          if did in canonical_of]
+                if merged:
+                    canonicals = np.array([cid for cid, _ in merged], dtype="int64")
+                    if filters.pages:
+                        canonicals = canonicals[self._in_page_range(np.array([p for _, p in merged]), filters.pages)]
+                    ids = np.union1d(ids, canonicals)
+            resolved = ResolvedFilter(ids)
+            self.filter_cache.put(key, resolved)
+        return resolved
+
+    @staticmethod
+    def _in_page_range(pages: np.ndarray, page_range: tuple) -> np.ndarray:
+        first, last = page_range
+        keep = pages >= 0
+        if first is not None:
+            keep &= pages >= first
+        if last is not None:
+            keep &= pages <= last
+        return keep
+
+    def embed_queries(self, queries: list[str]) -> np.ndarray:
+        """Batched embed_query: (n, dim) float32, with one encoder call for all cache misses."""
+        normalized = [self._normalize_query(query) for query in queries]
+        cached = {text: self.query_cache.get(text) for text in set(normalized)}
+        missing = [text for text, vec in cached.items() if vec is None]
+        if missing:
+            with tracer.span("embed_query", chars=sum(map(len, missing)), batch=len(missing)):
+                encoded = self.encoder.encode(missing, normalize_embeddings=True).astype("float32")
+            for text, vec in zip(missing, encoded):
+                cached[text] = vec[None, :]
+                self.query_cache.put(text, cached[text])
+        return np.vstack([cached[text] for text in normalized])
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Normalized (1, dim) float32 query embedding, served from the LRU cache when possible."""
+        normalized_query = self._normalize_query(query)
+        query_vec = self.query_cache.get(normalized_query)
+        if query_vec is None:
+            with tracer.span("embed_query", chars=len(normalized_query)):
+                query_vec = self.encoder.encode([normalized_query], normalize_embeddings=True).astype("float32")
+            self.query_cache.put(normalized_query, query_vec)
+        return query_vec
+
+    def cache_stats(self) -> dict:
+        return {
+            "index_version": self.index_version,
+            "query_embeddings": self.query_cache.stats(),
+            "results": self.result_cache.stats(),
+            "filters": self.filter_cache.stats(),
+            "rerank": self.reranker.stats() if self.reranker else None,
+            "packing": self.context_packer.stats() if self.context_packer else None
+        }
 
     # --- Persistence: Save/Load ---
-    def save_index(self, folder_path="storage_v2"):
-        """Persists the FAISS index and metadata to disk."""
+    @_after_warm_up
+    @_exclusive
+    def save_index(self, folder_path=Config.STORAGE_DIR):
+        """Persists the FAISS index, metadata and embedding store to disk."""
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
 
+        # The embedding store is written during ingestion; carry it over when saving elsewhere
+        store = self._get_embedding_store()
+        if os.path.abspath(folder_path) != os.path.abspath(self.storage_dir):
+            for name in EmbeddingStore.FILES:
+                if os.path.exists(os.path.join(self.storage_dir, name)):
+                    shutil.copyfile(os.path.join(self.storage_dir, name), os.path.join(folder_path, name))
+            self.storage_dir = folder_path
+            store = self._get_embedding_store()
+        store.retain(self.chunks.ids())
+
         if self.index:
+            import faiss
             faiss.write_index(self.index, os.path.join(folder_path, "index.faiss"))
 
-        with open(os.path.join(folder_path, "chunks.pkl"), "wb") as f:
-            pickle.dump(self.chunks, f)
+        self.chunks.save(folder_path)
+        self.lexical_index.save(folder_path)
+        reopened = ChunkStore.open(folder_path)
+        with self._rw_lock.write():
+            self.chunks = reopened
+        # Superseded by the memory-mapped chunk store
+        legacy_pickle = os.path.join(folder_path, "chunks.pkl")
+        if os.path.exists(legacy_pickle):
+            os.remove(legacy_pickle)
+        with open(os.path.join(folder_path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        with open(os.path.join(folder_path, "duplicates.json"), "w", encoding="utf-8") as f:
+            json.dump({str(cid): aliases for cid, aliases in self.duplicates.items()}, f)
+        if self.dedup_index is not None:
+            self.dedup_index.save(folder_path)
         print(f"✅ Index saved to {folder_path}")
 
-    def load_index(self, folder_path="storage_v2"):
-        """Loads the FAISS index and metadata from disk."""
+    @_exclusive
+    def load_index(self, folder_path=Config.STORAGE_DIR):
+        """Loads the FAISS index and metadata from disk, then swaps them in atomically."""
         if not os.path.exists(os.path.join(folder_path, "index.faiss")):
             return False
 
         try:
-            self.index = faiss.read_index(os.path.join(folder_path, "index.faiss"))
-            with open(os.path.join(folder_path, "chunks.pkl"), "rb") as f:
-                self.chunks = pickle.load(f)
+            import faiss
+            index = faiss.read_index(os.path.join(folder_path, "index.faiss"))
+            if ChunkStore.exists(folder_path):
+                chunks = ChunkStore.open(folder_path)
+            else:
+                # Older stores: one-time read of chunks.pkl, rewritten in the new format on next save
+                with open(os.path.join(folder_path, "chunks.pkl"), "rb") as f:
+                    legacy_chunks = pickle.load(f)
+                if isinstance(legacy_chunks, list):
+                    legacy_chunks = dict(enumerate(legacy_chunks))
+                chunks = ChunkStore(legacy_chunks)
+
+            manifest_path = os.path.join(folder_path, "manifest.json")
+            if os.path.exists(manifest_path):
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            else:
+                index, manifest = self._migrate_legacy_index(index, chunks)
+
+            if BM25Index.exists(folder_path):
+                lexical_index = BM25Index.load(folder_path)
+            else:
+                print("Building BM25 index for a store saved without one...")
+                lexical_index = BM25Index.from_chunks(chunks)
+
+            duplicates = {}
+            duplicates_path = os.path.join(folder_path, "duplicates.json")
+            if os.path.exists(duplicates_path):
+                with open(duplicates_path, encoding="utf-8") as f:
+                    duplicates = {int(cid): aliases for cid, aliases in json.load(f).items()}
+
+            with self._rw_lock.write():
+                self.index, self.chunks, self.manifest = index, chunks, manifest
+                self.lexical_index = lexical_index
+                self.duplicates = duplicates
+                self._invalidate_caches()
+            self.storage_dir = folder_path
+            self.embedding_store = None
+            self.dedup_index = None  # Loaded from folder_path on the next deduplicating ingest
             print(f"✅ Index loaded from {folder_path}")
             return True
         except Exception as e:
@@ -136,6 +715,250 @@ class ClinicalKnowledgeBase:
             return False
 
     # --- Helper Methods ---
+    def _iter_pages(self, docs: list[tuple], workers: int):
+        """
+        Yields (doc_idx, page_num, text, error) in document/page order.
+        With workers > 1, page ranges are extracted in a process pool; results are consumed in
+        submission order so downstream chunking sees exactly the serial sequence. At most
+        2 x workers page ranges are in flight, so extracted text waiting for the embedder stays
+        bounded, and page counting runs a few documents ahead instead of as a separate pass.
+        """
+        if workers <= 1:
+            from pypdf import PdfReader
+            for doc_idx, (_, path, _) in enumerate(docs):
+                try:
+                    reader = PdfReader(path)
+                    for i, page in enumerate(reader.pages):
+                        with tracer.span("pdf_parse", source=docs[doc_idx][0], page=i + 1, parallel=False):
+                            text = page.extract_text() or ""
+                        yield doc_idx, i + 1, text, None
+                except Exception as e:
+                    yield doc_idx, 0, "", e
+            return
+
+        paths = [path for _, path, _ in docs]
+        # spawn: never fork a process that already holds torch/faiss threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            counts = deque()  # Page-count futures, submitted up to `workers` documents ahead
+
+            def plan():
+                """(doc_idx, start, stop, count error) page ranges, in document/page order."""
+                for doc_idx in range(len(paths)):
+                    while len(counts) <= workers and doc_idx + len(counts) < len(paths):
+                        counts.append(pool.submit(count_pages, paths[doc_idx + len(counts)]))
+                    page_count, error = counts.popleft().result()
+                    if error is not None:
+                        yield doc_idx, 0, 0, error
+                    for start in range(0, page_count, Config.PAGES_PER_TASK):
+                        yield doc_idx, start, min(start + Config.PAGES_PER_TASK, page_count), None
+
+            in_flight = deque()  # (doc_idx, start, stop, future or None, count error)
+
+            def finish_oldest():
+                doc_idx, start, stop, future, error = in_flight.popleft()
+                if future is not None:
+                    # Parallel: time spent waiting on the workers for this page range
+                    with tracer.span("pdf_parse", source=docs[doc_idx][0], pages=stop - start, parallel=True):
+                        texts, error = future.result()
+                if error is not None:
+                    return [(doc_idx, 0, "", error)]
+                return [(doc_idx, start + offset + 1, text, None) for offset, text in enumerate(texts)]
+
+            for doc_idx, start, stop, error in plan():
+                future = pool.submit(extract_page_range, paths[doc_idx], start, stop) if error is None else None
+                in_flight.append((doc_idx, start, stop, future, error))
+                if len(in_flight) >= 2 * workers:
+                    yield from finish_oldest()
+            while in_flight:
+                yield from finish_oldest()
+
+    def _embed_and_add(self, chunk_ids: list[int], chunks: list[dict]):
+        """
+        Embeds one batch of chunks, persists the raw vectors to the embedding store and
+        appends the batch to the index under its stable IDs. Vectors already in the store
+        (e.g. from an interrupted run) are reused instead of re-encoded.
+        """
+        store = self._get_embedding_store()
+        rows = store.lookup(chunk_ids)
+        missing = np.flatnonzero(rows < 0)
+
+        if len(missing):
+            with tracer.span("embed_batch", chunks=len(missing), model=Config.EMBEDDING_MODEL):
+                embeddings = self.encoder.encode(
+                    [chunks[i]['text'] for i in missing],
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+            store.append([chunk_ids[i] for i in missing], embeddings)
+            rows = store.lookup(chunk_ids)
+        if len(missing) < len(chunk_ids):
+            print(f"Resumed {len(chunk_ids) - len(missing)} chunks from the embedding store.")
+
+        vectors = store.read(rows)
+        with tracer.span("index_add", chunks=len(chunk_ids)), self._rw_lock.write():
+            self.chunks.update(zip(chunk_ids, chunks))
+            for chunk_id, item in zip(chunk_ids, chunks):
+                self.lexical_index.add(chunk_id, item["text"])
+            self._invalidate_caches()
+            if self.index is None and vector_index.requires_training(Config.INDEX_TYPE):
+                return  # Deferred: rebuild_index() trains on the full set at the end of ingestion
+            if self.index is None:
+                self.index = vector_index.create_index(Config.INDEX_TYPE, store.dim)
+            self.index.add_with_ids(vectors, np.array(chunk_ids, dtype="int64"))
+
+    @_exclusive
+    def rebuild_index(self, index_type: str | None = None, batch_size: int = 4096):
+        """
+        Rebuilds the FAISS index from the embedding store, without re-running the encoder.
+        Pass index_type to switch index types (see Config.INDEX_TYPE); IVF types are
+        trained here on a random sample of up to Config.INDEX_TRAIN_SAMPLE vectors.
+        """
+        index_type = index_type or Config.INDEX_TYPE
+        store = self._get_embedding_store()
+        chunk_ids = self.chunks.ids()
+        self._backfill_embedding_store(chunk_ids)
+        if not len(chunk_ids) or store.dim is None:
+            with self._rw_lock.write():
+                self.index = None
+                self._invalidate_caches()
+            return
+
+        started = time.perf_counter()
+        index = vector_index.create_index(index_type, store.dim, len(chunk_ids))
+        if not index.is_trained:
+            sample_size = min(len(chunk_ids), Config.INDEX_TRAIN_SAMPLE)
+            sample_ids = np.random.default_rng(0).choice(chunk_ids, size=sample_size, replace=False)
+            print(f"Training {index_type} index on {sample_size} vectors...")
+            index.train(store.read(store.lookup(np.sort(sample_ids))))
+
+        for ids, vectors in store.iter_batches(chunk_ids, batch_size):
+            index.add_with_ids(vectors, ids)
+        # Built off-lock; searches keep using the old index until this swap
+        with self._rw_lock.write():
+            self.index = index
+            self._invalidate_caches()
+        print(f"✅ {vector_index.index_type_of(index)} index rebuilt from embedding store: "
+              f"{index.ntotal} vectors in {time.perf_counter() - started:.1f}s.")
+
+    def _get_embedding_store(self) -> EmbeddingStore:
+        if self.embedding_store is None or self.embedding_store.folder_path != self.storage_dir:
+            self.embedding_store = EmbeddingStore(self.storage_dir)
+        return self.embedding_store
+
+    def _backfill_embedding_store(self, chunk_ids: np.ndarray):
+        """Copies vectors that only exist in the FAISS index (stores built before the embedding store) to disk."""
+        store = self._get_embedding_store()
+        missing = chunk_ids[store.lookup(chunk_ids) < 0]
+        if not len(missing) or self.index is None:
+            return
+        print(f"Backfilling {len(missing)} vectors into the embedding store...")
+        for start in range(0, len(missing), Config.EMBED_BATCH_SIZE):
+            batch = missing[start:start + Config.EMBED_BATCH_SIZE]
+            store.append(batch.tolist(), np.vstack([self.index.reconstruct(int(cid)) for cid in batch]))
+
+    def _get_dedup_index(self) -> MinHashIndex:
+        """Signatures of the indexed chunks: loaded from storage_dir, or built from the chunk store."""
+        if self.dedup_index is None:
+            if MinHashIndex.exists(self.storage_dir):
+                self.dedup_index = MinHashIndex.load(self.storage_dir)
+            else:
+                print(f"Building near-duplicate signatures for {len(self.chunks)} chunks...")
+                self.dedup_index = MinHashIndex.from_chunks(self.chunks)
+        # A signature file saved with an older index may be out of step with the chunk store
+        live = set(self.chunks.ids().tolist())
+        for chunk_id in set(self.dedup_index.signatures) - live:
+            self.dedup_index.remove(chunk_id)
+        for chunk_id in live - set(self.dedup_index.signatures):
+            self.dedup_index.add(chunk_id, self.dedup_index.signature(self.chunks[chunk_id]["text"]))
+        return self.dedup_index
+
+    def _release_duplicates(self, chunk_ids: list[int], duplicate_ids: list[int]) -> list[int]:
+        """
+        Caller must hold the write lock. Forgets retired duplicate citations, and keeps every
+        retired chunk that other documents still cite: it is handed over to the first of those
+        (source/page rewritten, moved to its manifest entry) instead of being re-embedded.
+        Returns the chunk IDs that can actually be deleted.
+        """
+        if duplicate_ids:
+            retired = set(duplicate_ids)
+            self.duplicates = {cid: kept for cid, aliases in self.duplicates.items()
+                               if (kept := [alias for alias in aliases if alias["id"] not in retired])}
+        removable = []
+        for cid in chunk_ids:
+            aliases = self.duplicates.pop(cid, None)
+            item = self.chunks.get(cid)
+            if not aliases or not item:
+                removable.append(cid)
+                continue
+            heir, rest = aliases[0], aliases[1:]
+            self.chunks[cid] = {**item, "source": heir["source"], "page": heir["page"]}
+            entry = self.manifest[heir["source"]]
+            entry["chunk_ids"].append(cid)
+            entry["duplicate_ids"].remove(heir["id"])
+            if rest:
+                self.duplicates[cid] = rest
+        return removable
+
+    def _remove_chunks(self, chunk_ids: list[int], duplicate_ids: list[int] = ()):
+        if not chunk_ids and not duplicate_ids:
+            return
+        with self._rw_lock.write():
+            chunk_ids = self._release_duplicates(chunk_ids, duplicate_ids)
+            for cid in chunk_ids:
+                if self.dedup_index is not None:
+                    self.dedup_index.remove(cid)
+                item = self.chunks.pop(cid, None)
+                if item:
+                    self.lexical_index.remove(cid, item["text"])
+            self._invalidate_caches()
+            if self.index is None:
+                return
+            removable = vector_index.supports_remove(self.index)
+            if removable:
+                self.index.remove_ids(np.array(chunk_ids, dtype="int64"))
+        if not removable:
+            self.rebuild_index(vector_index.index_type_of(self.index))
+
+    @staticmethod
+    def _migrate_legacy_index(index, chunks: ChunkStore):
+        """Upgrades a pre-manifest store (positional chunk list + plain index) to stable IDs."""
+        import faiss
+        if not isinstance(index, faiss.IndexIDMap2):
+            vectors = index.reconstruct_n(0, index.ntotal)
+            index = vector_index.create_index("flat_ip", index.d)
+            index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+
+        # Unknown fingerprints: the next upload of each file replaces its legacy chunks
+        manifest = {}
+        for cid, item in chunks.items():
+            entry = manifest.setdefault(item["source"], {"sha256": None, "chunk_ids": [], "tags": []})
+            entry["chunk_ids"].append(cid)
+        return index, manifest
+
+    def _invalidate_caches(self):
+        """Called on every index/metadata mutation. Query embeddings only depend on the encoder and are kept."""
+        self.index_version += 1
+        self.result_cache.clear()
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Cache key: case/whitespace-insensitive (MiniLM is uncased, so the embedding is unchanged)."""
+        return re.sub(r'\s+', ' ', query).strip().lower()
+
+    @staticmethod
+    def _file_digest(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _chunk_id(filename: str, digest: str, ordinal: int) -> int:
+        """Stable 63-bit ID (FAISS ids are signed int64; -1 means 'no result')."""
+        raw = hashlib.sha256(f"{filename}\0{digest}\0{ordinal}".encode("utf-8")).digest()
+        return int.from_bytes(raw[:8], "big") & 0x7FFF_FFFF_FFFF_FFFF
+
     def _sliding_window_chunking(self, text: str, window_size=1000, overlap=300) -> list[str]:
         """Splits text into overlapping windows to ensure boundary context is kept."""
         text = re.sub(r'\s+', ' ', text).strip()
@@ -0,0 +1,97 @@
+import time
+import threading
+from src.config import Config
+from src.context_packing import estimate_tokens
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved chunks against the query with a small local cross-encoder and
+    keeps the best few, so fewer (and more relevant) chunks reach the Researcher prompt.
+
+    Latency budget: the per-pair scoring cost is tracked as a moving average. If scoring
+    every candidate is predicted to exceed budget_ms, only the top-ranked candidates that
+    fit are scored; if not even top_k fit (or a call overruns), the vector order is kept.
+    """
+
+    def __init__(self, model_name: str = Config.RERANK_MODEL, budget_ms: float = Config.RERANK_BUDGET_MS,
+                 batch_size: int = Config.RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.ms_per_pair = None  # Moving average, None until the first scored batch
+        self.reranked = 0
+        self.fallbacks = 0
+        self.rerank_ms_total = 0.0
+        self.tokens_saved_total = 0
+
+    def _load(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    print(f"Loading Reranker Model: {self.model_name}...")
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def rerank(self, query: str, candidates: list[tuple[int, str]], top_k: int,
+               baseline_k: int | None = None) -> list[int]:
+        """
+        candidates: (chunk_id, text) in vector/hybrid order. Returns up to top_k chunk IDs,
+        best first. baseline_k is how many chunks the prompt would carry without reranking
+        (for the tokens-saved statistic; defaults to top_k).
+        """
+        if len(candidates) <= 1:
+            return [cid for cid, _ in candidates[:top_k]]
+
+        model = self._load()  # Cold load is not charged to the per-query budget
+        n_scored = len(candidates)
+        if self.ms_per_pair:
+            n_scored = min(n_scored, int(self.budget_ms / self.ms_per_pair))
+        if n_scored < min(top_k, len(candidates)):
+            # Decay the estimate so one slow outlier doesn't disable reranking for good
+            with self._stats_lock:
+                self.ms_per_pair *= 0.9
+            return self._fallback(candidates, top_k)
+
+        started = time.perf_counter()
+        scores = model.predict([(query, text) for _, text in candidates[:n_scored]],
+                               batch_size=self.batch_size, show_progress_bar=False)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._stats_lock:
+            observed = elapsed_ms / n_scored
+            self.ms_per_pair = observed if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * observed
+        if elapsed_ms > 2 * self.budget_ms:
+            return self._fallback(candidates, top_k)
+
+        order = sorted(range(n_scored), key=lambda i: -float(scores[i]))
+        kept = [candidates[i][0] for i in order[:top_k]]
+
+        # Prompt tokens saved vs. sending the first baseline_k chunks in retrieval order
+        kept_set = set(kept)
+        baseline_tokens = sum(estimate_tokens(text) for _, text in candidates[:baseline_k or top_k])
+        kept_tokens = sum(estimate_tokens(text) for cid, text in candidates if cid in kept_set)
+        with self._stats_lock:
+            self.reranked += 1
+            self.rerank_ms_total += elapsed_ms
+            self.tokens_saved_total += max(0, baseline_tokens - kept_tokens)
+        return kept
+
+    def _fallback(self, candidates: list[tuple[int, str]], top_k: int) -> list[int]:
+        with self._stats_lock:
+            self.fallbacks += 1
+        return [cid for cid, _ in candidates[:top_k]]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "reranked": self.reranked,
+                "fallbacks": self.fallbacks,
+                "mean_rerank_ms": round(self.rerank_ms_total / self.reranked, 1) if self.reranked else 0.0,
+                "mean_tokens_saved": round(self.tokens_saved_total / self.reranked) if self.reranked else 0,
+                "ms_per_pair": round(self.ms_per_pair, 3) if self.ms_per_pair else None,
+            }
@@ -0,0 +1,117 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from src.config import Config
+
+
+class SemanticResponseCache:
+    """
+    Disk-backed (SQLite) cache of final agent answers, placed in front of
+    GeminiClient.orchestrate_response.
+
+    An entry is reused when the retrieved context is identical (SHA-256), the
+    patient/clinician mode matches and the new query's embedding is within
+    `threshold` cosine similarity of the cached query. The context hash keeps
+    paraphrases that retrieve different guideline text from sharing an answer.
+    Entries expire after `ttl_seconds`; beyond `max_entries` the least recently
+    used ones are evicted.
+    """
+
+    def __init__(self, embed_fn, path: str = Config.RESPONSE_CACHE_PATH,
+                 ttl_seconds: int = Config.RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries: int = Config.RESPONSE_CACHE_MAX_ENTRIES,
+                 threshold: float = Config.RESPONSE_CACHE_SIMILARITY):
+        # embed_fn: query -> normalized (1, dim) float32 vector (ClinicalKnowledgeBase.embed_query)
+        self.embed_fn = embed_fn
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                id INTEGER PRIMARY KEY,
+                context_hash TEXT NOT NULL,
+                patient_mode INTEGER NOT NULL,
+                query TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_bucket ON responses (context_hash, patient_mode)")
+        self._db.commit()
+
+    def lookup(self, query: str, context: str, is_patient_mode: bool) -> str | None:
+        """Returns a cached answer for a semantically equivalent query, or None."""
+        query_vec = self._embed(query)
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, embedding, response FROM responses "
+                "WHERE context_hash = ? AND patient_mode = ? AND created >= ?",
+                (self._hash(context), int(is_patient_mode), now - self.ttl_seconds)
+            ).fetchall()
+
+            best_id, best_response, best_score = None, None, self.threshold
+            for row_id, blob, response in rows:
+                score = float(np.dot(np.frombuffer(blob, dtype="float32"), query_vec))
+                if score >= best_score:
+                    best_id, best_response, best_score = row_id, response, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE id = ?", (now, best_id))
+            self._db.commit()
+            self.hits += 1
+            return best_response
+
+    def store(self, query: str, context: str, is_patient_mode: bool, response: str):
+        query_vec = self._embed(query)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO responses (context_hash, patient_mode, query, embedding, response, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._hash(context), int(is_patient_mode), query, query_vec.tobytes(), response, now, now)
+            )
+            # TTL expiry, then LRU eviction down to max_entries
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "DELETE FROM responses WHERE id IN ("
+                "SELECT id FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": size,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def _embed(self, query: str) -> np.ndarray:
+        return np.asarray(self.embed_fn(query), dtype="float32").reshape(-1)
+
+    @staticmethod
+    def _hash(context: str) -> str:
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import socket
+import threading
+import http.client
+import numpy as np
+from src.config import Config
+from src.cache import LRUCache
+from src.retrieval_server import parse_address
+from src.search_filters import SearchFilter
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class RemoteKnowledgeBase:
+    """
+    Client mode of ClinicalKnowledgeBase: the same methods app.py uses, served by a
+    retrieval server (cli.py serve / src/retrieval_server.py) that owns the encoder and
+    the index. Nothing heavy is loaded in this process. Create it through
+    ClinicalKnowledgeBase.create() with Config.RETRIEVAL_SERVER_URL set.
+    Ingestion sends file paths, so the server must run on the same machine.
+    """
+
+    def __init__(self, url: str = Config.RETRIEVAL_SERVER_URL, timeout: float = Config.RETRIEVAL_TIMEOUT_S,
+                 startup_timeout: float = Config.RETRIEVAL_STARTUP_TIMEOUT_S):
+        self.url = url
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self._address = parse_address(url)
+        self._local = threading.local()  # One keep-alive connection per thread
+        self._ready = threading.Event()
+        self._ready.set()
+        self.warmup_error = None
+        self._empty = None  # Last is_empty() answer; app.py asks on every rerun
+        # The router and the answer cache embed the same query more than once per request
+        self.query_cache = LRUCache(Config.QUERY_CACHE_SIZE)
+
+    # --- Transport ---
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            kind, address = self._address
+            if kind == "unix":
+                connection = _UnixHTTPConnection(address, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(*address, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, payload: dict | None = None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = json.loads(response.read())
+                break
+            except (ConnectionError, http.client.HTTPException) as e:
+                # Keep-alive connection closed by the server: reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise ConnectionError(f"Retrieval server {self.url} unreachable: {e}") from e
+        if response.status != 200:
+            raise RuntimeError(f"Retrieval server {path}: {data.get('error', response.status)}")
+        return data
+
+    # --- Startup ---
+    def _wait_for_server(self) -> dict:
+        """
+        Polls /health until the server has finished its own warm-up (encoder and index
+        loaded), so callers never see the empty index of a server that is still starting.
+        Also waits for the socket to appear. Returns the final health report.
+        """
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                health = self._request("GET", "/health")
+                if health["ready"]:
+                    return health
+            except (ConnectionError, OSError):
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Retrieval server {self.url} not ready after {self.startup_timeout}s")
+            time.sleep(0.2)
+
+    def warm_up(self, folder_path=None) -> threading.Thread:
+        """Waits in the background for the server to become ready (the server does its own warm-up)."""
+        self._ready.clear()
+
+        def run():
+            try:
+                health = self._wait_for_server()
+                if health["error"]:
+                    self.warmup_error = RuntimeError(health["error"])
+            except Exception as e:
+                self.warmup_error = e
+                print(f"Retrieval server check failed: {e}")
+            finally:
+                self._ready.set()
+
+        thread = threading.Thread(target=run, name="kb-server-check", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def is_empty(self) -> bool:
+        """Cached after the first check; ingesting or reloading through this client re-checks."""
+        if self._empty is None:
+            self._empty = self._wait_for_server()["vectors"] == 0
+        return self._empty
+
+    # --- Retrieval ---
+    def search(self, query: str, top_k: int = 15, filters: SearchFilter | None = None) -> str:
+        return self._request("POST", "/search", {"query": query, "top_k": top_k,
+                                                 "filters": filters.to_dict() if filters else None})["context"]
+
+    def embed_query(self, query: str) -> np.ndarray:
+        key = " ".join(query.split()).lower()
+        query_vec = self.query_cache.get(key)
+        if query_vec is None:
+            vectors = self._request("POST", "/embed", {"queries": [query]})["vectors"]
+            query_vec = np.array(vectors, dtype="float32")
+            self.query_cache.put(key, query_vec)
+        return query_vec
+
+    def document_tags(self) -> dict:
+        return self._request("GET", "/documents")
+
+    def cache_stats(self) -> dict:
+        return self._request("GET", "/stats")["cache"]
+
+    # --- Ingestion / persistence (run by the server on its own storage folder) ---
+    def load_and_process_pdfs(self, pdf_paths: list[str], prune_missing: bool = False,
+                              workers: int | None = None, tags: list[str] | None = None) -> dict:
+        self._empty = None
+        return self._request("POST", "/ingest", {"paths": [os.path.abspath(p) for p in pdf_paths],
+                                                 "prune_missing": prune_missing, "workers": workers, "tags": tags})
+
+    def save_index(self, folder_path=None):
+        self._request("POST", "/save", {})
+
+    def load_index(self, folder_path=None) -> bool:
+        self._empty = None
+        return self._request("POST", "/load", {})["loaded"]
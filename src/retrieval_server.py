@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import queue
+import threading
+import socketserver
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import numpy as np
+from src.config import Config
+from src.search_filters import SearchFilter
+from src.tracing import tracer
+
+
+def parse_address(url: str) -> tuple[str, object]:
+    """'http://127.0.0.1:8765' -> ('tcp', (host, port)); 'unix:///tmp/medi.sock' -> ('unix', path)."""
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return "unix", parsed.path
+    if parsed.scheme == "http" and parsed.port:
+        return "tcp", (parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported retrieval server address '{url}' (use http://host:port or unix:///path)")
+
+
+class _Request:
+    __slots__ = ("kind", "query", "top_k", "filters", "future")
+
+    def __init__(self, kind: str, query: str, top_k: int | None = None, filters: SearchFilter | None = None):
+        self.kind = kind
+        self.query = query
+        self.top_k = top_k
+        self.filters = filters
+        self.future = Future()
+
+
+class QueryBatcher:
+    """
+    Micro-batches concurrent queries for one knowledge base. After the first request of a
+    batch arrives, requests are collected for up to window_ms (or until max_batch), then
+    served together by one worker thread: a single encoder call for all query texts and a
+    single FAISS search for all unfiltered searches (ClinicalKnowledgeBase.search_batch).
+    window_ms trades a few milliseconds of added latency for throughput under load.
+    """
+
+    def __init__(self, kb, window_ms: float = Config.BATCH_WINDOW_MS, max_batch: int = Config.BATCH_MAX_SIZE):
+        self.kb = kb
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self.batch_sizes = deque(maxlen=1000)  # Recent batch sizes, newest last
+        self.requests = 0
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def search(self, query: str, top_k: int = 15, filters: SearchFilter | None = None) -> str:
+        return self._submit(_Request("search", query, top_k, filters)).result()
+
+    def embed(self, queries: list[str]) -> np.ndarray:
+        """(n, dim) query embeddings; all n are queued before waiting, so they can share a batch."""
+        futures = [self._submit(_Request("embed", query)) for query in queries]
+        return np.vstack([future.result() for future in futures])
+
+    def stats(self) -> dict:
+        sizes = list(self.batch_sizes)
+        return {
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": len(sizes),
+            "mean_batch_size": round(float(np.mean(sizes)), 2) if sizes else 0.0,
+            "max_batch_size": max(sizes) if sizes else 0,
+        }
+
+    def _submit(self, request: _Request) -> Future:
+        self._queue.put(request)
+        return request.future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window_ms / 1000
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: list[_Request]):
+        self.requests += len(batch)
+        self.batch_sizes.append(len(batch))
+        try:
+            with tracer.span("micro_batch", size=len(batch), window_ms=self.window_ms):
+                # One encoder call for every query text in the batch (searches then hit the query cache)
+                vectors = self.kb.embed_queries([r.query for r in batch])
+                searches = [r for r in batch if r.kind == "search"]
+                contexts = self.kb.search_batch([(r.query, r.top_k, r.filters) for r in searches]) if searches else []
+            for request, vector in zip(batch, vectors):
+                if request.kind == "embed":
+                    request.future.set_result(vector[None, :])
+            for request, context in zip(searches, contexts):
+                request.future.set_result(context)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # Listen backlog: every app thread keeps its own connection
+
+
+class _ThreadingTCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class RetrievalServer:
+    """
+    Local HTTP service (TCP or Unix socket) that owns one ClinicalKnowledgeBase, so several
+    app replicas on a box share one encoder and one index instead of loading N copies.
+    Clients: src/retrieval_client.RemoteKnowledgeBase. Endpoints (JSON):
+      POST /search  {query, top_k, filters} -> {context}        micro-batched
+      POST /embed   {queries}               -> {vectors}        micro-batched
+      POST /ingest  {paths, tags, prune_missing, workers} -> summary  (files must be readable by the server)
+      POST /save, POST /load
+      GET  /health, /stats, /documents, /metrics (Prometheus text)
+    """
+
+    def __init__(self, kb, url: str, storage_dir: str = Config.STORAGE_DIR,
+                 window_ms: float = Config.BATCH_WINDOW_MS, max_batch: int = Config.BATCH_MAX_SIZE):
+        self.kb = kb
+        self.url = url
+        self.storage_dir = storage_dir
+        self.batcher = QueryBatcher(kb, window_ms, max_batch)
+        self._server = None
+
+    def handle(self, method: str, path: str, payload: dict):
+        """Routes one request; returns a JSON-serializable result (or a str for /metrics)."""
+        kb = self.kb
+        if method == "GET" and path == "/health":
+            return {"ready": kb.is_ready(), "error": str(kb.warmup_error) if kb.warmup_error else None,
+                    "chunks": len(kb.chunks), "vectors": kb.index.ntotal if kb.index else 0}
+        if method == "GET" and path == "/stats":
+            return {"cache": kb.cache_stats(), "batching": self.batcher.stats()}
+        if method == "GET" and path == "/documents":
+            return kb.document_tags()
+        if method == "GET" and path == "/metrics":
+            return tracer.prometheus_text()
+        if method == "POST" and path == "/search":
+            return {"context": self.batcher.search(payload["query"], payload.get("top_k", 15),
+                                                   SearchFilter.from_dict(payload.get("filters")))}
+        if method == "POST" and path == "/embed":
+            return {"vectors": self.batcher.embed(payload["queries"]).tolist()}
+        if method == "POST" and path == "/ingest":
+            return kb.load_and_process_pdfs(payload["paths"], prune_missing=payload.get("prune_missing", False),
+                                            workers=payload.get("workers"), tags=payload.get("tags"))
+        if method == "POST" and path == "/save":
+            kb.save_index(self.storage_dir)
+            return {"saved": True}
+        if method == "POST" and path == "/load":
+            return {"loaded": kb.load_index(self.storage_dir)}
+        raise KeyError(path)
+
+    def start(self):
+        """Binds the socket and serves from daemon threads. Returns immediately."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive: clients reuse one connection per thread
+
+            def _serve(self, method: str):
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    payload = json.loads(self.rfile.read(length)) if length else {}
+                    result = server.handle(method, urlparse(self.path).path.rstrip("/"), payload)
+                    status = 200
+                except KeyError as e:
+                    result, status = {"error": f"Not found or missing field: {e}"}, 404
+                except Exception as e:
+                    result, status = {"error": f"{type(e).__name__}: {e}"}, 500
+                is_text = isinstance(result, str)
+                body = (result if is_text else json.dumps(result)).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; version=0.0.4" if is_text else "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        kind, address = parse_address(self.url)
+        if kind == "unix":
+            if os.path.exists(address):
+                os.remove(address)  # Stale socket from a previous run
+            self._server = _ThreadingUnixHTTPServer(address, Handler)
+        else:
+            self._server = _ThreadingTCPHTTPServer(address, Handler)
+        threading.Thread(target=self._server.serve_forever, name="retrieval-server", daemon=True).start()
+        print(f"Retrieval server listening on {self.url} (batch window {self.batcher.window_ms} ms, "
+              f"max batch {self.batcher.max_batch})")
+        return self
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            kind, address = parse_address(self.url)
+            if kind == "unix" and os.path.exists(address):
+                os.remove(address)
+            self._server = None
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class SearchFilter:
+    """
+    Restricts a search to part of a knowledge base (all conditions must hold):
+      sources  document filenames, e.g. ["malaria_guidelines.pdf"]
+      pages    inclusive (first, last) page range; either end may be None
+      tags     document tags set at ingestion; a document matches if it has any of them
+    Resolved to the matching chunk IDs and applied inside FAISS / BM25 (see
+    ClinicalKnowledgeBase.allowed_ids), so filtered-out chunks never take a top_k slot.
+    """
+
+    def __init__(self, sources=None, pages: tuple | None = None, tags=None):
+        self.sources = frozenset(sources) if sources else None
+        self.pages = tuple(pages) if pages else None
+        self.tags = frozenset(tags) if tags else None
+
+    def __bool__(self):
+        return bool(self.sources or self.pages or self.tags)
+
+    def key(self) -> tuple:
+        """Hashable form for cache keys."""
+        return (tuple(sorted(self.sources or ())), self.pages, tuple(sorted(self.tags or ())))
+
+    def matches_document(self, filename: str, tags) -> bool:
+        if self.sources is not None and filename not in self.sources:
+            return False
+        return self.tags is None or bool(self.tags & set(tags or ()))
+
+    def to_dict(self) -> dict:
+        """JSON-safe form (retrieval server requests); inverse of from_dict."""
+        return {"sources": sorted(self.sources) if self.sources else None,
+                "pages": list(self.pages) if self.pages else None,
+                "tags": sorted(self.tags) if self.tags else None}
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "SearchFilter | None":
+        return cls(**data) if data else None
+
+    def __repr__(self):
+        return f"SearchFilter(sources={self.sources}, pages={self.pages}, tags={self.tags})"
+
+    @staticmethod
+    def parse_pages(text: str) -> tuple:
+        """'3-10' -> (3, 10), '5' -> (5, 5), '12-' -> (12, None), '-4' -> (None, 4)."""
+        first, _, last = text.partition("-") if "-" in text else (text, "", text)
+        return (int(first) if first.strip() else None, int(last) if last.strip() else None)
+
+
+class ResolvedFilter:
+    """The chunk IDs a SearchFilter selects, in the forms the retrievers consume."""
+
+    def __init__(self, ids: np.ndarray):
+        import faiss  # Only needed once a filter is actually used
+        self.ids = ids
+        self.id_set = set(ids.tolist())  # BM25 scores only these postings
+        # FAISS skips every other ID during the search itself (IndexIDMap2 translates to chunk IDs)
+        self.selector = faiss.IDSelectorBatch(ids) if len(ids) else None
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,87 @@
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+CITATION_TAG = re.compile(r"\[Source: '(.*?)', Page: (\d+)\]")
+
+
+class StubTransientError(Exception):
+    """Mimics a retryable API error (google.genai errors expose the HTTP status as .code)."""
+
+    def __init__(self, message="Stub backend: 503 UNAVAILABLE", code=503):
+        super().__init__(message)
+        self.code = code
+
+
+class StubGenAIClient:
+    """
+    Offline stand-in for google.genai.Client, for benchmarks and bulk-regression dry runs.
+
+    Exposes the subset of the SDK the app uses: client.models.generate_content,
+    client.models.generate_content_stream and client.aio.models.generate_content.
+    Answers are deterministic: they echo the user query and cite the first few
+    [Source: ..., Page: ...] tags found in the prompt, so citation handling downstream
+    still works. Latency is simulated as latency_s + per_char_latency_s * len(prompt),
+    and failure_rate injects StubTransientError to exercise retry logic.
+    """
+
+    def __init__(self, latency_s: float = 0.0, per_char_latency_s: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.per_char_latency_s = per_char_latency_s
+        self.failure_rate = failure_rate
+        self.calls = Counter()  # model name -> number of calls
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = _StubModels(self)
+        self.aio = SimpleNamespace(models=_AsyncStubModels(self))
+
+    def _prepare(self, model: str, contents: str) -> tuple[float, str]:
+        """Counts the call, maybe raises a transient failure, returns (delay, answer text)."""
+        with self._lock:
+            self.calls[model] += 1
+            fail = self._rng.random() < self.failure_rate
+        if fail:
+            raise StubTransientError()
+        delay = self.latency_s + self.per_char_latency_s * len(contents)
+        return delay, self._answer(model, contents)
+
+    @staticmethod
+    def _answer(model: str, contents: str) -> str:
+        match = re.search(r"USER QUERY:\s*(.*)", contents)
+        query = match.group(1).strip() if match else contents.strip()[:120]
+        citations = list(dict.fromkeys(CITATION_TAG.findall(contents)))[:3]
+        lines = [f"Stub answer from {model} for: {query}"]
+        lines += [f"- Relevant guideline excerpt [Source: '{source}', Page: {page}]" for source, page in citations]
+        return "\n".join(lines)
+
+
+class _StubModels:
+    def __init__(self, backend: StubGenAIClient):
+        self._backend = backend
+
+    def generate_content(self, model: str, contents: str):
+        delay, text = self._backend._prepare(model, contents)
+        time.sleep(delay)
+        return SimpleNamespace(text=text)
+
+    def generate_content_stream(self, model: str, contents: str):
+        delay, text = self._backend._prepare(model, contents)
+        words = re.findall(r"\S+\s*", text)
+        for word in words:
+            time.sleep(delay / max(len(words), 1))
+            yield SimpleNamespace(text=word)
+
+
+class _AsyncStubModels:
+    def __init__(self, backend: StubGenAIClient):
+        self._backend = backend
+
+    async def generate_content(self, model: str, contents: str):
+        delay, text = self._backend._prepare(model, contents)
+        await asyncio.sleep(delay)
+        return SimpleNamespace(text=text)
@@ -0,0 +1,227 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import random
+import cProfile
+import threading
+import weakref
+import contextlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.config import Config
+
+# Histogram bucket upper bounds (seconds) for the Prometheus export
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "duration_ms")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attrs: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration_ms = None
+
+    def set(self, **attrs):
+        """Adds attributes known only once the work is done (hit counts, output sizes...)."""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": round(self.start, 6), "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+        }
+
+
+class Tracer:
+    """
+    Lightweight in-process tracing: timed, nested spans with attributes, aggregated into
+    per-span latency histograms.
+
+    - tracer.span("faiss_search", k=15) as a context manager; spans opened inside it on the
+      same thread (or, in async code, the same asyncio task) become its children and share
+      its trace_id.
+    - Finished spans go to a ring buffer (recent_spans) and, if export_path is set, are
+      appended to a JSONL file. prometheus_text() renders the histograms in the Prometheus
+      text format; start_metrics_server() serves it on /metrics.
+    - tracer.profile() runs cProfile around one request, when switched on for that request.
+    """
+
+    def __init__(self, enabled: bool = Config.TRACE_ENABLED, buffer_size: int = Config.TRACE_BUFFER_SIZE,
+                 export_path: str | None = Config.TRACE_EXPORT_PATH):
+        self.enabled = enabled
+        self.export_path = export_path
+        self.recent_spans = deque(maxlen=buffer_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._histograms = {}  # span name -> {"buckets": [...], "count": n, "sum": s}
+        self._server = None
+
+    @contextlib.contextmanager
+    def span(self, name: str, parent: Span | None = None, **attrs):
+        """parent: explicit parent for work handed to another thread (defaults to this thread's open span)."""
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        stack = self._stack()
+        if parent is None or parent is _NULL_SPAN:
+            parent = stack[-1] if stack else None
+        span = Span(name, parent.trace_id if parent else f"{random.getrandbits(64):016x}",
+                    parent.span_id if parent else None, attrs)
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            # Removed by identity: a streaming generator may be closed after later spans opened
+            if span in stack:
+                stack.remove(span)
+            self._finish(span)
+
+    def current_span(self):
+        """Innermost open span on this thread (a no-op span if there is none)."""
+        stack = self._stack()
+        return stack[-1] if stack else _NULL_SPAN
+
+    def current_trace_id(self) -> str | None:
+        stack = self._stack()
+        return stack[-1].trace_id if stack else None
+
+    def _stack(self) -> list:
+        """Open spans of this thread, or of the running asyncio task (tasks interleave on one thread)."""
+        task = _current_task()
+        if task is not None:
+            if not hasattr(self._local, "task_stacks"):
+                self._local.task_stacks = weakref.WeakKeyDictionary()
+            return self._local.task_stacks.setdefault(task, [])
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _finish(self, span: Span):
+        seconds = span.duration_ms / 1000
+        with self._lock:
+            self.recent_spans.append(span)
+            hist = self._histograms.setdefault(span.name, {"buckets": [0] * len(BUCKETS), "count": 0, "sum": 0.0})
+            hist["count"] += 1
+            hist["sum"] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+            if self.export_path:
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    # --- Export ---
+    def summary(self) -> dict:
+        """{span name: {'count': n, 'mean_ms': x}} for dashboards and CLI reports."""
+        with self._lock:
+            return {name: {"count": h["count"], "mean_ms": round(h["sum"] / h["count"] * 1000, 2)}
+                    for name, h in self._histograms.items()}
+
+    def prometheus_text(self) -> str:
+        lines = ["# HELP medi_span_duration_seconds Duration of traced pipeline stages.",
+                 "# TYPE medi_span_duration_seconds histogram"]
+        with self._lock:
+            for name, hist in sorted(self._histograms.items()):
+                for bound, count in zip(BUCKETS, hist["buckets"]):
+                    lines.append(f'medi_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'medi_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'medi_span_duration_seconds_sum{{span="{name}"}} {hist["sum"]:.6f}')
+                lines.append(f'medi_span_duration_seconds_count{{span="{name}"}} {hist["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: str):
+        """Writes the Prometheus text snapshot to a file (e.g. for node_exporter's textfile collector)."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def start_metrics_server(self, port: int = Config.METRICS_PORT, host: str = "127.0.0.1"):
+        """Serves /metrics from a daemon thread. Idempotent (Streamlit re-runs the script)."""
+        if self._server is not None:
+            return self._server
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics endpoint: http://{host}:{port}/metrics")
+        return self._server
+
+    # --- Profiling ---
+    @contextlib.contextmanager
+    def profile(self, enabled: bool = True, label: str = "request", out_dir: str = Config.PROFILE_DIR):
+        """
+        cProfile around one request. Yields a dict that receives 'path' (.prof file, open with
+        snakeviz/pstats) and 'top' (text of the 25 most expensive functions by cumulative time).
+        Only one request is profiled at a time; concurrent requests run unprofiled.
+        """
+        result = {}
+        if not enabled or not self._profile_lock.acquire(blocking=False):
+            yield result
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+            os.makedirs(out_dir, exist_ok=True)
+            result["path"] = os.path.join(out_dir, f"{label}_{time.strftime('%Y%m%d-%H%M%S')}.prof")
+            profiler.dump_stats(result["path"])
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(25)
+            result["top"] = text.getvalue()
+        finally:
+            self._profile_lock.release()
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _current_task():
+    # Not imported here: if nothing loaded asyncio, no task can be running
+    asyncio = sys.modules.get("asyncio")
+    if asyncio is None:
+        return None
+    try:
+        return asyncio.current_task()
+    except RuntimeError:  # No running event loop in this thread
+        return None
+
+
+# Process-wide tracer shared by the knowledge base, the LLM clients and the UI
+tracer = Tracer()
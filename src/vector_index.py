@@ -0,0 +1,97 @@
+import math
+from src.config import Config
+
+# faiss is imported inside the functions: importing this module must stay cheap (fast app start)
+
+# Embeddings are L2-normalized, so inner product == cosine similarity.
+# flat_l2 is kept for stores built before the index type became configurable.
+INDEX_TYPES = ("flat_ip", "flat_l2", "ivf_flat", "ivf_pq", "hnsw")
+TRAINED_TYPES = ("ivf_flat", "ivf_pq")
+
+
+def requires_training(index_type: str) -> bool:
+    return index_type in TRAINED_TYPES
+
+
+def ivf_nlist(n_vectors: int) -> int:
+    """IVF cell count: Config.IVF_NLIST, capped at ~4*sqrt(N) and N/39 (FAISS's minimum points per cell)."""
+    return max(1, min(Config.IVF_NLIST, int(4 * math.sqrt(max(n_vectors, 1))), n_vectors // 39))
+
+
+def create_index(index_type: str, dimension: int, n_vectors: int = 0):
+    """
+    Creates an empty index addressable by chunk ID (add_with_ids / remove_ids).
+    Trained types (IVF) need n_vectors to size the coarse quantizer and must be trained
+    before use; if there are too few vectors to train, a flat_ip index is returned instead.
+    """
+    import faiss
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}")
+
+    if index_type == "flat_ip":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    if index_type == "flat_l2":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, Config.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = Config.HNSW_EF_CONSTRUCTION
+        return faiss.IndexIDMap2(hnsw)
+
+    nlist = ivf_nlist(n_vectors)
+    min_train = nlist if index_type == "ivf_flat" else max(nlist, 2 ** Config.PQ_NBITS)
+    if n_vectors < min_train:
+        print(f"Only {n_vectors} vectors, too few to train {index_type}; using flat_ip.")
+        return create_index("flat_ip", dimension)
+
+    quantizer = faiss.IndexFlatIP(dimension)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, Config.PQ_M, Config.PQ_NBITS,
+                                 faiss.METRIC_INNER_PRODUCT)
+    # IVF stores chunk IDs natively; a hashtable direct map enables remove_ids/reconstruct by ID
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def index_type_of(index) -> str:
+    """Recovers the configured type name from a (loaded) index."""
+    import faiss
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    if inner.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return "flat_ip"
+    return "flat_l2"
+
+
+def supports_remove(index) -> bool:
+    """HNSW graphs cannot delete nodes; such indexes are rebuilt from the embedding store instead."""
+    return index_type_of(index) != "hnsw"
+
+
+def search_params(index, nprobe: int | None = None, ef_search: int | None = None, selector=None):
+    """
+    Query-time tuning (nprobe for IVF, efSearch for HNSW), plus an optional faiss.IDSelector
+    that restricts the search to a subset of chunk IDs (filtered search). None for an
+    unfiltered flat index. The caller must keep `selector` alive until the search returns.
+    """
+    import faiss
+    index_type = index_type_of(index)
+    if index_type in TRAINED_TYPES:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(nprobe or Config.IVF_NPROBE, index.nlist)
+    elif index_type == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or Config.HNSW_EF_SEARCH
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
@@ -0,0 +1,57 @@
+import hashlib
+import numpy as np
+import pytest
+from benchmarks.synthetic_corpus import write_pdf
+from src import rag_engine
+from src.knowledge_library import KnowledgeLibrary
+from src.rag_engine import ClinicalKnowledgeBase
+
+
+class HashingEncoder:
+    """Bag-of-words hashing encoder: deterministic, no model download."""
+
+    def get_sentence_embedding_dimension(self):
+        return 32
+
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        vectors = np.full((len(texts), 32), 1e-3, dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "little") % 32] += 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def make_kb(tmp_path):
+    """Factory for knowledge bases with the hashing encoder, storing under tmp_path/<name>."""
+    def make(name: str = "storage") -> ClinicalKnowledgeBase:
+        kb = ClinicalKnowledgeBase()
+        kb._encoder = HashingEncoder()
+        kb.storage_dir = str(tmp_path / name)
+        return kb
+    return make
+
+
+@pytest.fixture
+def kb(make_kb):
+    return make_kb()
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Writes tmp_path/pdfs/<name> with one text page per string and returns its path."""
+    folder = tmp_path / "pdfs"
+    folder.mkdir(exist_ok=True)
+
+    def make(name: str, pages: list[str]) -> str:
+        path = str(folder / name)
+        write_pdf(path, pages)
+        return path
+    return make
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    """KnowledgeLibrary under tmp_path/library whose collections load the hashing encoder."""
+    monkeypatch.setattr(rag_engine, "load_model", HashingEncoder)
+    return KnowledgeLibrary(str(tmp_path / "library"))
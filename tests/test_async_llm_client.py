@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from src.async_llm_client import AsyncGeminiClient
+from src.config import Config
+from src.llm_client import GeminiClient
+from src.stub_backend import StubGenAIClient
+from src.tracing import tracer
+
+
+class FlakyModels:
+    """aio.models stand-in: raises the given errors first, then answers."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate_content(self, model, contents):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text="ok")
+
+
+def make_client(errors):
+    models = FlakyModels(errors)
+    client = AsyncGeminiClient(client=SimpleNamespace(aio=SimpleNamespace(models=models)), max_retries=3)
+    return client, models
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.ReadTimeout("read timed out"),
+    httpx.RemoteProtocolError("server disconnected"),
+])
+def test_httpx_transport_errors_are_retried(monkeypatch, error):
+    monkeypatch.setattr(Config, "LLM_BACKOFF_BASE_S", 0.001)
+    client, models = make_client([error, error])
+    assert asyncio.run(client._generate("model", "prompt")) == "ok"
+    assert models.calls == 3
+    assert client.retry_count == 2
+
+
+def test_non_transient_errors_are_raised(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_BACKOFF_BASE_S", 0.001)
+    client, models = make_client([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        asyncio.run(client._generate("model", "prompt"))
+    assert models.calls == 1
+
+
+CONTEXT = "[Source: 'malaria.pdf', Page: 3]\nGive artesunate 2.4 mg/kg intravenously at 0, 12 and 24 hours."
+
+
+def test_sync_methods_still_work_on_the_async_client():
+    client = AsyncGeminiClient(client=StubGenAIClient())
+    answer = client.orchestrate_response(CONTEXT, "artesunate dose?", [])
+    assert isinstance(answer, str) and "malaria.pdf" in answer
+    assert isinstance(client.generate_lightweight_response("hello"), str)
+
+
+def test_async_metrics_match_the_sync_schema():
+    sync_client = GeminiClient(client=StubGenAIClient())
+    sync_client.orchestrate_response(CONTEXT, "artesunate dose?", [])
+    async_client = AsyncGeminiClient(client=StubGenAIClient())
+    asyncio.run(async_client.aorchestrate_response(CONTEXT, "artesunate dose?", []))
+    assert set(async_client.last_metrics) == set(sync_client.last_metrics)
+    assert async_client.last_metrics["error"] is None
+
+
+def test_async_failure_names_the_stage(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_BACKOFF_BASE_S", 0.001)
+    client, _ = make_client([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        asyncio.run(client.aorchestrate_response(CONTEXT, "artesunate dose?", []))
+    assert client.last_metrics["error"] == "researcher"
+
+
+def test_concurrent_requests_trace_their_own_stages(monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", True)
+    client = AsyncGeminiClient(client=StubGenAIClient(latency_s=0.01))
+
+    async def request(query):
+        with tracer.span("request", query=query) as root:
+            await client.aorchestrate_response(CONTEXT, query, [])
+        return root
+
+    async def main():
+        return await asyncio.gather(*(request(f"artesunate dose {i}?") for i in range(4)))
+
+    for root in asyncio.run(main()):
+        children = [span for span in tracer.recent_spans if span.parent_id == root.span_id]
+        assert sorted(span.name for span in children) == ["researcher_call", "writer_call"]
+        assert all(span.trace_id == root.trace_id for span in children)
@@ -0,0 +1,63 @@
+import os
+import pickle
+import numpy as np
+from src.chunk_store import ChunkStore
+
+CHUNKS = {
+    7: {"text": "Amlodipine 5 mg once daily.", "page": 1, "source": "htn.pdf"},
+    3: {"text": "Metformin 500 mg with meals — titrate weekly.", "page": 4, "source": "dm.pdf"},
+    42: {"text": "Artesunate 2.4 mg/kg IV.", "page": 2, "source": "malaria.pdf"},
+}
+
+
+def test_round_trip(tmp_path):
+    ChunkStore(CHUNKS).save(str(tmp_path))
+    assert ChunkStore.exists(str(tmp_path))
+    store = ChunkStore.open(str(tmp_path))
+    assert len(store) == 3
+    assert {cid: store[cid] for cid in store} == CHUNKS
+    assert sorted(store.ids().tolist()) == [3, 7, 42]
+    assert store.pages_of([42, 3, 99]).tolist() == [2, 4, -1]
+
+
+def test_overlay_changes_are_saved(tmp_path):
+    ChunkStore(CHUNKS).save(str(tmp_path))
+    store = ChunkStore.open(str(tmp_path))
+    del store[7]
+    store[3] = {**CHUNKS[3], "page": 5}
+    store[100] = {"text": "Primaquine 0.25 mg/kg.", "page": 9, "source": "malaria.pdf"}
+    assert 7 not in store and store.pages_of([3, 100]).tolist() == [5, 9]
+
+    out = tmp_path / "saved"
+    out.mkdir()
+    store.save(str(out))
+    reopened = ChunkStore.open(str(out))
+    assert sorted(reopened) == [3, 42, 100]
+    assert reopened[3]["page"] == 5
+    assert reopened[100]["source"] == "malaria.pdf"
+
+
+def test_legacy_pickle_store_is_migrated(make_kb, tmp_path):
+    import faiss
+    folder = tmp_path / "legacy"
+    folder.mkdir()
+    # Pre-manifest layout: positional chunk list + a plain (non-ID-mapped) FAISS index
+    legacy = [CHUNKS[7], CHUNKS[3], CHUNKS[42]]
+    index = faiss.IndexFlatL2(8)
+    index.add(np.random.default_rng(0).standard_normal((3, 8)).astype("float32"))
+    faiss.write_index(index, str(folder / "index.faiss"))
+    with open(folder / "chunks.pkl", "wb") as f:
+        pickle.dump(legacy, f)
+
+    kb = make_kb("legacy")
+    assert kb.load_index(str(folder))
+    assert [kb.chunks[i] for i in range(3)] == legacy
+    assert sorted(kb.manifest) == ["dm.pdf", "htn.pdf", "malaria.pdf"]
+    assert kb.manifest["dm.pdf"]["chunk_ids"] == [1]
+
+    kb.save_index(str(folder))
+    assert ChunkStore.exists(str(folder))
+    assert not os.path.exists(folder / "chunks.pkl")
+    reloaded = make_kb("legacy")
+    assert reloaded.load_index(str(folder))
+    assert reloaded.chunks[2] == CHUNKS[42]
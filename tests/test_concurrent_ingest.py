@@ -0,0 +1,43 @@
+import re
+import sys
+import threading
+from src.search_filters import SearchFilter
+
+
+def test_filtered_search_during_ingestion(kb, make_pdf):
+    paths = [make_pdf(f"guideline-{i:03d}.pdf", [f"Guideline {i}: give drug{i} {i + 1} mg daily to adults with condition{i}."])
+             for i in range(320)]
+    kb.load_and_process_pdfs(paths[:300], workers=1, tags=["base"])
+
+    errors, stop = [], threading.Event()
+    wanted = {"guideline-000.pdf", "guideline-005.pdf"}
+
+    def search_loop():
+        while not stop.is_set():
+            try:
+                context = kb.search("give drug daily", top_k=5, filters=SearchFilter(sources=sorted(wanted)))
+                cited = set(re.findall(r"\[Source: '(.*?)', Page: \d+\]", context))
+                assert cited <= wanted, cited
+                kb.search("give drug daily", top_k=5, filters=SearchFilter(tags=["extra"]))
+                kb.document_tags()
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=search_loop) for _ in range(4)]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often, so readers land inside manifest updates
+    for reader in readers:
+        reader.start()
+    try:
+        for round_ in range(5):
+            kb.load_and_process_pdfs(paths[300:], workers=1, tags=["extra"])
+            kb.remove_documents([f"guideline-{i:03d}.pdf" for i in range(300, 320)])
+    finally:
+        stop.set()
+        sys.setswitchinterval(switch_interval)
+        for reader in readers:
+            reader.join()
+
+    assert not errors, errors[0]
+    assert set(kb.document_tags()) == {f"guideline-{i:03d}.pdf" for i in range(300)}
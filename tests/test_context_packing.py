@@ -0,0 +1,58 @@
+from src.context_packing import ContextPacker, estimate_tokens, format_chunk
+
+PAGE = ("Adults with confirmed hypertension start drug therapy at 140/90 mmHg. "
+        "First-line options are a thiazide, an ACE inhibitor or a calcium channel blocker. "
+        "Review blood pressure after four weeks and step up the dose if it remains above target. "
+        "Refer pregnant women and patients with kidney disease to a specialist clinic. ")
+
+
+def hit(text: str, source: str = "htn.pdf", page: int = 3, also=None) -> dict:
+    item = {"text": text, "source": source, "page": page}
+    if also:
+        item["also"] = also
+    return item
+
+
+def test_overlapping_windows_are_stitched():
+    first, second = PAGE[:200], PAGE[120:]  # 80 shared characters, as in sliding-window chunking
+    packed = ContextPacker(token_budget=1000).pack([hit(second), hit(first)])
+    assert packed == format_chunk("htn.pdf", 3, PAGE)
+
+
+def test_windows_from_other_pages_stay_separate():
+    packed = ContextPacker(token_budget=1000).pack([hit(PAGE[:200]), hit(PAGE[120:], page=4)])
+    assert packed.count("[Source: 'htn.pdf'") == 2
+
+
+def test_near_duplicate_span_is_dropped():
+    copy = PAGE.replace("four weeks", "4 weeks")
+    packer = ContextPacker(token_budget=1000)
+    packed = packer.pack([hit(PAGE), hit(copy, source="htn_2019.pdf", page=7)])
+    assert "htn_2019.pdf" not in packed
+    assert packer.stats() == {"contexts": 1, "mean_tokens_in": estimate_tokens(PAGE) + estimate_tokens(copy),
+                              "mean_tokens_out": estimate_tokens(PAGE)}
+
+
+def test_budget_truncates_at_sentence_boundary():
+    other = "Diabetes screening uses fasting glucose or HbA1c in adults over forty. " * 3
+    budget = estimate_tokens(other) + 40
+    packed = ContextPacker(token_budget=budget, min_span_tokens=10).pack(
+        [hit(other, source="dm.pdf"), hit(PAGE)])
+    _, tail = packed.split("[Source: 'htn.pdf', Page: 3]\n")
+    assert PAGE.startswith(tail) and tail.endswith(".") and len(tail) < len(PAGE)
+    assert sum(estimate_tokens(part) for part in (other, tail)) <= budget
+
+
+def test_span_skipped_when_too_little_budget_left():
+    other = "Diabetes screening uses fasting glucose or HbA1c in adults over forty. " * 3
+    packed = ContextPacker(token_budget=estimate_tokens(other) + 5, min_span_tokens=10).pack(
+        [hit(other, source="dm.pdf"), hit(PAGE)])
+    assert "htn.pdf" not in packed
+
+
+def test_collapsed_duplicate_citations_carry_into_header():
+    packed = ContextPacker(token_budget=1000).pack(
+        [hit(PAGE[:200], also=[("district.pdf", 9)]), hit(PAGE[120:], also=[("region.pdf", 2)])])
+    header = packed.split("\n", 1)[0]
+    assert header == ("[Source: 'htn.pdf', Page: 3] [Source: 'district.pdf', Page: 9] "
+                      "[Source: 'region.pdf', Page: 2]")
@@ -0,0 +1,93 @@
+import re
+from src.dedup import MinHashIndex
+from src.search_filters import SearchFilter
+
+CITATION = re.compile(r"\[Source: '(.*?)', Page: (\d+)\]")
+
+PAGE_1 = ("Severe malaria in adults: give intravenous artesunate 2.4 mg/kg at 0, 12 and 24 hours, then once "
+          "daily until oral therapy is tolerated. Monitor blood glucose and parasitaemia every twelve hours.")
+PAGE_2 = ("Uncomplicated falciparum malaria: give artemether-lumefantrine twice daily for three days with fatty "
+          "food. Add a single low dose of primaquine on day two, after checking for pregnancy.")
+
+
+def cited(context: str) -> set:
+    return {(source, int(page)) for source, page in CITATION.findall(context)}
+
+
+def test_minhash_requires_identical_numbers():
+    index = MinHashIndex()
+    index.add(1, index.signature(PAGE_1))
+    assert index.find_duplicate(index.signature(PAGE_1)) == 1
+    assert index.find_duplicate(index.signature(PAGE_1.replace("2.4 mg/kg", "3.0 mg/kg"))) is None
+    assert index.find_duplicate(index.signature(PAGE_2)) is None
+    index.remove(1)
+    assert index.find_duplicate(index.signature(PAGE_1)) is None
+
+
+def test_identical_document_collapses_into_both_citations(kb, make_pdf):
+    kb.load_and_process_pdfs([make_pdf("state.pdf", [PAGE_1, PAGE_2])], workers=1)
+    ntotal = kb.index.ntotal
+    summary = kb.load_and_process_pdfs([make_pdf("national.pdf", [PAGE_1, PAGE_2])], workers=1)
+
+    assert kb.index.ntotal == ntotal
+    assert kb.manifest["national.pdf"]["chunk_ids"] == []
+    assert len(kb.manifest["national.pdf"]["duplicate_ids"]) == summary["stats"]["duplicates"] > 0
+    assert {("state.pdf", 1), ("national.pdf", 1)} <= cited(kb.search("artesunate glucose", top_k=5))
+
+
+def test_chunk_with_different_dose_is_kept(kb, make_pdf):
+    kb.load_and_process_pdfs([make_pdf("2019.pdf", [PAGE_1])], workers=1)
+    ntotal = kb.index.ntotal
+    kb.load_and_process_pdfs([make_pdf("2023.pdf", [PAGE_1.replace("2.4 mg/kg", "3.0 mg/kg")])], workers=1)
+
+    assert kb.index.ntotal == 2 * ntotal
+    assert kb.manifest["2023.pdf"]["chunk_ids"] and not kb.manifest["2023.pdf"]["duplicate_ids"]
+
+
+def test_removing_the_original_hands_chunks_to_the_heir(kb, make_pdf):
+    state = make_pdf("state.pdf", [PAGE_1, PAGE_2])
+    national = make_pdf("national.pdf", [PAGE_1, PAGE_2])
+    kb.load_and_process_pdfs([state, national], workers=1)
+    shared = sorted(kb.manifest["state.pdf"]["chunk_ids"])
+    ntotal = kb.index.ntotal
+
+    kb.load_and_process_pdfs([national], workers=1, prune_missing=True)
+    assert "state.pdf" not in kb.manifest
+    assert sorted(kb.manifest["national.pdf"]["chunk_ids"]) == shared  # Handed over, not re-embedded
+    assert kb.manifest["national.pdf"]["duplicate_ids"] == []
+    assert kb.index.ntotal == ntotal
+    assert kb.duplicates == {}
+    assert cited(kb.search("artesunate glucose", top_k=5)) <= {("national.pdf", 1), ("national.pdf", 2)}
+    assert cited(kb.search("artesunate", top_k=5, filters=SearchFilter(sources=["national.pdf"])))
+
+
+def test_duplicates_survive_save_and_load(make_kb, make_pdf):
+    kb = make_kb()
+    kb.load_and_process_pdfs([make_pdf("state.pdf", [PAGE_1, PAGE_2]),
+                              make_pdf("national.pdf", [PAGE_1, PAGE_2])], workers=1)
+    kb.save_index(kb.storage_dir)
+
+    reloaded = make_kb()
+    reloaded.load_index(kb.storage_dir)
+    assert reloaded.duplicates == kb.duplicates
+    assert {("state.pdf", 2), ("national.pdf", 2)} <= cited(reloaded.search("primaquine pregnancy", top_k=5))
+
+    # A third copy is still detected against the reloaded MinHash index
+    ntotal = reloaded.index.ntotal
+    reloaded.load_and_process_pdfs([make_pdf("district.pdf", [PAGE_1, PAGE_2])], workers=1)
+    assert reloaded.index.ntotal == ntotal
+    assert reloaded.manifest["district.pdf"]["chunk_ids"] == []
+
+
+def test_pruning_a_fully_collapsed_document(kb, make_pdf):
+    state = make_pdf("state.pdf", [PAGE_1, PAGE_2])
+    kb.load_and_process_pdfs([state, make_pdf("national.pdf", [PAGE_1, PAGE_2])], workers=1)
+    chunk_ids = list(kb.manifest["state.pdf"]["chunk_ids"])
+    ntotal = kb.index.ntotal
+
+    kb.load_and_process_pdfs([state], workers=1, prune_missing=True)
+    assert "national.pdf" not in kb.manifest
+    assert kb.manifest["state.pdf"]["chunk_ids"] == chunk_ids
+    assert kb.index.ntotal == ntotal
+    assert kb.duplicates == {}
+    assert {source for source, _ in cited(kb.search("artesunate glucose", top_k=5))} == {"state.pdf"}
@@ -0,0 +1,62 @@
+import os
+import numpy as np
+from src.embedding_store import EmbeddingStore
+
+
+def vectors(n: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+
+
+def test_appended_batches_are_durable(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    first, second = vectors(3), vectors(2, seed=1)
+    store.append([10, 11, 12], first)
+    store.append([20, 21], second)
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert reopened.rows == 5 and reopened.dim == 8
+    rows = reopened.lookup([21, 10, 99])
+    assert rows.tolist()[2] == -1
+    np.testing.assert_allclose(reopened.read(rows[:2]), np.vstack([second[1], first[0]]), atol=1e-2)
+
+
+def test_uncommitted_tail_is_dropped_on_open(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.append([1, 2], vectors(2))
+    # A batch half-written when the process died: bytes on disk, header not updated
+    with open(tmp_path / EmbeddingStore.VECTORS_FILE, "ab") as f:
+        f.write(vectors(3).astype("float16").tobytes()[:20])
+    with open(tmp_path / EmbeddingStore.IDS_FILE, "ab") as f:
+        f.write(np.array([3], dtype="int64").tobytes())
+
+    resumed = EmbeddingStore(str(tmp_path))
+    assert resumed.rows == 2
+    assert os.path.getsize(tmp_path / EmbeddingStore.VECTORS_FILE) == 2 * 8 * 2
+    assert resumed.lookup([1, 2, 3]).tolist() == [0, 1, -1]
+    resumed.append([3], vectors(1, seed=3))
+    assert EmbeddingStore(str(tmp_path)).lookup([3]).tolist() == [2]
+
+
+def test_retain_keeps_only_live_ids(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    data = vectors(4)
+    store.append([1, 2, 3, 4], data)
+    store.retain([2, 4])
+    assert store.rows == 2
+    np.testing.assert_allclose(store.read(store.lookup([4])), data[3:4], atol=1e-2)
+    assert store.lookup([1, 3]).tolist() == [-1, -1]
+
+
+def test_ingestion_reuses_stored_vectors(make_kb, make_pdf):
+    paths = [make_pdf(f"doc{i}.pdf", [f"Guideline {i}: give drug{i} {i + 1} mg daily."]) for i in range(3)]
+    kb = make_kb()
+    kb.load_and_process_pdfs(paths, workers=1)
+
+    # An interrupted run: vectors reached the store, but the index/manifest were never saved
+    resumed = make_kb()
+    encoded = []
+    encode = resumed.encoder.encode
+    resumed.encoder.encode = lambda texts, **kwargs: encoded.extend(texts) or encode(texts, **kwargs)
+    resumed.load_and_process_pdfs(paths, workers=1)
+    assert encoded == []
+    assert resumed.index.ntotal == 3
@@ -0,0 +1,40 @@
+import pytest
+from src import embeddings_service
+from src.config import Config
+
+
+class FakeEncoder:
+    def __init__(self, backend):
+        self.backend = backend
+
+
+def test_failed_parity_check_is_not_cached(monkeypatch):
+    created, checked = [], []
+
+    def create_encoder(backend="torch"):
+        created.append(backend)
+        return FakeEncoder(backend)
+
+    def check_parity(model):
+        checked.append(model)
+        raise ValueError("Encoder parity check failed: min cosine 0.5000 < 0.98 against the PyTorch model")
+
+    monkeypatch.setattr(embeddings_service, "_model", None)
+    monkeypatch.setattr(embeddings_service, "create_encoder", create_encoder)
+    monkeypatch.setattr(embeddings_service, "check_parity", check_parity)
+    monkeypatch.setattr(Config, "ENCODER_BACKEND", "onnx_int8")
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match="parity"):
+            embeddings_service.load_model()
+    assert embeddings_service._model is None
+    assert created == ["onnx_int8", "onnx_int8"]  # Checked again on every load, never a silent fallback
+    assert len(checked) == 2
+
+
+def test_torch_backend_skips_parity_check(monkeypatch):
+    monkeypatch.setattr(embeddings_service, "_model", None)
+    monkeypatch.setattr(embeddings_service, "create_encoder", FakeEncoder)
+    monkeypatch.setattr(embeddings_service, "check_parity", lambda model: pytest.fail("parity check ran"))
+    monkeypatch.setattr(Config, "ENCODER_BACKEND", "torch")
+    assert embeddings_service.load_model().backend == "torch"
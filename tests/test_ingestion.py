@@ -0,0 +1,71 @@
+from src.search_filters import SearchFilter
+
+
+def test_filenames_are_kept_as_is(kb, make_pdf):
+    paths = [make_pdf("icmr_malaria.pdf", ["ICMR: artesunate 2.4 mg/kg for severe malaria."]),
+             make_pdf("who_malaria.pdf", ["WHO: artemether-lumefantrine for three days."]),
+             make_pdf("malaria_guidelines.pdf", ["National: primaquine 0.25 mg/kg single dose."])]
+    summary = kb.load_and_process_pdfs(paths, workers=1)
+
+    assert sorted(summary["added"]) == ["icmr_malaria.pdf", "malaria_guidelines.pdf", "who_malaria.pdf"]
+    assert sorted(kb.manifest) == sorted(summary["added"])
+    context = kb.search("primaquine dose", top_k=3, filters=SearchFilter(sources=["malaria_guidelines.pdf"]))
+    assert "[Source: 'malaria_guidelines.pdf', Page: 1]" in context
+
+
+def page(topic: str, dose: int) -> str:
+    return (f"{topic}: the recommended adult dose is {dose} mg once daily. Review renal function and "
+            f"electrolytes at baseline and after {dose // 10 + 2} weeks; refer if the target is not met.")
+
+
+def test_unchanged_files_are_skipped(kb, make_pdf):
+    paths = [make_pdf("a.pdf", [page("Amlodipine", 5)]), make_pdf("b.pdf", [page("Metformin", 500)])]
+    kb.load_and_process_pdfs(paths, workers=1)
+    ids_before = {name: list(entry["chunk_ids"]) for name, entry in kb.manifest.items()}
+
+    summary = kb.load_and_process_pdfs(paths, workers=1)
+    assert summary["skipped"] == ["a.pdf", "b.pdf"] and not summary["added"] and not summary["updated"]
+    assert {name: entry["chunk_ids"] for name, entry in kb.manifest.items()} == ids_before
+
+
+def test_changed_file_replaces_its_chunks(kb, make_pdf):
+    a = make_pdf("a.pdf", [page("Amlodipine", 5)])
+    b = make_pdf("b.pdf", [page("Metformin", 500)])
+    kb.load_and_process_pdfs([a, b], workers=1)
+    old_a, old_b = list(kb.manifest["a.pdf"]["chunk_ids"]), list(kb.manifest["b.pdf"]["chunk_ids"])
+
+    make_pdf("a.pdf", [page("Amlodipine", 10), page("Lisinopril", 20)])
+    summary = kb.load_and_process_pdfs([a, b], workers=1)
+    assert summary["updated"] == ["a.pdf"] and summary["skipped"] == ["b.pdf"]
+    new_a = kb.manifest["a.pdf"]["chunk_ids"]
+    assert not set(new_a) & set(old_a)
+    assert kb.manifest["b.pdf"]["chunk_ids"] == old_b
+    assert set(kb.chunks) == set(new_a) | set(old_b)
+    assert kb.index.ntotal == len(kb.chunks)
+    texts = [kb.chunks[cid]["text"] for cid in kb.chunks]
+    assert any("dose is 10 mg" in text for text in texts)
+    assert not any("dose is 5 mg" in text for text in texts)
+
+
+def test_prune_missing_removes_documents(kb, make_pdf):
+    a = make_pdf("a.pdf", [page("Amlodipine", 5)])
+    b = make_pdf("b.pdf", [page("Metformin", 500)])
+    kb.load_and_process_pdfs([a, b], workers=1)
+
+    summary = kb.load_and_process_pdfs([a], prune_missing=True, workers=1)
+    assert summary["removed"] == ["b.pdf"]
+    assert list(kb.manifest) == ["a.pdf"]
+    assert set(kb.chunks) == set(kb.manifest["a.pdf"]["chunk_ids"])
+    assert kb.index.ntotal == len(kb.chunks)
+
+
+def test_chunk_ids_survive_save_and_load(make_kb, make_pdf):
+    paths = [make_pdf("a.pdf", [page("Amlodipine", 5)]), make_pdf("b.pdf", [page("Metformin", 500)])]
+    kb = make_kb()
+    kb.load_and_process_pdfs(paths, workers=1)
+    kb.save_index(kb.storage_dir)
+
+    reloaded = make_kb()
+    assert reloaded.load_index(kb.storage_dir)
+    assert reloaded.manifest == kb.manifest
+    assert reloaded.load_and_process_pdfs(paths, workers=1)["skipped"] == ["a.pdf", "b.pdf"]
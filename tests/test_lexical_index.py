@@ -0,0 +1,63 @@
+from src.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = {
+    1: "Start treatment when blood pressure is ≥ 140/90 mmHg on two visits.",
+    2: "Amlodipine 5 mg once daily; titrate to 10 mg after two weeks.",
+    3: "Check HbA1c every three months and refer when hba1c >= 9.5 percent.",
+    4: "Counsel on salt, exercise and weight; recheck blood pressure in a month.",
+}
+
+
+def build() -> BM25Index:
+    index = BM25Index()
+    for chunk_id, text in CHUNKS.items():
+        index.add(chunk_id, text)
+    return index
+
+
+def test_tokenizer_keeps_clinical_tokens_intact():
+    tokens = tokenize("BP ≥ 140/90 mmHg, HbA1c <= 7.5, give 2.5mg p.o. (>= 18 y)")
+    for token in ["≥", "140/90", "mmhg", "hba1c", "<=", "7.5", "2.5mg", "p.o", ">="]:
+        assert token in tokens
+
+
+def test_exact_threshold_ranks_first():
+    index = build()
+    assert index.search("threshold 140/90", top_k=2)[0][0] == 1
+    assert index.search("HbA1c cut-off", top_k=2)[0][0] == 3
+    assert index.search("unrelated words only", top_k=2) == []
+
+
+def test_allowed_restricts_scored_chunks():
+    index = build()
+    hits = index.search("blood pressure", top_k=4, allowed={4})
+    assert [chunk_id for chunk_id, _ in hits] == [4]
+
+
+def test_remove_drops_postings():
+    index = build()
+    index.remove(1, CHUNKS[1])
+    assert len(index) == 3
+    assert index.search("140/90", top_k=4) == []
+    assert "140/90" not in index.postings
+    assert index.total_len == sum(index.doc_len.values())
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    index.save(str(tmp_path))
+    assert BM25Index.exists(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    query = "blood pressure 140/90 recheck"
+    assert loaded.search(query, top_k=4) == index.search(query, top_k=4)
+    assert loaded.total_len == index.total_len
+
+
+def test_rrf_prefers_ids_found_by_both_retrievers():
+    dense = [10, 20, 30]
+    lexical = [40, 30, 50]
+    merged = reciprocal_rank_fusion([dense, lexical], top_k=5)
+    assert merged[0] == 30  # Ranked by both lists beats any single top-1
+    assert merged[1:3] == [10, 40]  # Equal scores keep first-seen order
+    assert merged[3:] == [20, 50]
+    assert reciprocal_rank_fusion([dense, lexical], top_k=2) == [30, 10]
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import pytest
+from src.retrieval_client import RemoteKnowledgeBase
+from src.retrieval_server import RetrievalServer
+
+PAGE = ("Severe malaria in adults: give intravenous artesunate 2.4 mg/kg at 0, 12 and 24 hours, then once "
+        "daily until oral therapy is tolerated. Monitor blood glucose and parasitaemia every twelve hours.")
+
+
+@pytest.fixture
+def client(kb):
+    folder = tempfile.mkdtemp(prefix="medi-")  # Unix socket paths are limited to ~100 chars
+    url = f"unix://{os.path.join(folder, 'kb.sock')}"
+    server = RetrievalServer(kb, url, storage_dir=kb.storage_dir).start()
+    remote = RemoteKnowledgeBase(url, timeout=10, startup_timeout=10)
+    yield remote
+    server.shutdown()
+    os.rmdir(folder)
+
+
+def test_is_empty_is_cached_until_ingest(client, kb, make_pdf, monkeypatch):
+    paths, received = [], {}
+    request, ingest = client._request, kb.load_and_process_pdfs
+
+    def counting_request(method, path, payload=None):
+        paths.append(path)
+        return request(method, path, payload)
+
+    def recording_ingest(pdf_paths, **kwargs):
+        received.update(kwargs)
+        return ingest(pdf_paths, **kwargs)
+
+    monkeypatch.setattr(client, "_request", counting_request)
+    monkeypatch.setattr(kb, "load_and_process_pdfs", recording_ingest)
+
+    assert client.is_empty() and client.is_empty()
+    assert paths == ["/health"]
+
+    client.load_and_process_pdfs([make_pdf("malaria.pdf", [PAGE])], workers=1, tags=["malaria"])
+    assert received == {"prune_missing": False, "workers": 1, "tags": ["malaria"]}
+
+    assert not client.is_empty() and not client.is_empty()
+    assert paths == ["/health", "/ingest", "/health"]
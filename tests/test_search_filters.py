@@ -0,0 +1,91 @@
+import re
+import pytest
+from src.config import Config
+from src.search_filters import SearchFilter
+
+CITATION = re.compile(r"\[Source: '(.*?)', Page: (\d+)\]")
+
+PAGE_1 = ("Severe malaria in adults: give intravenous artesunate 2.4 mg/kg at 0, 12 and 24 hours, then once "
+          "daily until oral therapy is tolerated. Monitor blood glucose and parasitaemia every twelve hours.")
+PAGE_2 = ("Uncomplicated falciparum malaria: give artemether-lumefantrine twice daily for three days with fatty "
+          "food. Add a single low dose of primaquine on day two, after checking for pregnancy.")
+
+
+def cited(context: str) -> set:
+    return {(source, int(page)) for source, page in CITATION.findall(context)}
+
+
+def test_filter_cites_the_in_scope_duplicate(kb, make_pdf):
+    kb.load_and_process_pdfs([make_pdf("state.pdf", [PAGE_1, PAGE_2])], workers=1, tags=["state"])
+    kb.load_and_process_pdfs([make_pdf("national.pdf", [PAGE_1, PAGE_2])], workers=1, tags=["national"])
+    assert kb.manifest["national.pdf"]["chunk_ids"] == []  # Both pages collapsed into state.pdf
+
+    context = kb.search("artemether-lumefantrine primaquine", top_k=5,
+                        filters=SearchFilter(sources=["national.pdf"], pages=(2, 2)))
+    assert cited(context) == {("national.pdf", 2)}
+
+    context = kb.search("artesunate glucose", top_k=5, filters=SearchFilter(tags=["national"]))
+    assert {source for source, _ in cited(context)} == {"national.pdf"}
+
+    context = kb.search("artesunate glucose", top_k=5)
+    assert {("state.pdf", 1), ("national.pdf", 1)} <= cited(context)
+
+
+HTN_1 = ("Hypertension in adults: start drug therapy when clinic blood pressure stays at or above 140/90 mmHg "
+         "after lifestyle advice. Recheck readings monthly until the target is reached.")
+HTN_2 = ("Hypertension follow-up: add a thiazide diuretic or calcium channel blocker when one blood pressure "
+         "drug is not enough. Check potassium and creatinine within four weeks of any change.")
+
+
+@pytest.fixture
+def library_kb(kb, make_pdf):
+    kb.load_and_process_pdfs([make_pdf("malaria.pdf", [PAGE_1, PAGE_2])], workers=1, tags=["malaria", "who"])
+    kb.load_and_process_pdfs([make_pdf("htn.pdf", [HTN_1, HTN_2])], workers=1, tags=["hypertension"])
+    return kb
+
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid", "lexical"])
+def test_filters_apply_in_every_retrieval_mode(library_kb, mode, monkeypatch):
+    monkeypatch.setattr(Config, "RETRIEVAL_MODE", mode)
+    query = "blood pressure drug therapy dose"
+
+    context = library_kb.search(query, top_k=5, filters=SearchFilter(sources=["malaria.pdf"]))
+    assert context and {source for source, _ in cited(context)} == {"malaria.pdf"}
+
+    context = library_kb.search(query, top_k=5, filters=SearchFilter(tags=["hypertension"], pages=(2, None)))
+    assert cited(context) == {("htn.pdf", 2)}
+
+    context = library_kb.search(query, top_k=5, filters=SearchFilter(sources=["htn.pdf"], tags=["who"]))
+    assert context == ""  # No document satisfies both conditions
+
+
+def test_allowed_ids_and_cache_keys(library_kb):
+    malaria = set(library_kb.manifest["malaria.pdf"]["chunk_ids"])
+    assert set(library_kb.allowed_ids(SearchFilter(tags=["who"])).tolist()) == malaria
+    assert set(library_kb.allowed_ids(SearchFilter()).tolist()) == malaria | set(library_kb.manifest["htn.pdf"]["chunk_ids"])
+
+    query = "blood pressure drug therapy"
+    unfiltered = library_kb.search(query, top_k=5)
+    filtered = library_kb.search(query, top_k=5, filters=SearchFilter(sources=["malaria.pdf"]))
+    assert filtered != unfiltered  # Filtered and unfiltered results are cached under different keys
+    assert library_kb.search(query, top_k=5) == unfiltered
+    assert SearchFilter(tags=["a", "b"]).key() == SearchFilter(tags=["b", "a"]).key()
+    assert SearchFilter.from_dict(SearchFilter(sources=["x.pdf"], pages=(2, 4)).to_dict()).key() == \
+        SearchFilter(sources=["x.pdf"], pages=(2, 4)).key()
+
+
+@pytest.mark.parametrize("text, pages", [("3-10", (3, 10)), ("5", (5, 5)), ("12-", (12, None)), ("-4", (None, 4))])
+def test_parse_pages(text, pages):
+    assert SearchFilter.parse_pages(text) == pages
+
+
+def test_library_searches_only_named_collections(library, make_pdf):
+    library.ingest("malaria", [make_pdf("malaria.pdf", [PAGE_1, PAGE_2])], workers=1)
+    library.ingest("hypertension", [make_pdf("htn.pdf", [HTN_1, HTN_2])], workers=1)
+    assert library.names() == ["hypertension", "malaria"]
+
+    query = "blood pressure drug therapy dose"
+    assert {source for source, _ in cited(library.search(query, top_k=5, collections=["malaria"]))} == {"malaria.pdf"}
+    assert {source for source, _ in cited(library.search(query, top_k=5))} == {"malaria.pdf", "htn.pdf"}
+    context = library.search(query, top_k=5, filters=SearchFilter(pages=(1, 1)))
+    assert {page for _, page in cited(context)} == {1}
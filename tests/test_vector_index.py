@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from src import vector_index
+
+
+def unit_vectors(n: int, dim: int = 48, seed: int = 0) -> np.ndarray:
+    data = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("index_type", vector_index.INDEX_TYPES)
+def test_index_types_search_by_chunk_id(index_type):
+    data = unit_vectors(400)
+    ids = np.arange(1000, 1400, dtype="int64")
+    index = vector_index.create_index(index_type, 48, len(data))  # PQ_M (48) must divide dim
+    if not index.is_trained:
+        index.train(data)
+    index.add_with_ids(data, ids)
+    assert vector_index.index_type_of(index) == index_type
+
+    _, found = index.search(data[:5], 1, params=vector_index.search_params(index, nprobe=64, ef_search=64))
+    if index_type != "ivf_pq":  # Lossy codes: only the exact/graph indexes must find every vector itself
+        assert found[:, 0].tolist() == ids[:5].tolist()
+    assert vector_index.supports_remove(index) == (index_type != "hnsw")
+    if vector_index.supports_remove(index):
+        index.remove_ids(ids[:5])
+        assert index.ntotal == 395
+
+
+def test_too_few_vectors_to_train_falls_back_to_flat():
+    assert vector_index.index_type_of(vector_index.create_index("ivf_pq", 48, 10)) == "flat_ip"
+
+
+def test_switch_index_type_and_remove(kb, make_pdf):
+    paths = [make_pdf(f"doc{i}.pdf", [f"Guideline {i}: give drug{i} {i + 1} mg daily to patients with condition{i}."])
+             for i in range(6)]
+    kb.load_and_process_pdfs(paths, workers=1)
+    before = kb.search("drug3 condition3", top_k=1)
+
+    kb.rebuild_index("hnsw")  # From the embedding store, no re-encoding
+    assert vector_index.index_type_of(kb.index) == "hnsw"
+    assert kb.index.ntotal == 6
+    assert kb.search("drug3 condition3", top_k=1) == before
+
+    kb.remove_documents(["doc0.pdf"])  # HNSW cannot delete: rebuilt without the removed chunks
+    assert vector_index.index_type_of(kb.index) == "hnsw"
+    assert kb.index.ntotal == 5
+    assert "doc0.pdf" not in kb.search("drug0 condition0", top_k=5)